@@ -2,21 +2,14 @@ from flask import Flask
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from .config import Config
-import json
-from web3 import Web3
+from .db_routing import RoutingSession
 import logging  # Add this at the top
-from pathlib import Path
+import threading
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})  # Read-only routes can use a replica
 
-# Placeholder for Web3 connection
-w3 = None
-nft_land_contract = None
-action_logger_contract = None
-nft_marketplace_contract = None
 
-
-def create_app(config_class=Config):
+def create_app(config_class=Config, start_workers=True):
     app = Flask(__name__)
     app.config.from_object(config_class)
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
@@ -31,29 +24,21 @@ def create_app(config_class=Config):
 
     db.init_app(app)
 
-    global w3, nft_land_contract, action_logger_contract, nft_marketplace_contract
-
+    # Web3 and the contracts are built on first use, so booting (and CLI commands) never waits on the RPC
+    from . import chain, cache, profiling
+    chain.init_app(app)
+    cache.init_app(app)
+    profiling.init_app(app)  # No-op unless PROFILING_ENABLED
     if not app.config['POLYGON_RPC_URL']:
-        raise ValueError("POLYGON_RPC_URL not set in .env or config")
-
-    w3 = Web3(Web3.HTTPProvider(app.config['POLYGON_RPC_URL']))
-    if not w3.is_connected():
-        raise ConnectionError("Failed to connect to Polygon RPC")
-
-    contract_abi = open(Path(__file__).parent / "abi" / app.config.get('NFT_LAND_CONTRACT_ABI_PATH'), 'r').read()
-    # Set the contract address (replace with your contract's deployed address)
-    contract_address = app.config.get('NFT_LAND_CONTRACT_ADDRESS')
-    nft_land_contract = w3.eth.contract(address=Web3.to_checksum_address(contract_address), abi=contract_abi)
-
-    contract_abi = open(Path(__file__).parent / "abi" / app.config.get('ACTION_LOGGER_CONTRACT_ABI_PATH'), 'r').read()
-    # Set the contract address (replace with your contract's deployed address)
-    contract_address = app.config.get('ACTION_LOGGER_CONTRACT_ADDRESS')
-    action_logger_contract = w3.eth.contract(address=Web3.to_checksum_address(contract_address), abi=contract_abi)
+        app.logger.warning("POLYGON_RPC_URL not set in .env or config; chain features are unavailable")
+    if app.config['CHAIN_WARM_UP']:
+        warm_up_started = threading.Event()
 
-    contract_abi = open(Path(__file__).parent / "abi" / app.config.get('NFT_MARKETPLACE_CONTRACT_ABI_PATH'), 'r').read()
-    # Set the contract address (replace with your contract's deployed address)
-    contract_address = app.config.get('NFT_MARKETPLACE_CONTRACT_ADDRESS')
-    nft_marketplace_contract = w3.eth.contract(address=Web3.to_checksum_address(contract_address), abi=contract_abi)
+        @app.before_request
+        def start_chain_warm_up():
+            if not warm_up_started.is_set():
+                warm_up_started.set()
+                chain.start_warm_up()
 
     # Blueprints
     from .routes import bp as main_bp
@@ -62,5 +47,19 @@ def create_app(config_class=Config):
     # Create database tables if they don't exist
     with app.app_context():
         db.create_all()  # Ensure models are imported before this
+        from .action_logs import install_columns
+        install_columns(db.engine)  # Status columns on an action_log created before they existed
+        from .event_indexer import install_columns as install_indexer_columns
+        install_indexer_columns(db.engine)  # caught_up on an indexer_state created before it existed
+        from .partitions import install_action_log_partitions
+        install_action_log_partitions(db.engine, app.config['ACTION_LOG_PARTITIONS_AHEAD'])  # PostgreSQL only
+        from .search import check_search_indexes
+        check_search_indexes(db.engine)  # Full-text indexes for admin search; PostgreSQL builds them via the CLI
+
+    # Optional in-process workers for mint-preparation jobs. wsgi.py starts them per forked worker
+    # instead, and run.py only for its development server, never for CLI commands.
+    if start_workers and app.config.get('JOB_WORKER_THREADS'):
+        from .jobs import start_worker_threads
+        start_worker_threads(app)
 
     return app
@@ -0,0 +1,109 @@
+# app/action_logs.py
+# Optimistic ActionLog rows for the actions the backend logs on-chain itself.
+#
+# log_action_on_chain (app/services.py) writes a 'pending' row keyed by the transaction hash
+# as soon as the transaction is sent, so /admin/logs shows it without waiting for the event
+# indexer. When the ActionLogged event arrives the indexer confirms that row in place (one
+# keyed update, see process_action_logged_event). Rows still pending after
+# ACTION_LOG_PENDING_TIMEOUT_SECONDS are checked against the chain by sweep(), which the
+# indexer runs whenever it is caught up: a reverted transaction becomes 'failed' and one the
+# node no longer knows becomes 'dropped'. Indexed rows are 'confirmed' from the start.
+#
+# No route calls log_action_on_chain yet (it waits for the receipt, too slow for a request), so
+# for now every row comes from the indexer and is 'confirmed'.
+import logging
+from datetime import datetime, timedelta
+
+from hexbytes import HexBytes
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from web3.exceptions import TransactionNotFound
+
+from .models import ActionLog
+
+PENDING, CONFIRMED, FAILED, DROPPED = 'pending', 'confirmed', 'failed', 'dropped'
+SWEEP_BATCH_SIZE = 100
+
+# Columns added after action_log was first created; db.create_all() does not alter existing tables
+_ADDED_COLUMNS = {
+    'status': f"VARCHAR(10) NOT NULL DEFAULT '{CONFIRMED}'",
+    'submitted_at': "TIMESTAMP",
+}
+
+
+def install_columns(engine):
+    """Adds the status columns to an action_log created before they existed. Safe to run on every start."""
+    existing = {column['name'] for column in inspect(engine).get_columns(ActionLog.__tablename__)}
+    missing = [name for name in _ADDED_COLUMNS if name not in existing]
+    if not missing:
+        return
+    with engine.begin() as conn:
+        for name in missing:
+            conn.execute(text(f'ALTER TABLE {ActionLog.__tablename__} ADD COLUMN {name} {_ADDED_COLUMNS[name]}'))
+        conn.execute(text(f'CREATE INDEX IF NOT EXISTS ix_action_log_status ON {ActionLog.__tablename__} (status)'))
+
+
+def _own_session(db_session):
+    # A separate session on the caller's (primary) engine, so committing or rolling back the
+    # log row never touches the caller's pending changes
+    return Session(bind=db_session.get_bind(mapper=inspect(ActionLog)))
+
+
+def record_pending(db_session, tx_hash, user_address, action, details):
+    """The pending row for a transaction that was just sent. Never raises: the transaction is out
+    either way, and the indexer still inserts the row when the event arrives."""
+    now = datetime.now()  # Naive local time, like the block timestamps the indexer stores
+    with _own_session(db_session) as own_session:
+        own_session.add(ActionLog(user_address=user_address, action=action, details=details, timestamp=now,
+                                  tx_hash=tx_hash, status=PENDING, submitted_at=now))
+        try:
+            own_session.commit()
+        except IntegrityError:
+            own_session.rollback()  # The indexer got there first
+        except Exception as e:
+            own_session.rollback()
+            logging.error(f"Could not record pending action log for tx {tx_hash}: {e}")
+
+
+def mark_failed(db_session, tx_hash):
+    """Marks our pending row failed when its transaction reverted. Never raises: a row left
+    pending is resolved from its receipt by sweep()."""
+    with _own_session(db_session) as own_session:
+        try:
+            own_session.query(ActionLog).filter_by(tx_hash=tx_hash, status=PENDING).update(
+                {"status": FAILED}, synchronize_session=False)
+            own_session.commit()
+        except Exception as e:
+            own_session.rollback()
+            logging.error(f"Could not mark action log for tx {tx_hash} failed: {e}")
+
+
+def sweep(db_session, w3, timeout_seconds):
+    """Resolves pending rows older than `timeout_seconds` from their receipts; returns how many
+    changed. Mined, successful transactions stay pending until the indexer confirms them."""
+    cutoff = datetime.now() - timedelta(seconds=timeout_seconds)
+    stale = (db_session.query(ActionLog)
+             .filter(ActionLog.status == PENDING, ActionLog.submitted_at < cutoff)
+             .order_by(ActionLog.submitted_at)
+             .limit(SWEEP_BATCH_SIZE)
+             .all())
+    changed = 0
+    for log in stale:
+        try:
+            receipt = w3.eth.get_transaction_receipt(HexBytes(log.tx_hash))
+        except TransactionNotFound:
+            receipt = None
+        if receipt is not None:
+            if receipt['status'] == 0:
+                log.status = FAILED
+                changed += 1
+            continue
+        try:
+            w3.eth.get_transaction(HexBytes(log.tx_hash))  # Still in the mempool: keep waiting
+        except TransactionNotFound:
+            log.status = DROPPED
+            changed += 1
+    if changed:
+        logging.info(f"Resolved {changed} stale pending action log(s).")
+    return changed
@@ -0,0 +1,208 @@
+# app/activity.py
+# Live activity feed: /events/stream pushes indexed mints, updates, transfers and marketplace
+# events to clients as server-sent events, so UIs no longer poll listings or "my NFTs".
+#
+# The indexer runs in its own process and hands events over through the ActivityEvent table:
+# record() adds a row in the transaction that indexes the log. Each web process runs one tail
+# thread that reads new rows every ACTIVITY_POLL_INTERVAL and publishes them to the in-process
+# broker, which fans them out to the streams subscribed to a matching topic. However many
+# clients are connected, a process makes one small query per interval and no chain reads.
+# Clients resume with Last-Event-ID; missed events are replayed from the table.
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, UTC
+
+from flask import current_app
+from sqlalchemy import func
+from web3 import Web3
+
+from . import db
+from .models import ActivityEvent
+
+MARKET_TOPIC = 'market'
+MAX_TOPICS = 50
+TAIL_BATCH_SIZE = 500
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+def token_topic(token_id):
+    return f"token:{int(token_id)}"
+
+
+def owner_topic(address):
+    return f"owner:{Web3.to_checksum_address(address)}"
+
+
+def parse_topics(raw):
+    """Normalized topics from a comma-separated list of market, token:<id> and owner:<address>."""
+    topics = set()
+    for item in filter(None, (part.strip() for part in raw.split(','))):
+        kind, _, value = item.partition(':')
+        if item == MARKET_TOPIC:
+            topics.add(MARKET_TOPIC)
+        elif kind == 'token' and value.isdigit():
+            topics.add(token_topic(value))
+        elif kind == 'owner' and Web3.is_address(value):
+            topics.add(owner_topic(value))
+        else:
+            raise ValueError(f"Invalid topic: {item}")
+    if not topics:
+        raise ValueError("At least one topic is required (market, token:<id> or owner:<address>)")
+    if len(topics) > MAX_TOPICS:
+        raise ValueError(f"At most {MAX_TOPICS} topics per stream")
+    return topics
+
+
+# --- Indexer side ---
+def record(db_session, event, kind, topics, **payload):
+    """Adds the activity row for one decoded log; a log that was already recorded is skipped."""
+    tx_hash = event['transactionHash'].hex()
+    if db_session.query(ActivityEvent.id).filter_by(tx_hash=tx_hash, log_index=event['logIndex']).first():
+        return
+    db_session.add(ActivityEvent(
+        kind=kind,
+        topics=' '.join(sorted(set(topics))),
+        payload=json.dumps(payload),
+        block_number=event['blockNumber'],
+        tx_hash=tx_hash,
+        log_index=event['logIndex'],
+        created_at=datetime.now(UTC).replace(tzinfo=None)
+    ))
+
+
+def prune(db_session, retention_hours):
+    cutoff = datetime.now(UTC).replace(tzinfo=None) - timedelta(hours=retention_hours)
+    return db_session.query(ActivityEvent).filter(ActivityEvent.created_at < cutoff).delete(synchronize_session=False)
+
+
+# --- Web side ---
+def _message(row):
+    data = {"id": row.id, "kind": row.kind, "block_number": row.block_number, "tx_hash": row.tx_hash,
+            **json.loads(row.payload)}
+    return {"id": row.id, "kind": row.kind, "topics": frozenset(row.topics.split()), "data": json.dumps(data)}
+
+
+class Subscription:
+    def __init__(self, topics, queue_size):
+        self.topics = frozenset(topics)
+        self.queue = queue.Queue(queue_size)
+        self.overflowed = False
+
+
+class Broker:
+    """In-process fan-out of activity messages to the subscriptions whose topics match."""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, topics, queue_size, max_subscribers):
+        with self._lock:
+            if len(self._subscriptions) >= max_subscribers:
+                raise TooManySubscribers()
+            subscription = Subscription(topics, queue_size)
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.topics.isdisjoint(message["topics"]):
+                continue
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                # A client that cannot keep up is disconnected and resumes from its Last-Event-ID
+                subscription.overflowed = True
+
+
+broker = Broker()
+_tail_pid = None
+_tail_lock = threading.Lock()
+
+
+def _tail(app):
+    with app.app_context():
+        last_id = db.session.query(func.max(ActivityEvent.id)).scalar() or 0
+        db.session.remove()
+        while True:
+            time.sleep(app.config['ACTIVITY_POLL_INTERVAL'])
+            try:
+                # Only the indexer inserts rows, one transaction at a time, so ids become visible in order
+                rows = (ActivityEvent.query.filter(ActivityEvent.id > last_id)
+                        .order_by(ActivityEvent.id).limit(TAIL_BATCH_SIZE).all())
+                for row in rows:
+                    broker.publish(_message(row))
+                    last_id = row.id
+            except Exception as e:
+                logging.error(f"Activity tail failed: {e}")
+            finally:
+                db.session.remove()
+
+
+def _ensure_tail(app):
+    # Started on the first subscription, once per process (a forked worker starts its own)
+    global _tail_pid
+    if _tail_pid == os.getpid():
+        return
+    with _tail_lock:
+        if _tail_pid != os.getpid():
+            threading.Thread(target=_tail, args=(app,), name="activity-tail", daemon=True).start()
+            _tail_pid = os.getpid()
+
+
+def subscribe(topics):
+    app = current_app._get_current_object()
+    _ensure_tail(app)
+    return broker.subscribe(topics, app.config['ACTIVITY_QUEUE_SIZE'], app.config['ACTIVITY_MAX_SUBSCRIBERS'])
+
+
+def replay(topics, after_id, limit):
+    """Stored messages newer than `after_id` matching `topics`, oldest first."""
+    messages = []
+    while len(messages) < limit:
+        rows = (ActivityEvent.query.filter(ActivityEvent.id > after_id)
+                .order_by(ActivityEvent.id).limit(TAIL_BATCH_SIZE).all())
+        if not rows:
+            break
+        after_id = rows[-1].id
+        messages.extend(message for message in map(_message, rows) if not message["topics"].isdisjoint(topics))
+    return messages[:limit]
+
+
+def _format(message):
+    return f"id: {message['id']}\nevent: {message['kind']}\ndata: {message['data']}\n\n"
+
+
+def stream(subscription, backlog, heartbeat_seconds):
+    """SSE body: the replayed backlog, then live messages, with a comment line as heartbeat."""
+    try:
+        yield "retry: 3000\n\n"
+        last_id = 0
+        for message in backlog:
+            yield _format(message)
+            last_id = message["id"]
+        while not subscription.overflowed:
+            try:
+                message = subscription.queue.get(timeout=heartbeat_seconds)
+            except queue.Empty:
+                yield ": keep-alive\n\n"  # Also how a closed connection is noticed
+                continue
+            if message["id"] <= last_id:
+                continue  # Already sent with the backlog
+            yield _format(message)
+            last_id = message["id"]
+    finally:
+        broker.unsubscribe(subscription)
@@ -15,4 +15,5 @@ def generate_admin_username_challenge():
     return hmac.new(secret.encode(), time_slot.encode(), hashlib.sha256).hexdigest()[:16]
 
 
-print(generate_admin_username_challenge())
+if __name__ == "__main__":
+    print(generate_admin_username_challenge())
@@ -0,0 +1,67 @@
+# app/blocks.py
+# Shared block-header cache. Event handlers need block timestamps, and many events share a
+# block (a backfill of one busy block can carry hundreds), so headers are fetched once and
+# kept in a bounded LRU. prefetch() loads all headers a batch of events needs in a single
+# JSON-RPC batch request instead of one round trip per block.
+import logging
+import threading
+from collections import OrderedDict
+
+from .config import Config
+
+_headers = OrderedDict()  # block number -> {"timestamp": int, "hash": str}
+_lock = threading.Lock()
+
+
+def _remember(block_number, block):
+    header = {"timestamp": block['timestamp'], "hash": block['hash'].hex()}
+    with _lock:
+        _headers[block_number] = header
+        _headers.move_to_end(block_number)
+        while len(_headers) > Config.BLOCK_CACHE_SIZE:
+            _headers.popitem(last=False)
+    return header
+
+
+def _cached(block_number):
+    with _lock:
+        header = _headers.get(block_number)
+        if header is not None:
+            _headers.move_to_end(block_number)
+        return header
+
+
+def preload(headers):
+    """Adds known headers ({block number: {"timestamp", "hash"}}), e.g. from a recorded fixture."""
+    with _lock:
+        for block_number, header in headers.items():
+            _headers[int(block_number)] = header
+            _headers.move_to_end(int(block_number))
+        while len(_headers) > Config.BLOCK_CACHE_SIZE:
+            _headers.popitem(last=False)
+
+
+def get_block_header(w3, block_number):
+    return _cached(block_number) or _remember(block_number, w3.eth.get_block(block_number))
+
+
+def get_block_timestamp(w3, block_number):
+    return get_block_header(w3, block_number)["timestamp"]
+
+
+def prefetch(w3, block_numbers):
+    """Loads every uncached header in `block_numbers` with one batched RPC call."""
+    missing = sorted({number for number in block_numbers if _cached(number) is None})
+    if len(missing) < 2:
+        return  # Nothing to batch; get_block_header fetches a single block on demand
+    try:
+        with w3.batch_requests() as batch:
+            for number in missing:
+                batch.add(w3.eth.get_block(number))
+            blocks = batch.execute()
+    except Exception as e:
+        # Some providers reject batches; the headers are then fetched one by one when needed
+        logging.warning(f"Batched block header fetch failed, falling back to single requests: {e}")
+        return
+    for number, block in zip(missing, blocks):
+        _remember(number, block)
@@ -0,0 +1,196 @@
+# app/cache.py
+# Shared cache for read paths: NFT details, NFT history and logged-in identities.
+#
+# Two backends behind one interface. LocalCache is an in-process LRU (the default; each worker
+# has its own copy). RedisCache (CACHE_BACKEND=redis) is shared by every worker and host, so
+# hit rates and invalidations hold as workers are added. Values are stored as JSON under
+# "<CACHE_KEY_PREFIX>:<namespace>:<key>".
+#
+# get_or_set() protects loaders against stampedes: concurrent misses in one process share a
+# single load (app/singleflight.py), and with Redis a short lock lets one process load while
+# the others wait for its value. TTLs get some jitter so entries written together do not
+# expire together. Writers call invalidate(); with the local backend that only reaches the
+# calling process, so reads whose source another process changes (token reads, changed by the
+# event indexer) key their entries by version instead. A cache outage is logged and treated
+# as a miss.
+import json
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from . import singleflight
+from .config import Config
+
+SETTINGS = ('CACHE_BACKEND', 'CACHE_REDIS_URL', 'CACHE_KEY_PREFIX', 'CACHE_DEFAULT_TTL', 'CACHE_MAX_ENTRIES',
+            'CACHE_MAX_VALUE_BYTES', 'CACHE_LOCK_TIMEOUT')
+TTL_JITTER = 0.1  # Up to 10% is taken off each TTL
+LOCK_POLL_INTERVAL = 0.05
+
+_settings = {name: getattr(Config, name, None) for name in SETTINGS}
+_backend = None
+_backend_lock = threading.Lock()
+
+
+class LocalCache:
+    """Bounded in-process LRU with per-entry expiry."""
+    shared = False
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def add(self, key, value, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return False
+            self._entries[key] = (time.monotonic() + ttl, value)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+class RedisCache:
+    """Any Redis-protocol server. Size it with maxmemory and an LRU eviction policy."""
+    shared = True
+
+    def __init__(self, url):
+        import redis  # Only needed with CACHE_BACKEND=redis
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(key)
+        return value.decode() if value is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(key, value, px=max(1, int(ttl * 1000)))
+
+    def add(self, key, value, ttl):
+        return bool(self._client.set(key, value, px=max(1, int(ttl * 1000)), nx=True))
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*keys)
+
+
+def init_app(app):
+    """Takes the cache settings from the app config and drops a backend built from other settings."""
+    global _backend
+    _settings.update({name: app.config.get(name) for name in SETTINGS})
+    _backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if _settings['CACHE_BACKEND'] == 'redis':
+                    _backend = RedisCache(_settings['CACHE_REDIS_URL'])
+                else:
+                    _backend = LocalCache(_settings['CACHE_MAX_ENTRIES'])
+    return _backend
+
+
+def _key(namespace, key):
+    return f"{_settings['CACHE_KEY_PREFIX']}:{namespace}:{key}"
+
+
+def get(namespace, key):
+    try:
+        raw = get_backend().get(_key(namespace, key))
+    except Exception as e:
+        logging.warning(f"Cache read failed for {namespace}:{key}: {e}")
+        return None
+    return json.loads(raw) if raw is not None else None
+
+
+def set(namespace, key, value, ttl=None):
+    raw = json.dumps(value)
+    if len(raw) > _settings['CACHE_MAX_VALUE_BYTES']:
+        return  # Too large to be worth caching
+    ttl = ttl or _settings['CACHE_DEFAULT_TTL']
+    try:
+        get_backend().set(_key(namespace, key), raw, ttl * (1 - random.uniform(0, TTL_JITTER)))
+    except Exception as e:
+        logging.warning(f"Cache write failed for {namespace}:{key}: {e}")
+
+
+def invalidate(namespace, *keys):
+    try:
+        get_backend().delete(*(_key(namespace, key) for key in keys))
+    except Exception as e:
+        logging.warning(f"Cache invalidation failed for {namespace}:{keys}: {e}")
+
+
+def get_or_set(namespace, key, loader, ttl=None, should_cache=lambda value: value is not None):
+    """The cached value, or loader()'s result (stored if should_cache(result)).
+    Cached values come back from JSON: tuples are returned as lists."""
+    value = get(namespace, key)
+    if value is not None:
+        return value
+    return singleflight.do(('cache', namespace, key), lambda: _load(namespace, key, loader, ttl, should_cache))
+
+
+def _load(namespace, key, loader, ttl, should_cache):
+    backend = get_backend()
+    lock_key = _key(namespace, key) + ':lock'
+    locked = False
+    if backend.shared:
+        try:
+            locked = backend.add(lock_key, '1', _settings['CACHE_LOCK_TIMEOUT'])
+            if not locked:
+                value = _wait_for_other_loader(backend, namespace, key, lock_key)
+                if value is not None:
+                    return value
+        except Exception as e:
+            logging.warning(f"Cache lock failed for {namespace}:{key}: {e}")
+    try:
+        value = loader()
+        if should_cache(value):
+            set(namespace, key, value, ttl)
+        return value
+    finally:
+        if locked:
+            try:
+                backend.delete(lock_key)
+            except Exception as e:
+                logging.warning(f"Cache unlock failed for {namespace}:{key}: {e}")  # The lock expires anyway
+
+
+def _wait_for_other_loader(backend, namespace, key, lock_key):
+    # Another process holds the lock: wait for its value until the lock is released or expires.
+    # None means it gave up (e.g. the value was not cacheable) and this process loads itself.
+    deadline = time.monotonic() + _settings['CACHE_LOCK_TIMEOUT']
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        value = get(namespace, key)
+        if value is not None:
+            return value
+        if backend.get(lock_key) is None:
+            return get(namespace, key)
+    return None
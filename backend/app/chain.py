@@ -0,0 +1,146 @@
+# app/chain.py
+# Lazily created Web3 client and contract instances.
+#
+# Nothing here touches the network or the ABI files at import time or in create_app: the
+# provider and contracts are built on first use (under a lock, once per process) and parsed
+# ABIs are cached. warm_up() does that work ahead of time in a background thread, and
+# check_ready() backs /health/ready. CLI commands that never use the chain never connect.
+import json
+import logging
+import threading
+import time
+from functools import lru_cache
+
+from web3 import Web3
+
+from .config import Config
+
+# name -> (address setting, ABI path setting)
+CONTRACTS = {
+    'nft_land': ('NFT_LAND_CONTRACT_ADDRESS', 'NFT_LAND_CONTRACT_ABI_PATH'),
+    'action_logger': ('ACTION_LOGGER_CONTRACT_ADDRESS', 'ACTION_LOGGER_CONTRACT_ABI_PATH'),
+    'nft_marketplace': ('NFT_MARKETPLACE_CONTRACT_ADDRESS', 'NFT_MARKETPLACE_CONTRACT_ABI_PATH'),
+}
+SETTINGS = ('POLYGON_RPC_URL', 'RPC_TIMEOUT', 'CHAIN_READY_CACHE_SECONDS', 'PROFILING_ENABLED') + \
+    tuple(setting for pair in CONTRACTS.values() for setting in pair)
+
+_settings = {name: getattr(Config, name, None) for name in SETTINGS}
+_lock = threading.RLock()
+_w3 = None
+_contracts = {}
+_readiness = {"ready": False, "checked_at": 0.0, "error": "Not checked yet"}
+
+
+def init_app(app):
+    """Takes the chain settings from the app config (create_app may be given a custom config)."""
+    _settings.update({name: app.config.get(name) for name in SETTINGS})
+
+
+@lru_cache(maxsize=None)
+def load_abi(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _new_provider():
+    return Web3.HTTPProvider(_settings['POLYGON_RPC_URL'], request_kwargs={'timeout': _settings['RPC_TIMEOUT']})
+
+
+def get_w3():
+    """The shared Web3 client, or None if no RPC URL is configured. Building it performs no network I/O."""
+    global _w3
+    if _w3 is None:
+        with _lock:
+            if _w3 is None:
+                if not _settings['POLYGON_RPC_URL']:
+                    logging.error("POLYGON_RPC_URL not set in .env or config")
+                    return None
+                _w3 = Web3(_new_provider())
+                if _settings['PROFILING_ENABLED']:
+                    from .profiling import RPCTimer
+                    _w3.middleware_onion.add(RPCTimer, 'profiling')  # RPC time per request (app/profiling.py)
+    return _w3
+
+
+def get_contract(name):
+    """Contract instance for one of CONTRACTS, or None if its address or ABI is not configured."""
+    contract = _contracts.get(name)
+    if contract is not None:
+        return contract
+    with _lock:
+        if name not in _contracts:
+            address_setting, abi_setting = CONTRACTS[name]
+            address, abi_path = _settings[address_setting], _settings[abi_setting]
+            if not address or not abi_path:
+                logging.error(f"{address_setting} / {abi_setting} not configured.")
+                return None
+            try:
+                abi = load_abi(abi_path)
+            except FileNotFoundError:
+                logging.error(f"ABI file not found: {abi_path}")
+                return None
+            w3 = get_w3()
+            if w3 is None:
+                return None
+            _contracts[name] = w3.eth.contract(address=Web3.to_checksum_address(address), abi=abi)
+        return _contracts[name]
+
+
+def reset():
+    """Drops the client and contract instances (not the parsed ABIs)."""
+    global _w3
+    with _lock:
+        _w3 = None
+        _contracts.clear()
+
+
+def preload():
+    """Builds the client and every configured contract without any network I/O.
+    Called in a pre-forking server's master so workers share these objects copy-on-write."""
+    return [name for name in CONTRACTS if get_contract(name) is not None]
+
+
+def reset_connections():
+    """Gives the client a fresh provider (and so fresh HTTP connection pools) after a fork.
+    The contract instances reference the client, so they are kept and keep working."""
+    with _lock:
+        if _w3 is not None:
+            _w3.provider = _new_provider()
+        _readiness["checked_at"] = 0.0  # Re-check readiness from this process
+
+
+def check_ready(force=False):
+    """(ready, error): whether the RPC endpoint answers and every contract is configured.
+    The result is reused for CHAIN_READY_CACHE_SECONDS so probes do not hammer the RPC."""
+    if not force and time.monotonic() - _readiness["checked_at"] < _settings['CHAIN_READY_CACHE_SECONDS']:
+        return _readiness["ready"], _readiness["error"]
+
+    error = None
+    try:
+        missing = [name for name in CONTRACTS if get_contract(name) is None]
+        if get_w3() is None:
+            error = "POLYGON_RPC_URL not configured"
+        elif missing:
+            error = f"Contracts not configured: {', '.join(missing)}"
+        elif not get_w3().is_connected():
+            error = "RPC endpoint not reachable"
+    except Exception as e:
+        error = str(e)
+
+    _readiness.update(ready=error is None, checked_at=time.monotonic(), error=error)
+    return error is None, error
+
+
+def warm_up():
+    """Parses the ABIs, builds the contracts and checks the RPC connection."""
+    ready, error = check_ready(force=True)
+    if ready:
+        logging.info("Chain clients warmed up.")
+    else:
+        logging.warning(f"Chain warm-up incomplete: {error}")
+
+
+def start_warm_up():
+    thread = threading.Thread(target=warm_up, name="chain-warm-up", daemon=True)
+    thread.start()
+    return thread
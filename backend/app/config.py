@@ -1,16 +1,50 @@
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+from sqlalchemy.engine import make_url
 
 load_dotenv()
 
 
+def engine_options(url):
+    # Connection pool settings for `url`. Sizing only applies to a QueuePool: in-memory SQLite
+    # runs on a single static connection and rejects pool_size/max_overflow/pool_timeout.
+    options = {
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),  # Reconnect before server/proxy idle timeouts
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes'),
+    }
+    parsed = make_url(url) if url else None
+    if parsed is not None and parsed.get_backend_name() == 'sqlite' and parsed.database in (None, '', ':memory:'):
+        return options
+    options.update({
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),  # Seconds to wait for a free connection
+    })
+    return options
+
+
 class Config:
     SECRET_KEY = 'you-will-never-guess'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+
+    # Connection pool of the primary engine (also used by the event indexer)
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # Optional read replica; @read_only routes send their SELECTs to it (see app/db_routing.py).
+    # Flask-SQLAlchemy does not apply SQLALCHEMY_ENGINE_OPTIONS to binds, so it gets its own.
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    SQLALCHEMY_BINDS = {'replica': {'url': DATABASE_REPLICA_URL, **engine_options(DATABASE_REPLICA_URL)}} \
+        if DATABASE_REPLICA_URL else {}
+    REPLICA_READ_YOUR_WRITES_SECONDS = float(os.environ.get('REPLICA_READ_YOUR_WRITES_SECONDS', 10))
+
     POLYGON_RPC_URL = os.environ.get('POLYGON_RPC_URL')
+    RPC_TIMEOUT = float(os.environ.get('RPC_TIMEOUT', 10))  # Seconds per JSON-RPC request
+    # Chain clients are created lazily (see app/chain.py); warm them up in the background on the first request
+    CHAIN_WARM_UP = os.environ.get('CHAIN_WARM_UP', 'true').lower() in ('1', 'true', 'yes')
+    CHAIN_READY_CACHE_SECONDS = float(os.environ.get('CHAIN_READY_CACHE_SECONDS', 10))  # /health/ready RPC checks
 
     # Contract Addresses
     NFT_LAND_CONTRACT_ADDRESS = os.getenv('NFT_LAND_CONTRACT_ADDRESS')
@@ -23,6 +57,91 @@ class Config:
     ACTION_LOGGER_CONTRACT_ABI_PATH = str(BASE_DIR / 'abi' / os.getenv('ACTION_LOGGER_CONTRACT_ABI_PATH', 'ActionLogger.json'))
     NFT_MARKETPLACE_CONTRACT_ABI_PATH = str(BASE_DIR / 'abi' / os.getenv('NFT_MARKETPLACE_CONTRACT_ABI_PATH', 'NFTMarketplace.json'))
 
+    # Event indexer (see app/event_indexer.py)
+    INDEXER_START_BLOCK = int(os.environ.get('INDEXER_START_BLOCK', 0))  # Contract deployment block
+    INDEXER_BATCH_SIZE = int(os.environ.get('INDEXER_BATCH_SIZE', 2000))  # Blocks per eth_getLogs call
+    INDEXER_CONFIRMATIONS = int(os.environ.get('INDEXER_CONFIRMATIONS', 0))  # Blocks to stay behind the head
+    INDEXER_POLL_INTERVAL = float(os.environ.get('INDEXER_POLL_INTERVAL', 15))
+    BLOCK_CACHE_SIZE = int(os.environ.get('BLOCK_CACHE_SIZE', 10000))  # Block headers kept in memory (app/blocks.py)
+
+    # Serve /nft/my_nfts from the indexed NFTToken table instead of the contract (falls back to
+    # the contract until the indexer has processed the nft_land stream)
+    NFT_READS_FROM_INDEX = os.environ.get('NFT_READS_FROM_INDEX', 'true').lower() in ('1', 'true', 'yes')
+
+    # Background mint-preparation jobs (see app/jobs.py)
+    JOB_STORAGE_DIR = os.environ.get('JOB_STORAGE_DIR', str(BASE_DIR.parent / 'instance' / 'jobs'))
+    JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS', 0))  # 0 = only `flask run-job-worker` processes
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1.0))  # Seconds between queue polls
+    # Upper bound for /jobs/<id>?wait=N long-polls, in seconds. A waiting request holds a gunicorn
+    # thread the whole time, so keep it short; clients simply poll again.
+    JOB_MAX_WAIT = 10
+    # Running jobs not finished after this long are failed (their worker died mid-job)
+    JOB_RUNNING_TIMEOUT = int(os.environ.get('JOB_RUNNING_TIMEOUT', 1800))
+
+    # Resumable chunked uploads (see app/uploads.py)
+    UPLOAD_STORAGE_DIR = os.environ.get('UPLOAD_STORAGE_DIR', str(BASE_DIR.parent / 'instance' / 'uploads'))
+    UPLOAD_MAX_SIZE = int(os.environ.get('UPLOAD_MAX_SIZE', 200 * 1024 * 1024))  # Bytes per assembled file
+    UPLOAD_EXPIRY_HOURS = int(os.environ.get('UPLOAD_EXPIRY_HOURS', 48))
+    # A chunk write that has not finished after this long (e.g. its worker died) can be taken over
+    UPLOAD_CHUNK_CLAIM_SECONDS = int(os.environ.get('UPLOAD_CHUNK_CLAIM_SECONDS', 600))
+
+    # ActionLog partitioning and archival (see app/partitions.py)
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', str(BASE_DIR.parent / 'instance' / 'archive'))
+    ACTION_LOG_RETENTION_MONTHS = int(os.environ.get('ACTION_LOG_RETENTION_MONTHS', 6))  # Months kept in the DB
+    ACTION_LOG_PARTITIONS_AHEAD = int(os.environ.get('ACTION_LOG_PARTITIONS_AHEAD', 3))  # Future months pre-created
+    # Seconds before the indexer checks a still-pending backend action log for a failed or dropped tx
+    ACTION_LOG_PENDING_TIMEOUT_SECONDS = int(os.environ.get('ACTION_LOG_PENDING_TIMEOUT_SECONDS', 300))
+
+    # Pin all mint assets as one directory (one Pinata request) instead of one pin per file
+    IPFS_PACKAGE_MINT_ASSETS = os.environ.get('IPFS_PACKAGE_MINT_ASSETS', 'false').lower() in ('1', 'true', 'yes')
+
+    # Thumbnail/preview derivatives of the parcel image, pinned next to the original
+    IMAGE_DERIVATIVES_ENABLED = os.environ.get('IMAGE_DERIVATIVES_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    IMAGE_DERIVATIVE_WORKERS = int(os.environ.get('IMAGE_DERIVATIVE_WORKERS', 4))
+
+    # Shared read cache (see app/cache.py): 'local' is per process, 'redis' is shared by all workers
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'local')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'landchain')
+    CACHE_DEFAULT_TTL = float(os.environ.get('CACHE_DEFAULT_TTL', 60))
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 10000))  # Local backend only
+    CACHE_MAX_VALUE_BYTES = int(os.environ.get('CACHE_MAX_VALUE_BYTES', 1024 * 1024))  # Larger values are not cached
+    CACHE_LOCK_TIMEOUT = float(os.environ.get('CACHE_LOCK_TIMEOUT', 5))  # Seconds other workers wait for a load
+    # Entry lifetimes; indexed token entries are also keyed by version (see app/services.py)
+    NFT_CACHE_TTL = float(os.environ.get('NFT_CACHE_TTL', 60))
+    NFT_HISTORY_CACHE_TTL = float(os.environ.get('NFT_HISTORY_CACHE_TTL', 300))
+
+    # Seconds a logged-in user's identity (id, wallet, is_admin) is cached (see app/identity.py)
+    IDENTITY_CACHE_TTL = float(os.environ.get('IDENTITY_CACHE_TTL', 30))
+
+    # Live activity stream, /events/stream (see app/activity.py)
+    ACTIVITY_POLL_INTERVAL = float(os.environ.get('ACTIVITY_POLL_INTERVAL', 1.0))  # Seconds between reads of new events
+    ACTIVITY_RETENTION_HOURS = int(os.environ.get('ACTIVITY_RETENTION_HOURS', 24))  # History kept for Last-Event-ID
+    ACTIVITY_REPLAY_LIMIT = 1000  # Most events replayed to a reconnecting client
+    # Open streams per process. Every stream holds one gunicorn thread for as long as it is open, so
+    # the default leaves three quarters of GUNICORN_THREADS for ordinary requests. For many clients,
+    # serve /events/stream from a separate gunicorn (see gunicorn.conf.py) and raise both there.
+    ACTIVITY_MAX_SUBSCRIBERS = int(os.environ.get('ACTIVITY_MAX_SUBSCRIBERS',
+                                                  max(1, int(os.environ.get('GUNICORN_THREADS', 4)) // 4)))
+    ACTIVITY_QUEUE_SIZE = 1000  # Undelivered events per stream before a slow client is disconnected
+    ACTIVITY_HEARTBEAT_SECONDS = 15
+
+    # Cache-Control of the conditional-GET read endpoints (see app/http_cache.py)
+    NFT_CACHE_CONTROL = os.environ.get('NFT_CACHE_CONTROL', 'public, max-age=15')
+    NFT_HISTORY_CACHE_CONTROL = os.environ.get('NFT_HISTORY_CACHE_CONTROL', 'public, max-age=30')
+    NFT_VERSION_CACHE_CONTROL = os.environ.get('NFT_VERSION_CACHE_CONTROL', 'public, max-age=31536000, immutable')
+    PLATFORM_INFO_CACHE_CONTROL = os.environ.get('PLATFORM_INFO_CACHE_CONTROL', 'public, max-age=3600')
+    CONTRACT_INFO_CACHE_CONTROL = os.environ.get('CONTRACT_INFO_CACHE_CONTROL', 'private, max-age=300')
+
+    # Opt-in request profiling: DB/RPC/IPFS breakdown per route on /metrics, cProfile dumps of slow requests
+    # (see app/profiling.py). With several gunicorn workers, also set PROMETHEUS_MULTIPROC_DIR.
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    PROFILING_SLOW_REQUEST_SECONDS = float(os.environ.get('PROFILING_SLOW_REQUEST_SECONDS', 1.0))
+    PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0.05))  # Share of requests run under cProfile
+    PROFILING_DUMP_DIR = os.environ.get('PROFILING_DUMP_DIR', str(BASE_DIR.parent / 'instance' / 'profiles'))
+    PROFILING_MAX_DUMPS = int(os.environ.get('PROFILING_MAX_DUMPS', 200))  # Oldest dumps are deleted beyond this
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # If set, /metrics requires "Authorization: Bearer <token>"
+
     WEB3AUTH_CLIENT_ID = os.environ.get('WEB3AUTH_CLIENT_ID')
     GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
     GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET')
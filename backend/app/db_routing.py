@@ -0,0 +1,69 @@
+# app/db_routing.py
+# Read-replica routing for db.session.
+#
+# Routes marked @read_only send their SELECTs to the 'replica' bind (SQLALCHEMY_BINDS) while
+# flushes, bulk UPDATE/DELETE and everything outside those routes stay on the primary.
+# After a signed-in user's request commits a write, their session remembers when; for
+# REPLICA_READ_YOUR_WRITES_SECONDS afterwards their read-only requests go to the primary
+# too, so replication lag never hides their own changes from them.
+import time
+from functools import wraps
+
+from flask import current_app, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_BIND = 'replica'
+LAST_WRITE_KEY = 'last_write_at'
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and self.info.get('use_replica') and not self._flushing
+                and getattr(clause, 'is_select', False)):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_flush(db_session, flush_context):
+    db_session.info['has_writes'] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _mark_bulk_write(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        orm_execute_state.session.info['has_writes'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _record_write(db_session):
+    # Only signed-in users get a read-your-writes window; stamping anonymous requests would
+    # hand every such visitor a session cookie
+    if db_session.info.pop('has_writes', False) and has_request_context() and 'user_id' in session:
+        session[LAST_WRITE_KEY] = time.time()
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _discard_write(db_session):
+    db_session.info.pop('has_writes', None)  # A rolled-back flush wrote nothing
+
+
+def use_replica():
+    """Routes this request's reads to the replica unless the user wrote recently."""
+    last_write = session.get(LAST_WRITE_KEY)
+    if last_write and time.time() - last_write < current_app.config['REPLICA_READ_YOUR_WRITES_SECONDS']:
+        return False
+    current_app.extensions['sqlalchemy'].session.info['use_replica'] = True
+    return True
+
+
+def read_only(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        use_replica()
+        return f(*args, **kwargs)
+
+    return decorated_function
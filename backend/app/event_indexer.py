@@ -1,174 +1,371 @@
 # app/event_indexer.py
+import sys
 import time
-import json
+import threading
 from web3 import Web3
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
-from .models import ActionLog  # Add other models for NFTMinted, NFTListed events
-from backend.app.config import Config
-from datetime import datetime
+from .models import ActionLog, IndexerState, MarketListing, NFTToken, NFTVersion
+from . import stats, blocks, chain, activity, action_logs
+from .config import Config
+from datetime import datetime, UTC
 import logging
-from pathlib import Path
 
-# Setup basic logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Importing this module has no side effects: the engine, Web3 client and contracts are created
+# on first use, so the web app and CLI can import the handlers without connecting anywhere.
 
 # --- Database Setup ---
-engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_session_factory = None
+_session_factory_lock = threading.Lock()
 
-# --- Web3 Setup ---
-w3 = Web3(Web3.HTTPProvider(Config.POLYGON_RPC_URL))
-if not w3.is_connected():
-    logging.error("Failed to connect to Polygon RPC for indexer.")
-    exit(1)
 
+def new_session():
+    global _session_factory
+    if _session_factory is None:
+        with _session_factory_lock:
+            if _session_factory is None:
+                engine = create_engine(Config.SQLALCHEMY_DATABASE_URI, **Config.SQLALCHEMY_ENGINE_OPTIONS)
+                _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    return _session_factory()
 
-def get_contract_abi(abi_path_key):
-    abi_path = getattr(Config, abi_path_key)
-    if not abi_path:
-        logging.error(f"{abi_path_key} not configured.")
-        return None
-    try:
-        with open(abi_path) as f:
-            return json.load(f)
-    except FileNotFoundError:
-        logging.error(f"ABI file not found: {abi_path}")
-        return None
-
-
-# Load ABIs
-action_logger_abi = Path(__file__).parent / "abi" / get_contract_abi('ACTION_LOGGER_CONTRACT_ABI_PATH')
-# nft_land_abi = get_contract_abi('NFT_LAND_CONTRACT_ABI_PATH')
-# nft_marketplace_abi = get_contract_abi('NFT_MARKETPLACE_CONTRACT_ABI_PATH')
-
-if not action_logger_abi:  # Add checks for other ABIs if indexing them
-    logging.error("Failed to load ActionLogger ABI. Exiting.")
-    exit(1)
 
-action_logger_address = Config.ACTION_LOGGER_CONTRACT_ADDRESS
-# nft_land_address = Config.NFT_LAND_CONTRACT_ADDRESS
-# nft_marketplace_address = Config.NFT_MARKETPLACE_CONTRACT_ADDRESS
+def get_block_timestamp(block_number):
+    # Events from the same block share one header fetch (see app/blocks.py)
+    return blocks.get_block_timestamp(chain.get_w3(), block_number)
 
-if not action_logger_address:  # Add checks for other addresses
-    logging.error("ActionLogger contract address not configured. Exiting.")
-    exit(1)
 
-action_logger_contract_instance = w3.eth.contract(address=Web3.to_checksum_address(action_logger_address),
-                                                  abi=action_logger_abi)
+def get_last_processed_block(db_session, stream_name='action_logger'):
+    # The last processed block is stored per contract in IndexerState so every stream resumes on its own
+    state = db_session.get(IndexerState, stream_name)
+    if state:
+        return state.last_block
+    if stream_name == 'action_logger':
+        # Databases indexed before IndexerState existed: resume from the newest ActionLog row
+        latest_log = db_session.query(ActionLog).order_by(ActionLog.block_number.desc()).first()
+        if latest_log and latest_log.block_number:
+            return latest_log.block_number
+    return max(Config.INDEXER_START_BLOCK - 1, 0)  # Or deployment block of the contract
 
 
-# Similarly for other contracts if you index their events:
-# nft_land_contract_instance = w3.eth.contract(address=Web3.to_checksum_address(nft_land_address), abi=nft_land_abi)
-# nft_marketplace_contract_instance = w3.eth.contract(address=Web3.to_checksum_address(nft_marketplace_address),
-# abi=nft_marketplace_abi)
+def set_last_processed_block(db_session, stream_name, block_number, caught_up=False):
+    state = db_session.get(IndexerState, stream_name)
+    if state is None:
+        state = IndexerState(name=stream_name)
+        db_session.add(state)
+    state.last_block = block_number
+    state.caught_up = caught_up
 
 
-def get_last_processed_block(db_session):
-    # Store the last processed block number in DB to resume from there
-    # Create a simple model for this if needed: e.g., IndexerState(event_name, last_block)
-    # For simplicity, querying the latest block from the ActionLog table
-    latest_log = db_session.query(ActionLog).order_by(ActionLog.block_number.desc()).first()
-    if latest_log and latest_log.block_number:
-        return latest_log.block_number
-    return 0  # Or deployment block of the contract
+def install_columns(engine):
+    """Adds caught_up to an indexer_state created before it existed. Safe to run on every start."""
+    existing = {column['name'] for column in inspect(engine).get_columns(IndexerState.__tablename__)}
+    if 'caught_up' not in existing:
+        with engine.begin() as conn:
+            # Existing streams count as backfilling until the indexer next reaches the head
+            conn.execute(text(f'ALTER TABLE {IndexerState.__tablename__} '
+                              f'ADD COLUMN caught_up BOOLEAN NOT NULL DEFAULT FALSE'))
 
 
 def process_action_logged_event(event, db_session):
     args = event['args']
     tx_hash = event['transactionHash'].hex()
+    fields = dict(
+        log_id_onchain=args.get('logId'),  # If your event has a logId field
+        user_address=args['user'],
+        action=args['action'],
+        details=args['details'],
+        timestamp=datetime.fromtimestamp(args['timestamp']),  # Ensure this matches your event's timestamp format
+        block_number=event['blockNumber'],
+        status=action_logs.CONFIRMED,
+    )
 
-    # Avoid duplicates
-    existing_log = db_session.query(ActionLog).filter_by(tx_hash=tx_hash, log_id_onchain=args.get(
-        'logId')).first()  # Assuming logId is part of event
+    # Keyed by tx hash: either already indexed, or the pending row log_action_on_chain wrote when it sent the tx
+    existing_log = db_session.query(ActionLog).filter_by(tx_hash=tx_hash).first()
     if existing_log:
-        logging.info(f"Log for tx {tx_hash} and logId {args.get('logId')} already processed.")
+        if existing_log.status == action_logs.CONFIRMED:
+            logging.info(f"Log for tx {tx_hash} already processed.")
+            return
+        previous_status = existing_log.status
+        for name, value in fields.items():
+            setattr(existing_log, name, value)
+        logging.info(f"Confirmed {previous_status} action log for tx {tx_hash}, Block {event['blockNumber']}")
         return
 
-    log_entry = ActionLog(
-        log_id_onchain=args.get('logId'),  # If your event has a logId field
-        user_address=args.user,
-        action=args.action,
-        details=args.details,
-        timestamp=datetime.fromtimestamp(args.timestamp),  # Ensure this matches your event's timestamp format
+    db_session.add(ActionLog(tx_hash=tx_hash, **fields))
+    logging.info(f"Indexed ActionLogged: User {args['user']}, Action {args['action']}, Block {event['blockNumber']}")
+
+
+# --- Marketplace events -> MarketListing ---
+def _market_topics(args, *addresses):
+    # Marketplace activity reaches the market topic, the parties and, for NFTLand tokens, the token
+    topics = [activity.MARKET_TOPIC] + [activity.owner_topic(address) for address in addresses]
+    if Config.NFT_LAND_CONTRACT_ADDRESS and \
+            Web3.to_checksum_address(args['nftContract']) == Web3.to_checksum_address(Config.NFT_LAND_CONTRACT_ADDRESS):
+        topics.append(activity.token_topic(args['tokenId']))
+    return topics
+
+
+def process_nft_listed_event(event, db_session):
+    args = event['args']
+    if db_session.get(MarketListing, args['listingId']):
+        logging.info(f"Listing {args['listingId']} already indexed.")
+        return
+
+    stats.bump(db_session, 'listings_created', 1, get_block_timestamp(event['blockNumber']))
+    stats.bump(db_session, 'active_listings', 1)
+    db_session.add(MarketListing(
+        listing_id=args['listingId'],
+        nft_contract=args['nftContract'],
+        token_id=args['tokenId'],
+        seller=args['seller'],
+        price_wei=args['price'],
+        status='active',
+        listed_block=event['blockNumber'],
+        tx_hash=event['transactionHash'].hex()
+    ))
+    activity.record(db_session, event, 'listed', _market_topics(args, args['seller']),
+                    listing_id=args['listingId'], nft_contract=args['nftContract'], token_id=args['tokenId'],
+                    seller=args['seller'], price_wei=str(args['price']))
+    logging.info(f"Indexed NFTListed: listing {args['listingId']}, token {args['tokenId']}, price {args['price']}")
+
+
+def _close_listing(event, db_session, status, **fields):
+    args = event['args']
+    listing = db_session.get(MarketListing, args['listingId'])
+    if listing is None:
+        # The listing predates the indexer's start block; keep a closed record of it anyway
+        listing = MarketListing(listing_id=args['listingId'], nft_contract=args['nftContract'],
+                                token_id=args['tokenId'], seller=args['seller'], price_wei=fields.get('price_wei'),
+                                listed_block=event['blockNumber'], tx_hash=event['transactionHash'].hex())
+        db_session.add(listing)
+    elif listing.status == 'active':
+        stats.bump(db_session, 'active_listings', -1)
+    was_closed = listing.status in ('sold', 'unlisted')
+    listing.status = status
+    listing.closed_block = event['blockNumber']
+    for name, value in fields.items():
+        setattr(listing, name, value)
+    return was_closed
+
+
+def process_nft_sold_event(event, db_session):
+    args = event['args']
+    already_sold = _close_listing(event, db_session, 'sold', buyer=args['buyer'], price_wei=args['price'],
+                                  commission_wei=args['commission'])
+    if not already_sold:
+        block_timestamp = get_block_timestamp(event['blockNumber'])
+        stats.bump(db_session, 'sales', 1, block_timestamp)
+        stats.bump(db_session, 'sales_volume_wei', args['price'], block_timestamp)
+        stats.bump(db_session, 'commission_wei', args['commission'], block_timestamp)
+    activity.record(db_session, event, 'sold', _market_topics(args, args['seller'], args['buyer']),
+                    listing_id=args['listingId'], nft_contract=args['nftContract'], token_id=args['tokenId'],
+                    seller=args['seller'], buyer=args['buyer'], price_wei=str(args['price']))
+    logging.info(f"Indexed NFTSold: listing {args['listingId']}, buyer {args['buyer']}, price {args['price']}")
+
+
+def process_nft_unlisted_event(event, db_session):
+    args = event['args']
+    _close_listing(event, db_session, 'unlisted')
+    activity.record(db_session, event, 'unlisted', _market_topics(args, args['seller']),
+                    listing_id=args['listingId'], nft_contract=args['nftContract'], token_id=args['tokenId'],
+                    seller=args['seller'])
+    logging.info(f"Indexed NFTUnlisted: listing {args['listingId']}")
+
+
+# --- NFTLand events -> NFTToken ---
+def _get_or_create_token(db_session, token_id):
+    # Cached token reads are keyed by the token's version (app/services.py), so nothing to invalidate here
+    token = db_session.get(NFTToken, token_id)
+    if token is None:
+        token = NFTToken(token_id=token_id, update_count=0)
+        db_session.add(token)
+    return token
+
+
+def _add_version(event, db_session, token_id, update_index, token_uri):
+    if db_session.get(NFTVersion, (token_id, update_index)):
+        return
+    db_session.add(NFTVersion(
+        token_id=token_id,
+        update_index=update_index,
+        token_uri=token_uri,
         block_number=event['blockNumber'],
-        tx_hash=tx_hash
-    )
-    db_session.add(log_entry)
+        tx_hash=event['transactionHash'].hex(),
+        timestamp=datetime.fromtimestamp(get_block_timestamp(event['blockNumber']), UTC).replace(tzinfo=None)
+    ))
+
+
+def process_transfer_event(event, db_session):
+    # Mints are transfers from the zero address, so this also creates the row of a new token
+    args = event['args']
+    token = _get_or_create_token(db_session, args['tokenId'])
+    token.owner = args['to']
+    activity.record(db_session, event, 'transfer',
+                    [activity.token_topic(args['tokenId']), activity.owner_topic(args['from']),
+                     activity.owner_topic(args['to'])],
+                    token_id=args['tokenId'], from_address=args['from'], to_address=args['to'])
+    logging.info(f"Indexed Transfer: token {args['tokenId']}, {args['from']} -> {args['to']}")
+
+
+def process_nft_minted_event(event, db_session):
+    args = event['args']
+    token = _get_or_create_token(db_session, args['tokenId'])
+    if token.minted_block is None:
+        stats.bump(db_session, 'nfts_minted', 1, get_block_timestamp(event['blockNumber']))
+        token.minted_block = event['blockNumber']
+        token.owner = token.owner or args['owner']
+    if token.update_count < 1:
+        token.token_data = args['data']
+        token.update_count = 1
+        token.updated_block = event['blockNumber']
+    _add_version(event, db_session, args['tokenId'], 0, args['data'])
+    activity.record(db_session, event, 'minted',
+                    [activity.token_topic(args['tokenId']), activity.owner_topic(args['owner'])],
+                    token_id=args['tokenId'], owner=args['owner'], token_uri=args['data'])
+    logging.info(f"Indexed NFTMinted: token {args['tokenId']}, owner {args['owner']}")
+
+
+def process_nft_updated_event(event, db_session):
+    args = event['args']
+    token = _get_or_create_token(db_session, args['genesisTokenId'])
+    if args['updateIndex'] >= token.update_count:  # Ignore an update that was already applied
+        stats.bump(db_session, 'nft_updates', 1, get_block_timestamp(event['blockNumber']))
+        token.token_data = args['updatedData']
+        token.update_count = args['updateIndex'] + 1
+        token.updated_block = event['blockNumber']
+    _add_version(event, db_session, args['genesisTokenId'], args['updateIndex'], args['updatedData'])
+    topics = [activity.token_topic(args['genesisTokenId'])]
+    if token.owner:
+        topics.append(activity.owner_topic(token.owner))
+    activity.record(db_session, event, 'updated', topics, token_id=args['genesisTokenId'],
+                    update_index=args['updateIndex'], token_uri=args['updatedData'])
+    logging.info(f"Indexed NFTUpdated: token {args['genesisTokenId']}, update {args['updateIndex']}")
+
+
+# Each stream is one contract: its logs are fetched with a single eth_getLogs per block range,
+# decoded by topic and dispatched to the handler registered for the event name. Streams are
+# named after the contracts in app/chain.py, whose instances are built on first use.
+STREAMS = {
+    'action_logger': {
+        'ActionLogged': process_action_logged_event,
+    },
+    'nft_marketplace': {
+        'NFTListed': process_nft_listed_event,
+        'NFTSold': process_nft_sold_event,
+        'NFTUnlisted': process_nft_unlisted_event,
+    },
+    'nft_land': {
+        'Transfer': process_transfer_event,
+        'NFTMinted': process_nft_minted_event,
+        'NFTUpdated': process_nft_updated_event,
+    },
+}
+
+
+# Streams whose handlers need block timestamps; their headers are prefetched per range
+TIMESTAMPED_STREAMS = {'nft_marketplace', 'nft_land'}
+
+
+def fetch_logs(contract, from_block, to_block):
+    return chain.get_w3().eth.get_logs({'address': contract.address, 'fromBlock': from_block, 'toBlock': to_block})
+
+
+def decode_logs(contract, handlers, raw_logs):
+    # Returns (event, handler) pairs in chain order; logs of events nobody handles are skipped
+    events_by_topic = {}
+    for event_name, handler in handlers.items():
+        event = getattr(contract.events, event_name)()
+        events_by_topic[event.topic] = (event, handler)
+
+    decoded = []
+    for raw_log in sorted(raw_logs, key=lambda log: (log['blockNumber'], log['logIndex'])):
+        topic = Web3.to_hex(raw_log['topics'][0]) if raw_log['topics'] else None
+        if topic not in events_by_topic:
+            continue
+        event, handler = events_by_topic[topic]
+        decoded.append((event.process_log(raw_log), handler))
+    return decoded
+
+
+def index_block_range(stream_name, from_block, to_block, db_session, head=None):
+    """Indexes one block range of a stream and records progress in the same transaction. The
+    stream counts as caught up (see services.index_available) when the range ends at `head`."""
+    contract, handlers = chain.get_contract(stream_name), STREAMS[stream_name]
+    raw_logs = fetch_logs(contract, from_block, to_block)
+    decoded = decode_logs(contract, handlers, raw_logs)
+    if stream_name in TIMESTAMPED_STREAMS:
+        blocks.prefetch(chain.get_w3(), [event['blockNumber'] for event, _ in decoded])
+    for event, handler in decoded:
+        handler(event, db_session)
+        db_session.flush()
+    set_last_processed_block(db_session, stream_name, to_block, caught_up=head is not None and to_block >= head)
     db_session.commit()
-    logging.info(f"Indexed ActionLogged: User {args.user}, Action {args.action}, Block {event['blockNumber']}")
+    return len(raw_logs)
+
 
+def check_configuration():
+    """Connects to the RPC endpoint and builds every stream's contract; returns False if any is missing."""
+    w3 = chain.get_w3()
+    if w3 is None or not w3.is_connected():
+        logging.error("Failed to connect to Polygon RPC for indexer.")
+        return False
+    missing = [stream_name for stream_name in STREAMS if chain.get_contract(stream_name) is None]
+    if missing:
+        logging.error(f"Contracts not configured or ABIs missing for: {', '.join(missing)}")
+        return False
+    return True
 
-# You would create similar process_event functions for NFTMinted, NFTListed, NFTSold, etc.
-# and store them in their respective database tables (e.g., IndexedNFT, IndexedListing).
 
 def listen_for_events():
-    db_session = SessionLocal()
+    db_session = new_session()
     try:
-        # For ActionLogger events
-        last_block_action_logger = get_last_processed_block(db_session)  # Adjust starting block
-        # You might want to start from a contract deployment block or a known recent block for the first run
-        # For robust production, store the last processed block PER CONTRACT/EVENT in a dedicated table.
-        # If the last_block_action_logger is 0, you might want to set it to a recent block or contract deployment block.
-        # For this example, if it's 0, it means it will scan from block 0, which is very slow.
-        # Better to initialize `last_block_action_logger` to `w3.eth.block_number - N` or contract deployment block.
-        if last_block_action_logger == 0:
-            # Heuristic: start from a recent block or contract deployment if known
-            # contract_deployment_block = 12 34 56 # Replace with actual
-            # last_block_action_logger = max(contract_deployment_block, w3.eth.block_number - 1000)
-            pass  # For this example, will proceed, but be aware of scanning from genesis.
-
-        logging.info(f"Starting event listener for ActionLogger from block {last_block_action_logger + 1}")
-        # Add similar logic for other contracts/events (NFTLand, NFTMarketplace)
-
-        action_logged_event_filter = action_logger_contract_instance.events.ActionLogged.create_filter(
-            fromBlock=last_block_action_logger + 1
-        )
-        # nft_minted_filter = nft_land_contract_instance.events.NFTMinted.create_filter(...)
-        # nft_listed_filter = nft_marketplace_contract_instance.events.NFTListed.create_filter(...)
+        for stream_name in STREAMS:
+            # If no progress is stored, indexing starts at INDEXER_START_BLOCK (set it to the contract
+            # deployment block; scanning from genesis is very slow).
+            logging.info(f"Starting event listener for {stream_name} from block "
+                         f"{get_last_processed_block(db_session, stream_name) + 1}")
 
         while True:
             try:
-                for event in action_logged_event_filter.get_new_entries():
-                    process_action_logged_event(event, db_session)
+                head = chain.get_w3().eth.block_number - Config.INDEXER_CONFIRMATIONS
+                caught_up = True
+                for stream_name in STREAMS:
+                    from_block = get_last_processed_block(db_session, stream_name) + 1
+                    if from_block > head:
+                        continue
+                    # Bounded ranges keep each eth_getLogs call under provider limits
+                    to_block = min(head, from_block + Config.INDEXER_BATCH_SIZE - 1)
+                    index_block_range(stream_name, from_block, to_block, db_session, head)
+                    caught_up = caught_up and to_block == head
 
-                # for event in nft_minted_filter.get_new_entries():
-                #     process_nft_minted_event(event, db_session) # Implement this
-                # for event in nft_listed_filter.get_new_entries():
-                #     process_nft_listed_event(event, db_session) # Implement this
+                if not caught_up:
+                    continue  # Backfilling: fetch the next range right away
 
-                # Update last processed block periodically, not necessarily after each event batch
-                # current_highest_block_processed = max([e['blockNumber'] for e in new_action_logs],
-                # default=last_block_action_logger)
-                # if current_highest_block_processed > last_block_action_logger:
-                #    last_block_action_logger = current_highest_block_processed
-                #    # Persist this new last_block_action_logger
+                activity.prune(db_session, Config.ACTIVITY_RETENTION_HOURS)
+                action_logs.sweep(db_session, chain.get_w3(), Config.ACTION_LOG_PENDING_TIMEOUT_SECONDS)
+                db_session.commit()
 
             except Exception as e:
                 logging.error(f"Error in event polling loop: {e}")
-                # Recreate a filter if it becomes invalid due to RPC issues, etc.
+                db_session.rollback()  # Roll back the partial range; it is fetched again from the stored block
                 time.sleep(10)  # Wait before retrying
-                # Re-initialize filter (careful with fromBlock to avoid missing events or reprocessing)
-                # A robust solution might need to re-check connection and re-create the filter
-                # from the last successfully processed block number.
-                db_session.rollback()  # Roll back any partial commits from this iteration
-                # Reconnect or re-initialize if necessary
-                w3_check = Web3(Web3.HTTPProvider(Config.POLYGON_RPC_URL))
-                if not w3_check.is_connected():
-                    logging.error("Indexer lost RPC connection. Attempting to reconnect...")
-                    # Recreate filters based on the last known processed block
-                    action_logged_event_filter = action_logger_contract_instance.events.ActionLogged.create_filter(
-                        fromBlock=get_last_processed_block(db_session) + 1  # Ensure this is correct
-                    )
-
-            time.sleep(15)  # Poll every 15 seconds
+                continue
+
+            time.sleep(Config.INDEXER_POLL_INTERVAL)  # Poll every 15 seconds by default
     finally:
         db_session.close()
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     logging.info("Starting blockchain event indexer...")
+    if not check_configuration():
+        logging.error("Indexer configuration incomplete. Exiting.")
+        sys.exit(1)
     # Ensure DB schema is created (Flask app does this, but indexer might run standalone)
-    # from app.models import Base # if using declarative base for SQLAlchemy
-    # Base.metadata.create_all(bind=engine) # If needed
+    from . import db
+    session = new_session()
+    db.metadata.create_all(bind=session.get_bind())
+    install_columns(session.get_bind())
+    session.close()
     listen_for_events()
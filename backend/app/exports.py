@@ -0,0 +1,56 @@
+# app/exports.py
+# Streaming exports of ActionLog rows. Rows are read through a server-side cursor (yield_per)
+# and written out in batches, so memory stays constant however many rows are exported.
+import csv
+import io
+import json
+
+EXPORT_BATCH_SIZE = 1000
+
+ACTION_LOG_FIELDS = ["id", "log_id_onchain", "user_address", "action", "details", "timestamp",
+                     "block_number", "tx_hash", "status"]
+
+
+def action_log_to_dict(log):
+    return {
+        "id": log.id, "log_id_onchain": log.log_id_onchain, "user_address": log.user_address,
+        "action": log.action, "details": log.details,
+        "timestamp": log.timestamp.isoformat() if log.timestamp else None,
+        "block_number": log.block_number, "tx_hash": log.tx_hash, "status": log.status
+    }
+
+
+def _batched(rows, batch_size=EXPORT_BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_ndjson(rows):
+    # `rows` yields dicts; one JSON document per line
+    for batch in _batched(rows):
+        yield "".join(json.dumps(row, default=str) + "\n" for row in batch)
+
+
+def stream_csv(rows, fieldnames=ACTION_LOG_FIELDS):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+    writer.writeheader()
+    yield buffer.getvalue()
+
+    for batch in _batched(rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+def iter_action_logs(query):
+    # yield_per streams from a server-side cursor instead of loading the result set
+    for log in query.yield_per(EXPORT_BATCH_SIZE):
+        yield action_log_to_dict(log)
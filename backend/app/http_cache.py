@@ -0,0 +1,39 @@
+# app/http_cache.py
+# Conditional GET (ETag / If-None-Match) and Cache-Control for read endpoints.
+#
+# @conditional(etag_func, cache_control_setting) computes the validator with
+# etag_func(**view_args) *before* the view runs. etag_func must be cheap (an indexed row, a
+# config value, one contract call); when it matches If-None-Match the view is skipped and a
+# 304 is returned. etag_func returns None when it cannot tell (no index yet, unknown token),
+# and the view then runs without a validator. Only 200 responses get the headers.
+import hashlib
+from functools import wraps
+
+from flask import current_app, request, make_response
+
+
+def make_etag(*parts):
+    """Opaque validator for the state described by `parts` (block numbers, counts, config values)."""
+    return hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+
+
+def conditional(etag_func, cache_control_setting):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            etag = etag_func(**kwargs)
+            if etag is not None and request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response  # Errors are neither validated nor cached
+            if etag is not None:
+                # Weak: the tag names the underlying state, not the exact bytes of the body
+                response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = current_app.config[cache_control_setting]
+            return response
+
+        return decorated_function
+
+    return decorator
@@ -0,0 +1,63 @@
+# app/identity.py
+# Cached identity (id, email, wallet, is_admin) of the logged-in user.
+#
+# admin_required, /auth/status and /user/profile used to load the User row on every request.
+# The identity is now cached per request (flask.g) and in the shared cache (app/cache.py) for
+# IDENTITY_CACHE_TTL seconds. Any committed change to a User row drops that user's entry, so
+# profile and role changes apply immediately (with a local cache backend, other processes
+# pick them up within the TTL).
+from flask import current_app, g, session, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import db, cache
+from .models import User
+
+
+def _load(user_id):
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    return {"id": user.id, "email": user.email, "wallet_address": user.wallet_address, "is_admin": bool(user.is_admin)}
+
+
+def get_identity(user_id):
+    """Identity dict for `user_id`, or None if there is no such user."""
+    return cache.get_or_set('identity', user_id, lambda: _load(user_id), current_app.config['IDENTITY_CACHE_TTL'])
+
+
+def current_identity():
+    """Identity of the logged-in user, loaded at most once per request."""
+    user_id = session.get('user_id')
+    if user_id is None:
+        return None
+    if g.get('identity_user_id') != user_id:
+        g.identity = get_identity(user_id)
+        g.identity_user_id = user_id
+    return g.identity
+
+
+def forget(user_id):
+    cache.invalidate('identity', user_id)
+    if has_app_context() and g.get('identity_user_id') == user_id:
+        g.pop('identity_user_id')
+
+
+# Invalidate after commit rather than at flush, so a concurrent request cannot re-cache
+# the row as it was before the transaction finished.
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_users(db_session, flush_context):
+    changed = {obj.id for obj in list(db_session.dirty) + list(db_session.deleted) if isinstance(obj, User)}
+    if changed:
+        db_session.info.setdefault('changed_user_ids', set()).update(changed)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_users(db_session):
+    for user_id in db_session.info.pop('changed_user_ids', ()):
+        forget(user_id)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_changed_users(db_session, previous_transaction):
+    db_session.info.pop('changed_user_ids', None)
@@ -0,0 +1,58 @@
+# app/images.py
+# Web-optimised derivatives of the uploaded parcel image. Listing cards and the
+# "my NFTs" grid use these instead of downloading the multi-megabyte original.
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+# name -> (longest edge in px, Pillow format, file extension, content type)
+DERIVATIVES = {
+    "thumbnail": (320, "WEBP", ".webp", "image/webp"),
+    "thumbnail_jpeg": (320, "JPEG", ".jpg", "image/jpeg"),  # For clients without WebP support
+    "preview": (1280, "WEBP", ".webp", "image/webp"),
+}
+
+_executor = None
+
+
+def _get_executor(max_workers):
+    # Pillow releases the GIL while resampling and encoding, so threads give real parallelism
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-derivatives")
+    return _executor
+
+
+def _render(image, max_edge, image_format):
+    resized = image.copy()
+    resized.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)  # Never upscales
+    if image_format == "JPEG" and resized.mode not in ("RGB", "L"):
+        resized = resized.convert("RGB")
+
+    out = io.BytesIO()
+    resized.save(out, format=image_format, quality=80, optimize=True)
+    return out.getvalue()
+
+
+def generate_image_derivatives(file_storage, max_workers=4):
+    """Returns {name: (filename, bytes, content_type)} for every entry in DERIVATIVES.
+
+    The upload stream is rewound afterwards so the original can still be pinned.
+    Raises the underlying Pillow error if the upload is not a decodable image.
+    """
+    stream = file_storage.stream
+    stream.seek(0)
+    try:
+        image = Image.open(io.BytesIO(stream.read()))
+        image = ImageOps.exif_transpose(image)  # Phone photos carry their rotation in EXIF
+        image.load()
+    finally:
+        stream.seek(0)
+
+    executor = _get_executor(max_workers)
+    futures = {name: executor.submit(_render, image, max_edge, image_format)
+               for name, (max_edge, image_format, _, _) in DERIVATIVES.items()}
+
+    return {name: (f"image_{name}{DERIVATIVES[name][2]}", future.result(), DERIVATIVES[name][3])
+            for name, future in futures.items()}
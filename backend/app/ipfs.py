@@ -1,13 +1,26 @@
+import json
+import time
 import requests
 from werkzeug.datastructures import FileStorage
 from dotenv import load_dotenv
 import os
 
+from .profiling import record_ipfs
+
 load_dotenv()
 
 # Pinata API credentials
 PINATA_API_KEY = os.environ.get('PINATA_API_KEY')
 PINATA_SECRET_API_KEY = os.environ.get('PINATA_SECRET_API_KEY')
+PINATA_API_URL = os.environ.get('PINATA_API_URL', 'https://api.pinata.cloud')  # Point at a stub for local runs
+
+
+def _post(url, **kwargs):
+    # Every pin goes through here so request profiling can attribute its time and size (app/profiling.py)
+    started = time.perf_counter()
+    response = requests.post(url, **kwargs)
+    record_ipfs(time.perf_counter() - started, len(response.request.body or b''))
+    return response
 
 
 def upload_json(data: dict) -> str:
@@ -19,10 +32,10 @@ def upload_json(data: dict) -> str:
     }
 
     # Set the endpoint
-    url = "https://api.pinata.cloud/pinning/pinJSONToIPFS"
+    url = f"{PINATA_API_URL}/pinning/pinJSONToIPFS"
 
     # Send request
-    response = requests.post(url, headers=headers, json={"pinataContent": data})
+    response = _post(url, headers=headers, json={"pinataContent": data})
 
     # Output the IPFS hash
     if response.status_code == 200:
@@ -33,7 +46,7 @@ def upload_json(data: dict) -> str:
 
 def upload_file(file: FileStorage) -> str:
     # API endpoint
-    url = 'https://api.pinata.cloud/pinning/pinFileToIPFS'
+    url = f'{PINATA_API_URL}/pinning/pinFileToIPFS'
 
     # Headers (note: no 'Content-Type' when uploading files!)
     headers = {
@@ -45,7 +58,34 @@ def upload_file(file: FileStorage) -> str:
         'file': (file.filename, file.stream)
     }
 
-    response = requests.post(url, files=files, headers=headers)
+    response = _post(url, files=files, headers=headers)
+
+    if response.status_code == 200:
+        return response.json()['IpfsHash']
+    else:
+        return f"error: {response.status_code}, {response.text}"
+
+
+def upload_directory(dir_name: str, entries: list) -> str:
+    # Pins several files as one directory DAG in a single request.
+    # `entries` is a list of (relative_path, stream_or_bytes, content_type); the returned
+    # hash is the directory CID, so files resolve as ipfs://<hash>/<relative_path>.
+    url = f'{PINATA_API_URL}/pinning/pinFileToIPFS'
+
+    headers = {
+        'pinata_api_key': PINATA_API_KEY,
+        'pinata_secret_api_key': PINATA_SECRET_API_KEY
+    }
+
+    # Pinata builds the directory from the path prefix shared by every part
+    files = [('file', (f"{dir_name}/{relative_path}", content, content_type))
+             for relative_path, content, content_type in entries]
+    data = {
+        'pinataMetadata': json.dumps({"name": dir_name}),
+        'pinataOptions': json.dumps({"cidVersion": 1, "wrapWithDirectory": False})
+    }
+
+    response = _post(url, files=files, data=data, headers=headers)
 
     if response.status_code == 200:
         return response.json()['IpfsHash']
@@ -0,0 +1,189 @@
+# app/jobs.py
+# Background job subsystem for the slow, multi-upload mint preparation pipeline.
+#
+# The web request only persists the form and files and enqueues a MintJob row; job workers
+# (threads inside the web process and/or `flask run-job-worker` processes) claim queued jobs
+# from the database and run the pipeline. Clients poll /jobs/<id> for the result.
+import json
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+from pathlib import Path
+
+from flask import current_app
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+
+from . import db
+from .models import MintJob
+from .minting import prepare_mint_metadata, MintPreparationError, REQUIRED_MINT_FILES
+
+FINISHED_STATUSES = ('succeeded', 'failed')
+
+
+def _job_dir(job_id):
+    return Path(current_app.config['JOB_STORAGE_DIR']) / job_id
+
+
+def enqueue_mint_preparation(form, files, user_id=None):
+    """Persists the submitted form and files to disk and queues a MintJob for the workers."""
+    job_id = uuid.uuid4().hex
+    job_dir = _job_dir(job_id)
+    job_dir.mkdir(parents=True, exist_ok=True)
+
+    stored_files = {}
+    for field in REQUIRED_MINT_FILES:
+        file = files[field]
+        filename = file.filename or field
+        path = job_dir / f"{field}-{secure_filename(filename) or field}"
+        file.save(path)
+        stored_files[field] = {"path": str(path), "filename": filename, "content_type": file.content_type}
+
+    job = MintJob(
+        id=job_id,
+        kind='prepare_mint',
+        status='queued',
+        user_id=user_id,
+        payload=json.dumps({"form": form.to_dict() if hasattr(form, 'to_dict') else dict(form),
+                            "files": stored_files}),
+        created_at=datetime.now(UTC)
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def job_to_dict(job):
+    data = {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if job.status == 'succeeded' and job.result:
+        data["result"] = json.loads(job.result)
+    if job.status == 'failed':
+        data["error"] = job.error
+    return data
+
+
+def fail_stale_jobs():
+    """Fails jobs left 'running' for longer than JOB_RUNNING_TIMEOUT, i.e. whose worker died
+    (a deploy, an OOM kill). Their files are removed; the client resubmits."""
+    cutoff = datetime.now(UTC) - timedelta(seconds=current_app.config['JOB_RUNNING_TIMEOUT'])
+    stale = (MintJob.query.with_entities(MintJob.id)
+             .filter(MintJob.status == 'running', MintJob.started_at < cutoff)
+             .limit(100)
+             .all())
+    failed = 0
+    for (job_id,) in stale:
+        # Conditional, like claiming: the job may have finished since it was read
+        if (MintJob.query
+                .filter(MintJob.id == job_id, MintJob.status == 'running', MintJob.started_at < cutoff)
+                .update({"status": 'failed', "status_code": 500, "error": "The job worker stopped before finishing",
+                         "finished_at": datetime.now(UTC)}, synchronize_session=False)):
+            failed += 1
+            shutil.rmtree(_job_dir(job_id), ignore_errors=True)
+    db.session.commit()
+    if failed:
+        current_app.logger.warning(f"Failed {failed} mint preparation job(s) abandoned by their worker")
+    return failed
+
+
+def claim_next_job():
+    # Atomically move the oldest queued job to 'running'. The conditional UPDATE makes this
+    # safe with several worker processes polling the same table.
+    candidates = (MintJob.query.with_entities(MintJob.id)
+                  .filter_by(status='queued')
+                  .order_by(MintJob.created_at)
+                  .limit(5)
+                  .all())
+    for (job_id,) in candidates:
+        claimed = (MintJob.query
+                   .filter_by(id=job_id, status='queued')
+                   .update({"status": 'running', "started_at": datetime.now(UTC)}, synchronize_session=False))
+        db.session.commit()
+        if claimed:
+            return db.session.get(MintJob, job_id)
+    return None
+
+
+def run_job(job):
+    payload = json.loads(job.payload)
+    opened = {}
+    try:
+        for field, info in payload["files"].items():
+            opened[field] = FileStorage(stream=open(info["path"], 'rb'), filename=info["filename"],
+                                        content_type=info["content_type"])
+
+        token_uri = prepare_mint_metadata(payload["form"], opened)
+        job.status = 'succeeded'
+        job.status_code = 200
+        job.result = json.dumps({"token_uri": token_uri,
+                                 "message": "Metadata successfully prepared and uploaded to IPFS."})
+    except MintPreparationError as e:
+        job.status = 'failed'
+        job.status_code = e.status_code
+        job.error = str(e)
+    except Exception as e:
+        current_app.logger.error(f"Mint preparation job {job.id} failed: {e}")
+        job.status = 'failed'
+        job.status_code = 500
+        job.error = str(e)
+    finally:
+        for file in opened.values():
+            file.stream.close()
+
+    job.finished_at = datetime.now(UTC)
+    db.session.commit()
+    shutil.rmtree(_job_dir(job.id), ignore_errors=True)
+    current_app.logger.info(f"Mint preparation job {job.id} finished with status {job.status}")
+
+
+def run_worker(app, stop_event=None):
+    """Claims and runs queued jobs until `stop_event` is set (or forever)."""
+    poll_interval = app.config['JOB_POLL_INTERVAL']
+    with app.app_context():
+        while not (stop_event and stop_event.is_set()):
+            try:
+                job = claim_next_job()
+            except Exception as e:
+                app.logger.error(f"Job worker could not claim a job: {e}")
+                db.session.rollback()
+                job = None
+
+            if job is None:
+                try:
+                    fail_stale_jobs()  # Only while idle: a cheap indexed query
+                except Exception as e:
+                    app.logger.error(f"Job worker could not fail stale jobs: {e}")
+                    db.session.rollback()
+                db.session.remove()
+                time.sleep(poll_interval)
+                continue
+            run_job(job)
+
+
+def start_worker_threads(app):
+    # In-process workers, handy for single-process deployments. Dedicated
+    # `flask run-job-worker` processes scale independently of the web workers.
+    stop_event = threading.Event()
+    for i in range(app.config['JOB_WORKER_THREADS']):
+        thread = threading.Thread(target=run_worker, args=(app, stop_event), name=f"job-worker-{i}", daemon=True)
+        thread.start()
+    return stop_event
+
+
+def wait_for_job(job_id, timeout):
+    # Long-poll helper: re-reads the job until it finishes or `timeout` seconds pass
+    deadline = time.monotonic() + timeout
+    job = db.session.get(MintJob, job_id)
+    while job and job.status not in FINISHED_STATUSES and time.monotonic() < deadline:
+        time.sleep(current_app.config['JOB_POLL_INTERVAL'])
+        db.session.expire(job)
+        job = db.session.get(MintJob, job_id)
+    return job
@@ -0,0 +1,211 @@
+# app/minting.py
+import io
+import json
+from pathlib import Path
+from flask import current_app
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+
+from .ipfs import upload_file, upload_json, upload_directory
+from .images import generate_image_derivatives
+
+REQUIRED_MINT_FIELDS = [
+    'title', 'description', 'external_url', 'plot_id', 'address',
+    'google_maps_location', 'size', 'land_use', 'ownership_verified',
+    'geo_coordinates', 'survey_number', 'owner_name', 'user_doc_html_content',
+    'sale_history_url', 'zone_classification',
+    'tokenization_date', 'minter_address'
+]
+
+REQUIRED_MINT_FILES = [
+    'image', 'ownership_document', 'encumbrances'
+]
+
+# Metadata updates may keep a file: the form field holding its current URL, per file
+EXISTING_FILE_URL_FIELDS = {
+    'image': 'existing_image_url',
+    'ownership_document': 'existing_ownership_doc_url',
+    'encumbrances': 'existing_encumbrances_url',
+}
+
+
+class MintPreparationError(Exception):
+    """Raised when one of the pinning steps fails. Carries the HTTP status the route should return."""
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def validate_mint_request(form, files):
+    # Returns an error message, or None if the form is complete
+    if not form:
+        return "Missing form data"
+    for field in REQUIRED_MINT_FIELDS:
+        if field not in form:
+            return f"Missing form field: {field}"
+    for file in REQUIRED_MINT_FILES:
+        if file not in files:
+            return f"Missing file {file}"
+    return None
+
+
+def build_user_doc_file(user_doc_html_content):
+    # Wrap the rich text content in a minimal HTML document.
+    # Pinata's upload_file expects a filename, so hand it a FileStorage.
+    html_file_content = f"<html><head><meta charset=\"UTF-8\"></head><body>{user_doc_html_content}</body></html>"
+    html_file_bytes = io.BytesIO(html_file_content.encode('utf-8'))
+    return FileStorage(stream=html_file_bytes, filename="user_document.html", content_type="text/html")
+
+
+def build_image_derivatives(image_file):
+    # Thumbnails and a preview for listing grids; a failure here never blocks the mint
+    if not current_app.config.get('IMAGE_DERIVATIVES_ENABLED', True):
+        return {}
+    try:
+        return generate_image_derivatives(image_file, current_app.config.get('IMAGE_DERIVATIVE_WORKERS', 4))
+    except Exception as e:
+        current_app.logger.warning(f"Could not generate image derivatives for {image_file.filename}: {e}")
+        return {}
+
+
+def build_mint_metadata(form, image_url, ownership_doc_url, user_doc_url, encumbrances_url, image_derivatives=None):
+    metadata = {
+        "title": form['title'],
+        "description": form['description'],
+        "image": image_url,
+        "external_url": form['external_url'],
+        "attributes": [
+            {"trait_type": "Plot ID", "value": form['plot_id']},
+            {"trait_type": "Address", "value": form['address']},
+            {"trait_type": "Google Maps Location", "value": form['google_maps_location']},
+            {"trait_type": "Size", "value": form['size']},
+            {"trait_type": "Land Use", "value": form['land_use']},
+            {"trait_type": "Ownership Verified", "value": form['ownership_verified']},
+            {"trait_type": "Geo Coordinates", "value": form['geo_coordinates']},
+            {"trait_type": "Survey Number", "value": form['survey_number']}
+        ],
+        "land_metadata": {
+            "owner_name": form['owner_name'],
+            "ownership_doc_url": ownership_doc_url,
+            "user_doc_url": user_doc_url,
+            "sale_history_url": form['sale_history_url'],
+            "zone_classification": form['zone_classification'],
+            "encumbrances": encumbrances_url,
+            "tokenization_date": form['tokenization_date']
+        }
+    }
+    if image_derivatives:
+        metadata["image_derivatives"] = image_derivatives
+    return metadata
+
+
+def _keeps_existing(files, field, existing_urls):
+    # An update that sent no file (or an empty file input) for `field` keeps the current one
+    return existing_urls is not None and (field not in files or not files[field].filename)
+
+
+def _pin_file(files, field, label, existing_urls):
+    if _keeps_existing(files, field, existing_urls):
+        return existing_urls[field]
+    ipfs_hash = upload_file(files[field])
+    if "error:" in ipfs_hash:
+        raise MintPreparationError(f"{label} upload failed: {ipfs_hash}", 400)
+    return f"ipfs://{ipfs_hash}"
+
+
+def prepare_mint_metadata(form, files, package=None, existing_urls=None):
+    """Pins the mint assets and metadata JSON to IPFS and returns the final token URI.
+
+    `form` is any mapping with the REQUIRED_MINT_FIELDS and `files` maps the
+    REQUIRED_MINT_FILES to FileStorage objects, so this runs the same way inside
+    a request or inside a background job worker. `package` defaults to the
+    IPFS_PACKAGE_MINT_ASSETS setting. For a metadata update, `existing_urls` maps
+    the REQUIRED_MINT_FILES to their current URLs, kept for files not resubmitted.
+    """
+    if package is None:
+        package = current_app.config.get('IPFS_PACKAGE_MINT_ASSETS', False)
+    if package and existing_urls is None:  # Kept files live outside any new package
+        return prepare_packaged_mint_metadata(form, files)
+
+    # 1-3. Upload the image, ownership document and encumbrances document to IPFS
+    image_url = _pin_file(files, 'image', "Image", existing_urls)
+    ownership_doc_url = _pin_file(files, 'ownership_document', "Ownership document", existing_urls)
+    encumbrances_url = _pin_file(files, 'encumbrances', "Encumbrances", existing_urls)
+
+    # 4. Create HTML file from rich text content and upload to IPFS
+    user_doc_ipfs_hash = upload_file(build_user_doc_file(form['user_doc_html_content']))
+    if "error:" in user_doc_ipfs_hash:
+        raise MintPreparationError(f"User document HTML upload failed: {user_doc_ipfs_hash}")
+
+    # 5. Generate and upload the image derivatives (thumbnails, preview) of a new image
+    derivative_urls = {}
+    derivatives = {} if _keeps_existing(files, 'image', existing_urls) else build_image_derivatives(files['image'])
+    for name, (filename, content, content_type) in derivatives.items():
+        derivative_hash = upload_file(FileStorage(stream=io.BytesIO(content), filename=filename,
+                                                  content_type=content_type))
+        if "error:" in derivative_hash:
+            current_app.logger.warning(f"Image derivative {name} upload failed: {derivative_hash}")
+            continue
+        derivative_urls[name] = f"ipfs://{derivative_hash}"
+
+    # 6. Construct metadata JSON
+    metadata = build_mint_metadata(
+        form,
+        image_url=image_url,
+        ownership_doc_url=ownership_doc_url,
+        user_doc_url=f"ipfs://{user_doc_ipfs_hash}",
+        encumbrances_url=encumbrances_url,
+        image_derivatives=derivative_urls,
+    )
+
+    # 7. Upload metadata JSON to IPFS
+    metadata_ipfs_hash = upload_json(metadata)
+    if "error:" in metadata_ipfs_hash:
+        raise MintPreparationError(f"Metadata JSON upload failed: {metadata_ipfs_hash}")
+
+    # The minter_address is received but used later by prepare_mint_tx typically
+    return f"ipfs://{metadata_ipfs_hash}"
+
+
+def _package_path(name, file):
+    # Keep the original extension so gateways serve a sensible content type
+    return f"{name}{Path(file.filename or '').suffix.lower()}"
+
+
+def prepare_packaged_mint_metadata(form, files):
+    """Pins all mint assets and the metadata JSON as one directory in a single request.
+
+    The metadata references its siblings by relative path, and the token URI
+    points at ipfs://<directory>/metadata.json.
+    """
+    image_path = _package_path('image', files['image'])
+    ownership_doc_path = _package_path('ownership_document', files['ownership_document'])
+    encumbrances_path = _package_path('encumbrances', files['encumbrances'])
+    user_doc_file = build_user_doc_file(form['user_doc_html_content'])
+    derivatives = build_image_derivatives(files['image'])
+
+    metadata = build_mint_metadata(
+        form,
+        image_url=image_path,
+        ownership_doc_url=ownership_doc_path,
+        user_doc_url=user_doc_file.filename,
+        encumbrances_url=encumbrances_path,
+        image_derivatives={name: filename for name, (filename, _, _) in derivatives.items()},
+    )
+
+    entries = [
+        (image_path, files['image'].stream, files['image'].content_type),
+        (ownership_doc_path, files['ownership_document'].stream, files['ownership_document'].content_type),
+        (encumbrances_path, files['encumbrances'].stream, files['encumbrances'].content_type),
+        (user_doc_file.filename, user_doc_file.stream, user_doc_file.content_type),
+        *derivatives.values(),
+        ("metadata.json", json.dumps(metadata).encode('utf-8'), "application/json"),
+    ]
+    dir_name = f"landchain-plot-{secure_filename(form['plot_id']) or 'mint'}"
+
+    directory_hash = upload_directory(dir_name, entries)
+    if "error:" in directory_hash:
+        raise MintPreparationError(f"Mint package upload failed: {directory_hash}")
+
+    return f"ipfs://{directory_hash}/metadata.json"
@@ -1,9 +1,34 @@
 from . import db
 from werkzeug.security import generate_password_hash, check_password_hash
+from decimal import Decimal
 import pyotp  # For OTP
 import time
 
 
+class Wei(db.TypeDecorator):
+    """Non-negative uint256 amounts, exact on every database: NUMERIC(78, 0) where decimals are
+    exact, and on SQLite (whose NUMERIC binds through float above 2**53) a zero-padded string,
+    which still compares and sorts numerically. Values load as Decimal either way."""
+    impl = db.Numeric(78, 0)
+    cache_ok = True
+    DIGITS = 78
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'sqlite':
+            return dialect.type_descriptor(db.String(self.DIGITS))
+        return dialect.type_descriptor(db.Numeric(self.DIGITS, 0))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name != 'sqlite':
+            return value
+        return f"{int(value):0{self.DIGITS}d}"
+
+    def process_result_value(self, value, dialect):
+        if value is None or dialect.name != 'sqlite':
+            return value
+        return Decimal(value)
+
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), index=True, unique=True, nullable=True)
@@ -63,6 +88,13 @@ class ActionLog(db.Model):  # For indexed action logger events
     timestamp = db.Column(db.DateTime, index=True)
     block_number = db.Column(db.BigInteger)
     tx_hash = db.Column(db.String(66), unique=True)
+    # pending (sent by the backend, event not indexed yet), confirmed, failed or dropped; see app/action_logs.py
+    status = db.Column(db.String(10), index=True, nullable=False, default='confirmed', server_default='confirmed')
+    submitted_at = db.Column(db.DateTime, nullable=True)  # When the backend sent the transaction
+
+    __table_args__ = (
+        db.Index('ix_action_log_timestamp_id', 'timestamp', 'id'),  # Keyset pagination order for /admin/logs
+    )
 
 
 class AdminLoginToken(db.Model):
@@ -71,3 +103,111 @@ class AdminLoginToken(db.Model):
     username_challenge = db.Column(db.String(128))  # The dynamic username expected for this token
     expires_at = db.Column(db.DateTime)
     used = db.Column(db.Boolean, default=False)
+
+
+class MintJob(db.Model):  # Background mint-preparation jobs, see app/jobs.py
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex, handed to the client for polling
+    kind = db.Column(db.String(50), default='prepare_mint')
+    status = db.Column(db.String(20), index=True, default='queued')  # queued, running, succeeded, failed
+    user_id = db.Column(db.Integer, nullable=True)
+    payload = db.Column(db.Text)  # JSON: form fields and paths of the persisted files
+    result = db.Column(db.Text, nullable=True)  # JSON result on success
+    error = db.Column(db.Text, nullable=True)
+    status_code = db.Column(db.Integer, nullable=True)  # HTTP status the synchronous endpoint would have returned
+    created_at = db.Column(db.DateTime, index=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+
+class ChunkedUpload(db.Model):  # Resumable uploads assembled on disk, see app/uploads.py
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    user_id = db.Column(db.Integer, nullable=True)
+    filename = db.Column(db.String(255))
+    content_type = db.Column(db.String(100), nullable=True)
+    total_size = db.Column(db.BigInteger)
+    offset = db.Column(db.BigInteger, default=0)  # Bytes received so far
+    status = db.Column(db.String(20), default='uploading')  # uploading, appending (a chunk is being written), complete
+    path = db.Column(db.String(512))
+    created_at = db.Column(db.DateTime, index=True)
+    updated_at = db.Column(db.DateTime)
+
+
+class IndexerState(db.Model):  # Last block processed per indexed contract, see app/event_indexer.py
+    name = db.Column(db.String(50), primary_key=True)
+    last_block = db.Column(db.BigInteger, default=0)
+    # Whether the last processed range reached the head; reads only use the index while it is set
+    caught_up = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+
+
+class MarketListing(db.Model):  # Materialized NFTMarketplace listings, maintained by the event indexer
+    listing_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)  # listingId emitted on-chain
+    nft_contract = db.Column(db.String(42))
+    token_id = db.Column(db.BigInteger)
+    seller = db.Column(db.String(42))
+    price_wei = db.Column(Wei)
+    status = db.Column(db.String(10), default='active')  # active, sold, unlisted
+    buyer = db.Column(db.String(42), nullable=True)
+    commission_wei = db.Column(Wei, nullable=True)
+    listed_block = db.Column(db.BigInteger)
+    closed_block = db.Column(db.BigInteger, nullable=True)
+    tx_hash = db.Column(db.String(66))
+
+    # Every /market/listings query leads with status='active' and pages on (sort key, listing_id).
+    # On PostgreSQL the card columns ride along in the index, so browsing is an index-only scan.
+    __table_args__ = (
+        db.Index('ix_market_listing_price', 'status', 'price_wei', 'listing_id',
+                 postgresql_include=['nft_contract', 'token_id', 'seller', 'listed_block']),
+        db.Index('ix_market_listing_recent', 'status', 'listing_id',
+                 postgresql_include=['nft_contract', 'token_id', 'seller', 'price_wei', 'listed_block']),
+        db.Index('ix_market_listing_seller', 'seller', 'status', 'listing_id'),
+        db.Index('ix_market_listing_contract', 'nft_contract', 'status', 'price_wei', 'listing_id'),
+        db.Index('ix_market_listing_token', 'nft_contract', 'token_id'),
+    )
+
+
+class NFTToken(db.Model):  # Current owner and data of each NFTLand token, maintained by the event indexer
+    token_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    owner = db.Column(db.String(42))  # Checksummed, from the latest Transfer
+    token_data = db.Column(db.Text)  # Same as the contract's tokenData(tokenId): the latest metadata URI
+    update_count = db.Column(db.Integer, default=0)  # Entries in tokenUpdates (the mint counts as one)
+    minted_block = db.Column(db.BigInteger)
+    updated_block = db.Column(db.BigInteger)
+
+    __table_args__ = (
+        db.Index('ix_nft_token_owner', 'owner', 'token_id'),  # "My NFTs" pages on (owner, token_id)
+    )
+
+
+class NFTVersion(db.Model):  # One row per tokenUpdates entry (version 0 is the mint), from NFTMinted/NFTUpdated
+    token_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    update_index = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    token_uri = db.Column(db.Text)
+    block_number = db.Column(db.BigInteger)
+    tx_hash = db.Column(db.String(66))
+    timestamp = db.Column(db.DateTime)  # Block time, UTC
+
+
+class ActivityEvent(db.Model):  # Indexed NFT and marketplace activity, streamed to clients by app/activity.py
+    id = db.Column(db.Integer, primary_key=True)  # Also the SSE event id clients resume from (Last-Event-ID)
+    kind = db.Column(db.String(20))  # minted, updated, transfer, listed, sold, unlisted
+    topics = db.Column(db.Text)  # Space-separated: market, token:<id>, owner:<checksummed address>
+    payload = db.Column(db.Text)  # JSON body sent to subscribers
+    block_number = db.Column(db.BigInteger)
+    tx_hash = db.Column(db.String(66))
+    log_index = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, index=True)  # When it was indexed, for pruning
+
+    __table_args__ = (
+        db.UniqueConstraint('tx_hash', 'log_index', name='uq_activity_event_log'),  # One row per chain log
+    )
+
+
+class PlatformStat(db.Model):  # Running platform totals, updated by the indexer with each event (app/stats.py)
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(Wei, default=0)
+
+
+class DailyPlatformStat(db.Model):  # Per-day rollups of the PlatformStat metrics, for dashboard charts
+    day = db.Column(db.Date, primary_key=True)
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(Wei, default=0)
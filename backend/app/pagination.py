@@ -0,0 +1,115 @@
+# app/pagination.py
+# Keyset (cursor) pagination. Instead of OFFSET + COUNT(*), every page is "the next N rows after
+# the last row the client saw", which an index on the sort keys serves in constant time no
+# matter how deep the page is. Cursors are opaque to clients.
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import and_, or_, tuple_, text, literal
+
+MAX_PER_PAGE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"$dec": str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    if isinstance(value, dict) and "$dec" in value:
+        return Decimal(value["$dec"])
+    return value
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps({"d": direction, "v": [_encode_value(v) for v in values]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return [_decode_value(v) for v in payload["v"]], payload["d"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor("Invalid pagination cursor") from e
+
+
+def _after(keys, values):
+    # Rows strictly after `values` in the order given by `keys` ([(expression, descending), ...])
+    if len({descending for _, descending in keys}) == 1:
+        # Uniform direction: a row-value comparison, which B-tree indexes serve directly
+        # Bound with the columns' types, so type decorators (e.g. models.Wei) apply to the values
+        row = tuple_(*[expr for expr, _ in keys])
+        bound = tuple_(*[literal(value, expr.type) for (expr, _), value in zip(keys, values)])
+        return row < bound if keys[0][1] else row > bound
+
+    clauses = []
+    for i, (expr, descending) in enumerate(keys):
+        equal_prefix = [keys[j][0] == values[j] for j in range(i)]
+        clauses.append(and_(*equal_prefix, expr < values[i] if descending else expr > values[i]))
+    return or_(*clauses)
+
+
+def keyset_paginate(query, keys, cursor=None, per_page=20):
+    """Fetches one page of `query` ordered by `keys`, a list of (expression, descending) pairs
+    that must end in a unique column (usually the primary key).
+
+    Returns (items, next_cursor, prev_cursor); a cursor is None when there is no such page.
+    """
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    values, direction = decode_cursor(cursor) if cursor else (None, 'next')
+    if values is not None and len(values) != len(keys):
+        raise InvalidCursor("Invalid pagination cursor")
+
+    # Walking backwards is the same query with every sort direction flipped
+    backwards = direction == 'prev'
+    effective_keys = [(expr, descending != backwards) for expr, descending in keys]
+
+    query = query.add_columns(*[expr for expr, _ in keys])
+    if values is not None:
+        query = query.filter(_after(effective_keys, values))
+    query = query.order_by(*[expr.desc() if descending else expr.asc() for expr, descending in effective_keys])
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    items = [row[0] for row in rows]
+    key_values = [list(row[1:]) for row in rows]
+
+    has_next = has_more if not backwards else True
+    has_prev = has_more if backwards else cursor is not None
+    next_cursor = encode_cursor(key_values[-1], 'next') if rows and has_next else None
+    prev_cursor = encode_cursor(key_values[0], 'prev') if rows and has_prev else None
+    return items, next_cursor, prev_cursor
+
+
+def approximate_count(query):
+    """Estimated row count for `query` without scanning it.
+
+    PostgreSQL answers from planner statistics; other databases fall back to an exact COUNT.
+    Returns (count, is_estimate).
+    """
+    bind = query.session.get_bind()
+    if bind.dialect.name == 'postgresql':
+        statement = query.order_by(None).statement.compile(dialect=bind.dialect,
+                                                           compile_kwargs={"literal_binds": True})
+        plan = query.session.execute(text(f"EXPLAIN (FORMAT JSON) {statement}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"]), True
+    return query.order_by(None).count(), False
@@ -0,0 +1,240 @@
+# app/partitions.py
+# Time-partitioned ActionLog storage with cold archival.
+#
+# On PostgreSQL `flask partition-action-log` turns action_log into a RANGE-partitioned table
+# with one partition per month (action_log_pYYYYMM) plus a default partition, so the indexes
+# that inserts and recent-log reads touch only cover the hot months. The conversion is never
+# done at startup, where several processes booting together would race on the DDL.
+# Months older than ACTION_LOG_RETENTION_MONTHS are written to gzipped NDJSON under
+# ARCHIVE_DIR and their partition is detached and dropped.
+# Other databases keep a plain table; archival then deletes the archived rows instead.
+import gzip
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+
+from flask import current_app
+from sqlalchemy import text, func
+
+from . import db
+from .exports import action_log_to_dict, EXPORT_BATCH_SIZE
+from .models import ActionLog
+
+TABLE = ActionLog.__tablename__
+
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def _add_months(month, count):
+    years, month_index = divmod(month.month - 1 + count, 12)
+    return datetime(month.year + years, month_index + 1, 1)
+
+
+def _partition_name(month):
+    return f"{TABLE}_p{month:%Y%m}"
+
+
+def _is_partitioned(conn):
+    return conn.execute(text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+                        {"table": TABLE}).first() is not None
+
+
+def _partitioned_months(conn):
+    names = conn.execute(text("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                              "WHERE i.inhparent = to_regclass(:table)"), {"table": TABLE}).scalars()
+    prefix = f"{TABLE}_p"
+    return {datetime.strptime(name[len(prefix):], "%Y%m") for name in names if name.startswith(prefix)}
+
+
+def _create_tx_hash_index(conn, partition):
+    # A partitioned table cannot have a unique index without the partition key, so tx_hash is
+    # unique per partition instead; these indexes also serve the indexer's tx_hash lookups.
+    # A pending row that is confirmed moves to its block's month and is checked there.
+    conn.execute(text(f'CREATE UNIQUE INDEX IF NOT EXISTS {partition}_tx_hash_key ON {partition} (tx_hash)'))
+
+
+def _create_partitions(conn, first_month, last_month):
+    # Monthly partitions for [first_month, last_month], plus a default partition so an insert
+    # never fails when maintenance has not created the month's partition yet
+    month = first_month
+    while month <= last_month:
+        conn.execute(text(f'CREATE TABLE IF NOT EXISTS {_partition_name(month)} PARTITION OF {TABLE} '
+                          f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_add_months(month, 1):%Y-%m-%d}')"))
+        _create_tx_hash_index(conn, _partition_name(month))
+        month = _add_months(month, 1)
+    conn.execute(text(f'CREATE TABLE IF NOT EXISTS {TABLE}_default PARTITION OF {TABLE} DEFAULT'))
+    _create_tx_hash_index(conn, f"{TABLE}_default")
+
+
+def partition_action_log(engine, months_ahead=3):
+    """Rebuilds a plain PostgreSQL action_log as a monthly partitioned table, copying its rows.
+
+    Runs in one transaction under an exclusive lock and returns False if the table is already
+    partitioned. Unique constraints on a partitioned table must contain the partition key, so the
+    primary key becomes (id, timestamp) and tx_hash gets a unique index on each partition.
+    """
+    if engine.dialect.name != 'postgresql':
+        raise RuntimeError("Partitioning is only supported on PostgreSQL")
+
+    with engine.begin() as conn:
+        if _is_partitioned(conn):
+            return False
+
+        legacy = f"{TABLE}_unpartitioned"
+        conn.execute(text(f'LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE'))
+        conn.execute(text(f'ALTER TABLE {TABLE} RENAME TO {legacy}'))
+        conn.execute(text(f'CREATE TABLE {TABLE} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING GENERATED) '
+                          f'PARTITION BY RANGE ("timestamp")'))
+        # Keep the id sequence alive when the old table is dropped
+        sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": legacy}).scalar()
+        if sequence:
+            conn.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id'))
+        conn.execute(text(f'ALTER TABLE {TABLE} ALTER COLUMN "timestamp" SET NOT NULL'))
+
+        oldest = conn.execute(text(f'SELECT min("timestamp") FROM {legacy}')).scalar()
+        current = _month_start(datetime.now())
+        _create_partitions(conn, _month_start(oldest) if oldest else current, _add_months(current, months_ahead))
+
+        # Rows without a timestamp (never written by the indexer) are kept, dated at the epoch
+        columns = [column.name for column in ActionLog.__table__.columns]
+        column_list = ", ".join(f'"{name}"' for name in columns)
+        select_list = ", ".join(f"COALESCE(\"{name}\", '1970-01-01')" if name == 'timestamp' else f'"{name}"'
+                                for name in columns)
+        conn.execute(text(f'INSERT INTO {TABLE} ({column_list}) SELECT {select_list} FROM {legacy}'))
+        conn.execute(text(f'DROP TABLE {legacy}'))
+
+        # Constraints and indexes on a partitioned table apply to every partition, present and future
+        conn.execute(text(f'ALTER TABLE {TABLE} ADD PRIMARY KEY (id, "timestamp")'))
+        for index in ActionLog.__table__.indexes:
+            index.create(conn)
+    return True
+
+
+def ensure_partitions(engine, months_ahead=3):
+    """Creates the partitions for the current month and the next `months_ahead` months."""
+    if engine.dialect.name != 'postgresql':
+        return
+    with engine.begin() as conn:
+        if _is_partitioned(conn):
+            current = _month_start(datetime.now())
+            _create_partitions(conn, current, _add_months(current, months_ahead))
+
+
+def install_action_log_partitions(engine, months_ahead=3):
+    """Startup hook: keeps upcoming partitions of a partitioned action_log created. A plain
+    table is left alone; convert it with `flask partition-action-log`.
+    """
+    if engine.dialect.name != 'postgresql':
+        return
+
+    with engine.connect() as conn:
+        partitioned = _is_partitioned(conn)
+    if not partitioned:
+        logging.info(f"{TABLE} is not partitioned; run `flask partition-action-log` to convert it.")
+        return
+    try:
+        ensure_partitions(engine, months_ahead)
+    except Exception as e:
+        # Usually another process creating the same partition; `flask archive-action-logs` retries
+        logging.warning(f"Could not create upcoming {TABLE} partitions: {e}")
+
+
+# --- Archival ---
+def _archive_path(archive_dir, month):
+    return Path(archive_dir) / TABLE / f"{month:%Y-%m}.ndjson.gz"
+
+
+def _month_query(month):
+    return ActionLog.query.filter(ActionLog.timestamp >= month, ActionLog.timestamp < _add_months(month, 1))
+
+
+def _archive_month(month, archive_dir):
+    path = _archive_path(archive_dir, month)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    archive = None
+    count = 0
+    try:
+        for log in _month_query(month).order_by(ActionLog.timestamp, ActionLog.id).yield_per(EXPORT_BATCH_SIZE):
+            if archive is None:
+                # Appending adds a new gzip member; gzip readers see all members as one stream
+                archive = gzip.open(path, 'at', encoding='utf-8')
+            archive.write(json.dumps(action_log_to_dict(log)) + "\n")
+            count += 1
+    finally:
+        if archive is not None:
+            archive.close()
+    return count
+
+
+def archive_action_logs(retention_months=None, archive_dir=None):
+    """Moves every month older than the retention window into the archive.
+
+    Rows are written to disk before they are dropped, so an interrupted run can leave
+    duplicates in the archive (the query path skips them) but never loses rows.
+    Returns {"YYYY-MM": rows archived}.
+    """
+    if retention_months is None:
+        retention_months = current_app.config['ACTION_LOG_RETENTION_MONTHS']
+    archive_dir = archive_dir or current_app.config['ARCHIVE_DIR']
+    cutoff = _add_months(_month_start(datetime.now()), -retention_months)
+    archived = {}
+
+    engine = db.session.get_bind(mapper=ActionLog.__mapper__)
+    if engine.dialect.name == 'postgresql':
+        with engine.connect() as conn:
+            old_partitions = sorted(month for month in _partitioned_months(conn) if month < cutoff) \
+                if _is_partitioned(conn) else []
+        for month in old_partitions:
+            count = _archive_month(month, archive_dir)
+            db.session.commit()  # End the read transaction before taking the DDL lock
+            partition = _partition_name(month)
+            with engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {TABLE} DETACH PARTITION {partition}'))
+                conn.execute(text(f'DROP TABLE {partition}'))
+            if count:
+                archived[f"{month:%Y-%m}"] = count
+
+    # Remaining old rows: plain tables, or rows that landed in the default partition
+    while True:
+        oldest = db.session.query(func.min(ActionLog.timestamp)).filter(ActionLog.timestamp < cutoff).scalar()
+        if oldest is None:
+            break
+        month = _month_start(oldest)
+        key = f"{month:%Y-%m}"
+        archived[key] = archived.get(key, 0) + _archive_month(month, archive_dir)
+        _month_query(month).delete(synchronize_session=False)
+        db.session.commit()
+    return archived
+
+
+def iter_archived_action_logs(start=None, end=None, user_address=None, archive_dir=None):
+    """Yields archived rows (as exported dicts) in time order, optionally filtered by a
+    [start, end) timestamp range and user address. Only months overlapping the range are read.
+    """
+    directory = Path(archive_dir or current_app.config['ARCHIVE_DIR']) / TABLE
+    if not directory.is_dir():
+        return
+
+    for path in sorted(directory.glob("*.ndjson.gz")):
+        month = datetime.strptime(path.name.split(".")[0], "%Y-%m")
+        if (start and _add_months(month, 1) <= start) or (end and month >= end):
+            continue
+
+        seen_ids = set()
+        with gzip.open(path, 'rt', encoding='utf-8') as archive:
+            for line in archive:
+                row = json.loads(line)
+                if row["id"] in seen_ids:
+                    continue
+                seen_ids.add(row["id"])
+
+                timestamp = datetime.fromisoformat(row["timestamp"])
+                if (start and timestamp < start) or (end and timestamp >= end):
+                    continue
+                if user_address and row["user_address"] != user_address:
+                    continue
+                yield row
@@ -0,0 +1,251 @@
+# app/profiling.py
+# Opt-in request profiling (PROFILING_ENABLED). Every request's wall time is split into
+# database (SQLAlchemy cursor events), RPC (a Web3 middleware, see app/chain.py), IPFS (pins
+# made through app/ipfs.py) and the Python remainder, and exported per route as Prometheus
+# histograms on /metrics. Requests slower than PROFILING_SLOW_REQUEST_SECONDS are logged with
+# that breakdown, and a PROFILING_SAMPLE_RATE share of requests runs under cProfile: the
+# profile is written to PROFILING_DUMP_DIR when the request turns out to be slow. Read a dump
+# with `python -m pstats <file>` or snakeviz.
+#
+# Under gunicorn every worker keeps its own metrics; set PROMETHEUS_MULTIPROC_DIR to an empty
+# directory so /metrics aggregates all of them (gunicorn.conf.py cleans up after dead workers).
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, UTC
+from pathlib import Path
+
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from web3.middleware import Web3Middleware
+
+COMPONENTS = ('db', 'rpc', 'ipfs', 'python')
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+BYTES_BUCKETS = (0, 1024, 16 * 1024, 128 * 1024, 1024 ** 2, 8 * 1024 ** 2, 32 * 1024 ** 2)
+
+_current = ContextVar('request_profile', default=None)
+_profiler_lock = threading.Lock()  # cProfile cannot profile two threads' requests at once
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+class RequestProfile:
+    """Time and call counts of one request. Calls may come from helper threads (asyncio.to_thread
+    copies the context), so updates take a lock."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = self.rpc_calls = self.ipfs_uploads = self.ipfs_bytes = 0
+        self.db_seconds = self.rpc_seconds = self.ipfs_seconds = 0.0
+        self.profiler = None
+        self._lock = threading.Lock()
+
+    def add(self, component, seconds, nbytes=0):
+        with self._lock:
+            if component == 'db':
+                self.db_queries += 1
+                self.db_seconds += seconds
+            elif component == 'rpc':
+                self.rpc_calls += 1
+                self.rpc_seconds += seconds
+            else:
+                self.ipfs_uploads += 1
+                self.ipfs_seconds += seconds
+                self.ipfs_bytes += nbytes
+
+    def breakdown(self, wall):
+        # Concurrent RPC calls can add up to more than the wall time; the remainder is floored at 0
+        python = max(0.0, wall - self.db_seconds - self.rpc_seconds - self.ipfs_seconds)
+        return {'db': self.db_seconds, 'rpc': self.rpc_seconds, 'ipfs': self.ipfs_seconds, 'python': python}
+
+
+def record_ipfs(seconds, nbytes):
+    """Called by app/ipfs.py after every pin request."""
+    profile = _current.get()
+    if profile is not None:
+        profile.add('ipfs', seconds, nbytes)
+
+
+class RPCTimer(Web3Middleware):
+    """Times every JSON-RPC round trip (a batch counts as one) made during a profiled request."""
+
+    def wrap_make_request(self, make_request):
+        def middleware(method, params):
+            profile = _current.get()
+            if profile is None:
+                return make_request(method, params)
+            started = time.perf_counter()
+            try:
+                return make_request(method, params)
+            finally:
+                profile.add('rpc', time.perf_counter() - started)
+
+        return middleware
+
+    def wrap_make_batch_request(self, make_batch_request):
+        def middleware(requests_info):
+            profile = _current.get()
+            if profile is None:
+                return make_batch_request(requests_info)
+            started = time.perf_counter()
+            try:
+                return make_batch_request(requests_info)
+            finally:
+                profile.add('rpc', time.perf_counter() - started)
+
+        return middleware
+
+
+# The start time lives on the statement's execution context, which is discarded with the
+# statement; conn.info outlives it on the pooled connection, so a failed statement would leak
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None and context is not None:
+        context.profiling_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    started = getattr(context, 'profiling_started', None)
+    if profile is not None and started is not None:
+        profile.add('db', time.perf_counter() - started)
+
+
+def _build_metrics():
+    from prometheus_client import Counter, Histogram  # Only needed with PROFILING_ENABLED
+
+    labels = ('route', 'method')
+    return {
+        'seconds': Histogram('landchain_request_seconds', "Request wall time", labels + ('status',)),
+        'component_seconds': Histogram('landchain_request_component_seconds',
+                                       "Request time spent in the database, RPC, IPFS and Python",
+                                       labels + ('component',)),
+        'db_queries': Histogram('landchain_request_db_queries', "SQL statements per request", labels,
+                                buckets=COUNT_BUCKETS),
+        'rpc_calls': Histogram('landchain_request_rpc_calls', "JSON-RPC round trips per request", labels,
+                               buckets=COUNT_BUCKETS),
+        'ipfs_uploads': Histogram('landchain_request_ipfs_uploads', "IPFS pin requests per request", labels,
+                                  buckets=COUNT_BUCKETS),
+        'ipfs_bytes': Histogram('landchain_request_ipfs_bytes', "Bytes pinned to IPFS per request", labels,
+                                buckets=BYTES_BUCKETS),
+        'slow': Counter('landchain_slow_requests', "Requests above PROFILING_SLOW_REQUEST_SECONDS", labels),
+    }
+
+
+def get_metrics():
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = _build_metrics()  # Once per process: the default registry rejects duplicates
+    return _metrics
+
+
+def render_metrics():
+    """(body, content type) of the Prometheus exposition for /metrics."""
+    from prometheus_client import CollectorRegistry, CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+    from prometheus_client import multiprocess
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def init_app(app):
+    """Installs the request hooks and SQL listeners when PROFILING_ENABLED is set."""
+    if not app.config.get('PROFILING_ENABLED'):
+        return
+    get_metrics()
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    slow_seconds = app.config['PROFILING_SLOW_REQUEST_SECONDS']
+    sample_rate = app.config['PROFILING_SAMPLE_RATE']
+    dump_dir = Path(app.config['PROFILING_DUMP_DIR'])
+    max_dumps = app.config['PROFILING_MAX_DUMPS']
+
+    @app.before_request
+    def start_request_profile():
+        profile = RequestProfile()
+        request.environ['landchain.profile_token'] = _current.set(profile)
+        if random.random() < sample_rate and _profiler_lock.acquire(blocking=False):
+            profile.profiler = cProfile.Profile()
+            try:
+                profile.profiler.enable()
+            except ValueError:  # Another profiler (e.g. a debugger) is active
+                profile.profiler = None
+                _profiler_lock.release()
+
+    @app.after_request
+    def finish_request_profile(response):
+        profile = _current.get()
+        if profile is None:
+            return response
+        wall = time.perf_counter() - profile.started
+        if profile.profiler is not None:
+            profile.profiler.disable()
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        try:
+            _observe(route, request.method, response.status_code, wall, profile)
+            if wall >= slow_seconds:
+                _report_slow(route, wall, profile, dump_dir, max_dumps)
+        except Exception as e:
+            logging.warning(f"Request profiling failed for {route}: {e}")
+        return response
+
+    @app.teardown_request
+    def clear_request_profile(exc):
+        profile = _current.get()
+        if profile is not None and profile.profiler is not None:
+            profile.profiler.disable()  # No-op if after_request already did
+            profile.profiler = None
+            _profiler_lock.release()
+        token = request.environ.pop('landchain.profile_token', None)
+        if token is not None:
+            try:
+                _current.reset(token)
+            except ValueError:  # Torn down from another context (e.g. after a streamed response)
+                _current.set(None)
+
+
+def _observe(route, method, status, wall, profile):
+    metrics = get_metrics()
+    metrics['seconds'].labels(route, method, str(status)).observe(wall)
+    for component, seconds in profile.breakdown(wall).items():
+        metrics['component_seconds'].labels(route, method, component).observe(seconds)
+    metrics['db_queries'].labels(route, method).observe(profile.db_queries)
+    metrics['rpc_calls'].labels(route, method).observe(profile.rpc_calls)
+    metrics['ipfs_uploads'].labels(route, method).observe(profile.ipfs_uploads)
+    metrics['ipfs_bytes'].labels(route, method).observe(profile.ipfs_bytes)
+
+
+def _report_slow(route, wall, profile, dump_dir, max_dumps):
+    get_metrics()['slow'].labels(route, request.method).inc()
+    parts = profile.breakdown(wall)
+    message = (f"Slow request {request.method} {request.path} ({route}) {wall * 1000:.0f}ms: "
+               f"db {profile.db_queries} queries {parts['db'] * 1000:.0f}ms, "
+               f"rpc {profile.rpc_calls} calls {parts['rpc'] * 1000:.0f}ms, "
+               f"ipfs {profile.ipfs_uploads} uploads {profile.ipfs_bytes} bytes {parts['ipfs'] * 1000:.0f}ms, "
+               f"python {parts['python'] * 1000:.0f}ms")
+    if profile.profiler is not None:
+        message += f"; profile: {_dump(profile.profiler, route, wall, dump_dir, max_dumps)}"
+    logging.warning(message)
+
+
+def _dump(profiler, route, wall, dump_dir, max_dumps):
+    dump_dir.mkdir(parents=True, exist_ok=True)
+    slug = route.strip('/').replace('/', '_').replace('<', '').replace('>', '').replace(':', '-') or 'root'
+    stamp = datetime.now(UTC).strftime('%Y%m%dT%H%M%S%f')
+    path = dump_dir / f"{stamp}-{request.method}-{slug}-{wall * 1000:.0f}ms-{os.getpid()}.prof"
+    profiler.dump_stats(path)
+    dumps = sorted(dump_dir.glob('*.prof'))
+    for old in dumps[:max(0, len(dumps) - max_dumps)]:
+        old.unlink(missing_ok=True)
+    return path
@@ -1,35 +1,24 @@
 # app/routes.py
-from flask import Blueprint, request, jsonify, current_app, session, render_template
+from flask import Blueprint, request, jsonify, current_app, session, render_template, url_for
+from flask import Response, stream_with_context
 from web3 import Web3  # IMPORT Web3
 from itsdangerous import URLSafeTimedSerializer  # IMPORT URLSafeTimedSerializer
 
 # Import from your app modules using relative imports
 from . import auth, services, models, db, ipfs  # Assuming db is also in app/__init__
+from . import jobs, minting, uploads, search, pagination, stats, exports, partitions, identity, chain, singleflight, activity
+from . import profiling
 from .models import User, ActionLog, AdminLoginToken  # Explicitly import models used
+from .db_routing import read_only
+from .http_cache import conditional, make_etag
 from functools import wraps
+from sqlalchemy import text
 from datetime import datetime, UTC
 import asyncio
-from werkzeug.datastructures import FileStorage  # For type hinting
-import io  # For creating in-memory file for HTML content
-from pathlib import Path
-
-
-# Placeholder for your actual ipfs.py functions
-# Ensure these are correctly imported in your actual file
-def upload_file_to_ipfs(file_storage_object: FileStorage) -> str:
-    from .ipfs import upload_file  # Assuming ipfs.py is in the same directory or PATH
-    return upload_file(file_storage_object)
-
-
-def upload_json_to_ipfs(data: dict) -> str:
-    from .ipfs import upload_json  # Assuming ipfs.py is in the same directory or PATH
-    return upload_json(data)
 
 
 bp = Blueprint('main', __name__)
 
-w3 = Web3(Web3.HTTPProvider('https://polygon-amoy.g.alchemy.com/v2/2l_tXPgmiK-xL46C2bzC4C_tw1LnCQtC'))
-
 
 def login_required(f):
     @wraps(f)
@@ -46,15 +35,50 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session or not session.get('is_admin'):
             return jsonify({"error": "Admin privileges required"}), 403
-        # Optionally, re-verify against DB for extra security
-        user = User.query.get(session['user_id'])
-        if not user or not user.is_admin:
+        # Re-verify the role against the (cached) user record, not just the session cookie
+        user = identity.current_identity()
+        if not user or not user['is_admin']:
             return jsonify({"error": "Admin privileges required"}), 403
         return f(*args, **kwargs)
 
     return decorated_function
 
 
+# --- Health Routes ---
+@bp.route('/health/live', methods=['GET'])
+def health_live():
+    # The process is up and serving requests; no dependencies are checked
+    return jsonify({"status": "ok"}), 200
+
+
+@bp.route('/health/ready', methods=['GET'])
+def health_ready():
+    checks = {}
+    try:
+        db.session.execute(text("SELECT 1"))
+        checks["database"] = "ok"
+    except Exception as e:
+        current_app.logger.warning(f"Readiness check: database unavailable: {e}")
+        checks["database"] = "unavailable"
+    chain_ready, chain_error = chain.check_ready()
+    checks["chain"] = "ok" if chain_ready else chain_error
+
+    ready = all(status == "ok" for status in checks.values())
+    return jsonify({"status": "ready" if ready else "not_ready", "checks": checks}), 200 if ready else 503
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    # Prometheus scrape endpoint for the request profiling histograms (see app/profiling.py)
+    if not current_app.config['PROFILING_ENABLED']:
+        return jsonify({"error": "Profiling is not enabled"}), 404
+    token = current_app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        return jsonify({"error": "Invalid metrics token"}), 401
+    body, content_type = profiling.render_metrics()
+    return Response(body, content_type=content_type)
+
+
 # --- Auth Routes ---
 @bp.route('/auth/register/email', methods=['POST'])
 def register_email():
@@ -85,15 +109,14 @@ def logout():
 @bp.route('/auth/status', methods=['GET'])
 @login_required
 def auth_status():
-    user_id = session.get('user_id')
-    user = User.query.get(user_id)
+    user = identity.current_identity()
     if user:
         return jsonify({
             "logged_in": True,
-            "user_id": user.id,
-            "email": user.email,
-            "wallet_address": user.wallet_address,
-            "is_admin": user.is_admin
+            "user_id": user['id'],
+            "email": user['email'],
+            "wallet_address": user['wallet_address'],
+            "is_admin": user['is_admin']
         })
     return jsonify({"logged_in": False}), 401  # Should not happen if @login_required works
 
@@ -194,13 +217,16 @@ def user_details():
 # --- User/Wallet Virtualization (Conceptual - relies on Web3Auth/Magic on client) ---
 @bp.route('/user/profile', methods=['GET'])
 @login_required
+@read_only
 def get_user_profile():
-    user = User.query.get(session['user_id'])
+    user = identity.current_identity()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
     # This is where you'd fetch user-specific data, potentially from IPFS links
     # stored against the user, decrypted client-side.
     return jsonify({
-        "email": user.email,
-        "wallet_address": user.wallet_address,
+        "email": user['email'],
+        "wallet_address": user['wallet_address'],
     })
 
 
@@ -232,27 +258,22 @@ def upload_ipfs(content):
 
 async def _get_my_nfts_async():
     try:
-        # Read the contract ABI in a background thread
-        contract_abi = await asyncio.to_thread(
-            lambda: open(Path(__file__).parent / "abi" / current_app.config.get('NFT_LAND_CONTRACT_ABI_PATH'), 'r').read())
+        nft_land_contract = chain.get_contract('nft_land')
 
-        # Set the contract address (replace with your contract's deployed address)
-        contract_address = current_app.config.get('NFT_LAND_CONTRACT_ADDRESS')
-        nft_land_contract = w3.eth.contract(address=Web3.to_checksum_address(contract_address), abi=contract_abi)
-
-        user = await asyncio.to_thread(User.query.get, session['user_id'])
-        if not user.wallet_address:
+        user = identity.current_identity()
+        if not user or not user['wallet_address']:
             return jsonify({"error": "User wallet address not found"}), 400
 
         if not nft_land_contract:
             return jsonify({"error": "NFTLand contract not configured"}), 503
 
         # Fetch token IDs using a thread to avoid blocking
-        tokenIDs = await asyncio.to_thread(nft_land_contract.functions.fetchNFTsForOwner(user.wallet_address).call)
+        tokenIDs = await asyncio.to_thread(singleflight.call,
+                                           nft_land_contract.functions.fetchNFTsForOwner(user['wallet_address']))
 
         # Gather tokenData calls concurrently
         async def get_token_data(tokenID):
-            tokenURI = await asyncio.to_thread(nft_land_contract.functions.tokenData(tokenID).call)
+            tokenURI = await asyncio.to_thread(singleflight.call, nft_land_contract.functions.tokenData(tokenID))
             return {'tokenID': tokenID, 'tokenURI': tokenURI}
 
         tasks = [get_token_data(tokenID) for tokenID in tokenIDs]
@@ -267,12 +288,25 @@ async def _get_my_nfts_async():
 
 @bp.route('/nft/my_nfts', methods=['GET'])
 @login_required
+@read_only
 def get_my_nfts():
+    if current_app.config['NFT_READS_FROM_INDEX'] and services.index_available('nft_land'):
+        user = identity.current_identity()
+        if not user or not user['wallet_address']:
+            return jsonify({"error": "User wallet address not found"}), 400
+        try:
+            result, status = services.query_owned_nfts(user['wallet_address'], request.args.get('cursor'),
+                                                       request.args.get('per_page', 100, type=int))
+        except pagination.InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(result), status
     return asyncio.run(_get_my_nfts_async())
 
 
 # --- NFT Interaction Routes ---
 @bp.route('/nft/<int:token_id>', methods=['GET'])
+@read_only
+@conditional(services.nft_etag, 'NFT_CACHE_CONTROL')
 def get_single_nft(token_id):
     result, status_code = services.get_nft_details(token_id)
     return jsonify(result), status_code
@@ -294,8 +328,7 @@ def prepare_mint_tx():
     if not metadata_uri or not recipient_address:
         return jsonify({"error": "Missing metadataURI or recipient address"}), 400
 
-    if not current_app.config.get(
-            'NFT_LAND_CONTRACT_ADDRESS') or not services.nft_land_contract:  # Check if contract is loaded
+    if chain.get_contract('nft_land') is None:  # Check if contract is configured
         return jsonify({"error": "NFTLand contract not configured on backend"}), 503
 
     # Backend prepares transaction data for the client to sign and send This example assumes the `mintNFT` function
@@ -321,18 +354,73 @@ def prepare_mint_tx():
     }), 200
 
 
+# --- Activity Stream ---
+@bp.route('/events/stream', methods=['GET'])
+def activity_stream():
+    # Server-sent events for ?topics=market,token:<id>,owner:<address> (see app/activity.py).
+    # EventSource reconnects with a Last-Event-ID header; the events missed meanwhile are replayed.
+    try:
+        topics = activity.parse_topics(request.args.get('topics', ''))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    if last_event_id is not None and not last_event_id.isdigit():
+        return jsonify({"error": "Invalid Last-Event-ID"}), 400
+
+    try:
+        subscription = activity.subscribe(topics)  # Before the replay, so nothing falls in between
+    except activity.TooManySubscribers:
+        return jsonify({"error": "Too many open event streams, retry later"}), 503
+    backlog = []
+    try:
+        if last_event_id is not None:
+            backlog = activity.replay(topics, int(last_event_id), current_app.config['ACTIVITY_REPLAY_LIMIT'])
+    except Exception:
+        activity.broker.unsubscribe(subscription)
+        raise
+    db.session.close()  # The stream can stay open for hours; do not hold a connection meanwhile
+
+    return Response(activity.stream(subscription, backlog, current_app.config['ACTIVITY_HEARTBEAT_SECONDS']),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})  # No proxy buffering
+
+
 # --- Marketplace Routes ---
 @bp.route('/market/listings', methods=['GET'])
+@read_only
 def get_listings():
-    # This should ideally pull from an indexed database.
-    # services.get_active_listings_from_contract is a placeholder for on-chain (inefficient).
-    # For a real app, you'd query your indexed 'ActionLog' or a dedicated 'Listings' table.
+    # Served from the MarketListing table the event indexer maintains from NFTListed/NFTSold/NFTUnlisted.
+    # Filters: min_price/max_price (MATIC), seller, contract. Sort: recent, price_asc, price_desc.
+    if not services.index_available('nft_marketplace'):
+        # No indexer: page through the contract's bounded getActiveListings scan (no filters or sorting)
+        try:
+            result, status = services.get_active_listings_onchain(
+                offset=int(request.args.get('cursor') or 0),
+                limit=request.args.get('per_page', services.ONCHAIN_PAGE_SIZE, type=int))
+        except ValueError:
+            return jsonify({"error": "Invalid pagination cursor"}), 400
+        except Exception as e:
+            current_app.logger.error(f"Error fetching on-chain listings: {e}")
+            return jsonify({"error": "Could not fetch listings"}), 500
+        return jsonify(result), status
 
-    # Replace with actual DB query once indexer is running
-    # For now, conceptual:
-    # active_listings = YourIndexedMarketplaceListing.query.filter_by(active=True).limit(limit).offset(offset).all()
-    # return jsonify([listing.to_dict() for listing in active_listings])
-    return jsonify({"message": "Endpoint for indexed listings. Implement DB query.", "data": []})
+    try:
+        min_price = request.args.get('min_price', type=float)
+        max_price = request.args.get('max_price', type=float)
+        result, status = services.query_market_listings(
+            min_price_wei=Web3.to_wei(min_price, 'ether') if min_price is not None else None,
+            max_price_wei=Web3.to_wei(max_price, 'ether') if max_price is not None else None,
+            seller=request.args.get('seller'),
+            nft_contract=request.args.get('contract'),
+            sort=request.args.get('sort', 'recent'),
+            cursor=request.args.get('cursor'),
+            per_page=request.args.get('per_page', 20, type=int)
+        )
+    except pagination.InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    except ValueError as e:  # Malformed seller/contract address
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result), status
 
 
 @bp.route('/market/prepare_list_tx', methods=['POST'])
@@ -390,7 +478,13 @@ def fiat_quote():
     return jsonify(result), status
 
 
+def _platform_info_etag():
+    return make_etag(current_app.config.get('MARKETPLACE_COMMISSION_PERCENTAGE_BPS'),
+                     current_app.config.get('PLATFORM_COMMISSION_WALLET_ADDRESS'))
+
+
 @bp.route('/utils/platform_info', methods=['GET'])
+@conditional(_platform_info_etag, 'PLATFORM_INFO_CACHE_CONTROL')
 def platform_info():
     return jsonify({
         "commission_percentage_bps": current_app.config.get('MARKETPLACE_COMMISSION_PERCENTAGE_BPS'),
@@ -435,99 +529,170 @@ def admin_login_endpoint():
     return auth.admin_login()
 
 
+def _include_total():
+    # Totals are opt-in (?total=1) and estimated where the database can, so paging never pays for COUNT(*)
+    return request.args.get('total', '').lower() in ('1', 'true', 'yes')
+
+
 @bp.route('/admin/logs', methods=['GET'])
 @admin_required
+@read_only
 def get_admin_logs():
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', None)  # Opaque next/prev cursor from a previous page
     per_page = request.args.get('per_page', 20, type=int)
     search_query = request.args.get('q', None)  # For searching
 
-    query = ActionLog.query.order_by(ActionLog.timestamp.desc())
+    query = ActionLog.query
+    sort_keys = [(ActionLog.timestamp, True), (ActionLog.id, True)]
     if search_query:
-        # Basic search across a few fields
-        search_term = f"%{search_query}%"
-        query = query.filter(
-            models.db.or_(
-                ActionLog.user_address.ilike(search_term),
-                ActionLog.action.ilike(search_term),
-                ActionLog.details.ilike(search_term)
-            )
-        )
+        # Indexed full-text search, best matches first
+        query, rank = search.apply_search(query, ActionLog, search_query)
+        if rank is not None:
+            sort_keys.insert(0, (rank, True))
+
+    try:
+        logs, next_cursor, prev_cursor = pagination.keyset_paginate(query, sort_keys, cursor, per_page)
+    except pagination.InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
 
-    paginated_logs = query.paginate(page=page, per_page=per_page, error_out=False)
     logs_data = [{
         "id": log.id, "log_id_onchain": log.log_id_onchain, "user_address": log.user_address,
         "action": log.action, "details": log.details,
-        "timestamp": log.timestamp.isoformat(), "tx_hash": log.tx_hash
-    } for log in paginated_logs.items]
+        "timestamp": log.timestamp.isoformat(), "tx_hash": log.tx_hash, "status": log.status
+    } for log in logs]
 
-    return jsonify({
-        "logs": logs_data,
-        "total": paginated_logs.total,
-        "pages": paginated_logs.pages,
-        "current_page": paginated_logs.page
-    })
+    response = {"logs": logs_data, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+    if _include_total():
+        response["total"], response["total_is_estimate"] = pagination.approximate_count(query)
+    return jsonify(response)
+
+
+EXPORT_FORMATS = {
+    # format -> (stream function, mimetype)
+    'ndjson': (exports.stream_ndjson, 'application/x-ndjson'),
+    'csv': (exports.stream_csv, 'text/csv'),
+}
+
+
+def _parse_iso_datetime(name):
+    # ActionLog timestamps are naive local time (see event_indexer), so an offset such as 'Z' is
+    # converted to that; comparing aware and naive values would fail mid-stream
+    value = request.args.get(name)
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+
+
+@bp.route('/admin/logs/export', methods=['GET'])
+@admin_required
+@read_only
+def export_admin_logs():
+    # Streams every matching log; filters: from/to (ISO timestamps, inclusive/exclusive) and user (address)
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        start, end = _parse_iso_datetime('from'), _parse_iso_datetime('to')
+    except ValueError:
+        return jsonify({"error": "from/to must be ISO 8601 timestamps"}), 400
+
+    query = ActionLog.query
+    if start:
+        query = query.filter(ActionLog.timestamp >= start)
+    if end:
+        query = query.filter(ActionLog.timestamp < end)
+    if request.args.get('user'):
+        query = query.filter(ActionLog.user_address == request.args['user'])
+    query = query.order_by(ActionLog.timestamp, ActionLog.id)
+
+    stream, mimetype = EXPORT_FORMATS[export_format]
+    return Response(stream_with_context(stream(exports.iter_action_logs(query))), mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=action_logs.{export_format}"})
+
+
+@bp.route('/admin/logs/archive', methods=['GET'])
+@admin_required
+def query_archived_logs():
+    # Same filters and formats as /admin/logs/export, over months moved out of the database
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        start, end = _parse_iso_datetime('from'), _parse_iso_datetime('to')
+    except ValueError:
+        return jsonify({"error": "from/to must be ISO 8601 timestamps"}), 400
+
+    rows = partitions.iter_archived_action_logs(start, end, request.args.get('user'))
+    stream, mimetype = EXPORT_FORMATS[export_format]
+    return Response(stream_with_context(stream(rows)), mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=action_logs_archive.{export_format}"})
 
 
 @bp.route('/admin/users', methods=['GET'])
 @admin_required
+@read_only
 def get_admin_users():
-    # Similar pagination and search as logs for User model
+    # Same cursor pagination and search as logs for the User model
     # Exclude password_hash and otp_secret from response
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', None)
     per_page = request.args.get('per_page', 20, type=int)
     search_query = request.args.get('q', None)
 
     query = User.query
+    sort_keys = [(User.id, False)]
     if search_query:
-        search_term = f"%{search_query}%"
-        query = query.filter(
-            models.db.or_(
-                User.email.ilike(search_term),
-                User.wallet_address.ilike(search_term)
-            )
-        )
+        query, rank = search.apply_search(query, User, search_query)
+        if rank is not None:
+            sort_keys.insert(0, (rank, True))
+
+    try:
+        users, next_cursor, prev_cursor = pagination.keyset_paginate(query, sort_keys, cursor, per_page)
+    except pagination.InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
 
-    paginated_users = query.paginate(page=page, per_page=per_page, error_out=False)
     users_data = [{
         "id": user.id, "email": user.email, "wallet_address": user.wallet_address, "is_admin": user.is_admin
-    } for user in paginated_users.items]
+    } for user in users]
 
-    return jsonify({
-        "users": users_data,
-        "total": paginated_users.total,
-        "pages": paginated_users.pages,
-        "current_page": paginated_users.page
-    })
+    response = {"users": users_data, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+    if _include_total():
+        response["total"], response["total_is_estimate"] = pagination.approximate_count(query)
+    return jsonify(response)
 
 
 @bp.route('/admin/nfts_overview', methods=['GET'])
 @admin_required
+@read_only
 def get_admin_nfts_overview():
-    # This would ideally query an indexed database of all minted NFTs.
-    # If not, you'd have to iterate on-chain events (NFTMinted from NFTLand)
-    # or rely on `totalSupply` and then query each token (very inefficient).
-    # Assume you have an `IndexedNFT` model populated by an indexer.
-    # For now, placeholder:
-    return jsonify({"message": "Admin NFTs overview. Implement with an indexed NFT database."})
+    # Counters and daily rollups maintained by the event indexer, so this never scans event tables.
+    # ?days=N adds the last N daily buckets for charts.
+    days = max(0, min(request.args.get('days', 0, type=int), 366))
+    return jsonify(stats.get_overview(days))
+
+
+def _contract_info_etag():
+    return make_etag(*(current_app.config.get(setting) for setting in chain.SETTINGS))
 
 
 @bp.route('/admin/contract_info', methods=['GET'])
 @admin_required
+@conditional(_contract_info_etag, 'CONTRACT_INFO_CACHE_CONTROL')
 def get_admin_contract_info():
+    # The ABI paths in the config are already absolute
     return jsonify({
         "nft_land_contract": {
             "address": current_app.config.get('NFT_LAND_CONTRACT_ADDRESS'),
-            "abi_path": Path(__file__).parent / "abi" / current_app.config.get('NFT_LAND_CONTRACT_ABI_PATH'),
+            "abi_path": current_app.config.get('NFT_LAND_CONTRACT_ABI_PATH'),
             # Could add more details like owner, specific state variables if needed
         },
         "action_logger_contract": {
             "address": current_app.config.get('ACTION_LOGGER_CONTRACT_ADDRESS'),
-            "abi_path": Path(__file__).parent / "abi" / current_app.config.get('ACTION_LOGGER_CONTRACT_ABI_PATH'),
+            "abi_path": current_app.config.get('ACTION_LOGGER_CONTRACT_ABI_PATH'),
         },
         "nft_marketplace_contract": {
             "address": current_app.config.get('NFT_MARKETPLACE_CONTRACT_ADDRESS'),
-            "abi_path": Path(__file__).parent / "abi" / current_app.config.get('NFT_MARKETPLACE_CONTRACT_ABI_PATH'),
+            "abi_path": current_app.config.get('NFT_MARKETPLACE_CONTRACT_ABI_PATH'),
         }
     })
 
@@ -537,110 +702,49 @@ def get_admin_contract_info():
 @bp.route('/nft/prepare_metadata_for_minting', methods=['POST'])
 # @login_required # If authentication is needed
 def prepare_metadata_for_minting():
-    if not request.form:
-        return jsonify({"error": "Missing form data"}), 400
-
-    required_fields = [
-        'title', 'description', 'external_url', 'plot_id', 'address',
-        'google_maps_location', 'size', 'land_use', 'ownership_verified',
-        'geo_coordinates', 'survey_number', 'owner_name', 'user_doc_html_content',
-        'sale_history_url', 'zone_classification',
-        'tokenization_date', 'minter_address'
-    ]
-    for field in required_fields:
-        if field not in request.form:
-            return jsonify({"error": f"Missing form field: {field}"}), 400
-
-    required_files = [
-        'image', 'ownership_document', 'encumbrances'
-    ]
-    for file in required_files:
-        if file not in request.files:
-            return jsonify({"error": f"Missing file {file}"}), 400
-
-    image_file = request.files['image']
-    ownership_doc_file = request.files['ownership_document']
-    encumbrances_file = request.files['encumbrances']
-    user_doc_html_content = request.form['user_doc_html_content']
-
+    # Files may arrive in the form itself or as ids of finished /uploads (e.g. `image_upload_id`)
     try:
-        # 1. Upload image to IPFS
-        image_ipfs_hash = upload_file_to_ipfs(image_file)
-        if "error:" in image_ipfs_hash:
-            return jsonify(f"Image upload failed: {image_ipfs_hash}"), 400
-
-        # 2. Upload ownership document to IPFS
-        ownership_doc_ipfs_hash = upload_file_to_ipfs(ownership_doc_file)
-        if "error:" in ownership_doc_ipfs_hash:
-            return jsonify(f"Ownership document upload failed: {ownership_doc_ipfs_hash}"), 400
-
-        # 3. Upload ownership document to IPFS
-        encumbrances_ipfs_hash = upload_file_to_ipfs(encumbrances_file)
-        if "error:" in encumbrances_ipfs_hash:
-            return jsonify(f"Ownership document upload failed: {encumbrances_ipfs_hash}"), 400
-
-        print("uploaded")
-
-        # 4. Create HTML file from rich text content and upload to IPFS
-        html_file_content = f"<html><head><meta charset=\"UTF-8\"></head><body>{user_doc_html_content}</body></html>"
-        html_file_bytes = io.BytesIO(html_file_content.encode('utf-8'))
-
-        # Create a FileStorage-like object for the HTML content
-        # Pinata's upload_file expects a filename.
-        html_file_storage = FileStorage(stream=html_file_bytes, filename="user_document.html", content_type="text/html")
-        user_doc_ipfs_hash = upload_file_to_ipfs(html_file_storage)
-        if "error:" in user_doc_ipfs_hash:
-            raise Exception(f"User document HTML upload failed: {user_doc_ipfs_hash}")
-
-        print("uploaded user doc")
-
-        # 5. Construct metadata JSON
-        metadata = {
-            "title": request.form['title'],
-            "description": request.form['description'],
-            "image": f"ipfs://{image_ipfs_hash}",
-            "external_url": request.form['external_url'],
-            "attributes": [
-                {"trait_type": "Plot ID", "value": request.form['plot_id']},
-                {"trait_type": "Address", "value": request.form['address']},
-                {"trait_type": "Google Maps Location", "value": request.form['google_maps_location']},
-                {"trait_type": "Size", "value": request.form['size']},
-                {"trait_type": "Land Use", "value": request.form['land_use']},
-                {"trait_type": "Ownership Verified", "value": request.form['ownership_verified']},
-                {"trait_type": "Geo Coordinates", "value": request.form['geo_coordinates']},
-                {"trait_type": "Survey Number", "value": request.form['survey_number']}
-            ],
-            "land_metadata": {
-                "owner_name": request.form['owner_name'],
-                "ownership_doc_url": f"ipfs://{ownership_doc_ipfs_hash}",
-                "user_doc_url": f"ipfs://{user_doc_ipfs_hash}",  # Added as per your requirement
-                "sale_history_url": request.form['sale_history_url'],
-                "zone_classification": request.form['zone_classification'],
-                "encumbrances": f"ipfs://{encumbrances_ipfs_hash}",
-                "tokenization_date": request.form['tokenization_date']
-            }
-        }
-
-        print("constructed")
-        # 6. Upload metadata JSON to IPFS
-        metadata_ipfs_hash = upload_json_to_ipfs(metadata)
-        if "error:" in metadata_ipfs_hash:
-            raise Exception(f"Metadata JSON upload failed: {metadata_ipfs_hash}")
-
-        print("uploaded")
-
-        final_token_uri = f"ipfs://{metadata_ipfs_hash}"
-
-        # The minter_address is received but used later by prepare_mint_tx typically
-        # minter_address = request.form['minter_address']
+        mint_files = uploads.gather_files(request.form, request.files, minting.REQUIRED_MINT_FILES,
+                                          user_id=session.get('user_id'))
+    except uploads.UploadError as e:
+        return jsonify({"error": str(e)}), e.status_code
 
+    try:
+        error = minting.validate_mint_request(request.form, mint_files)
+        if error:
+            return jsonify({"error": error}), 400
+
+        # ?async=1 persists the upload and hands the pipeline to a job worker; poll /jobs/<id> for the token URI
+        if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+            job = jobs.enqueue_mint_preparation(request.form, mint_files, user_id=session.get('user_id'))
+            status_url = url_for('main.get_job_status', job_id=job.id)
+            return jsonify({"job_id": job.id, "status": job.status, "status_url": status_url}), 202, \
+                {"Location": status_url}
+
+        final_token_uri = minting.prepare_mint_metadata(request.form, mint_files)
         return jsonify(
             {"token_uri": final_token_uri, "message": "Metadata successfully prepared and uploaded to IPFS."}), 200
 
+    except minting.MintPreparationError as e:
+        current_app.logger.error(f"Error in prepare_metadata_for_minting: {e}")
+        return jsonify({"error": str(e)}), e.status_code
     except Exception as e:
-        # Log the error e
-        print(f"Error in prepare_metadata_for_minting: {str(e)}")  # Or use app logger
+        current_app.logger.error(f"Error in prepare_metadata_for_minting: {str(e)}")
         return jsonify({"error": str(e)}), 500
+    finally:
+        uploads.close_files(mint_files)
+
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    # ?wait=N long-polls for up to N seconds so clients can block until the job completes
+    wait = min(request.args.get('wait', 0, type=float), current_app.config['JOB_MAX_WAIT'])
+    job = jobs.wait_for_job(job_id, wait) if wait > 0 else db.session.get(models.MintJob, job_id)
+
+    # Jobs submitted by a logged-in user are only visible to that user
+    if not job or (job.user_id and job.user_id != session.get('user_id')):
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(jobs.job_to_dict(job)), 200
 
 
 @bp.route('/nft/prepare_metadata_for_update', methods=['POST'])
@@ -648,139 +752,116 @@ def prepare_metadata_for_update():
     if not request.form:
         return jsonify({"error": "Missing form data"}), 400
 
-    required_fields = [
-        'title', 'description', 'external_url', 'plot_id', 'address',
-        'google_maps_location', 'size', 'land_use', 'ownership_verified',
-        'geo_coordinates', 'survey_number', 'owner_name', 'user_doc_html_content',
-        'sale_history_url', 'zone_classification', 'tokenization_date',
-        'minter_address',
-        # Add fields for existing IPFS URLs
-        'existing_image_url',
-        'existing_ownership_doc_url',
-        'existing_encumbrances_url'
-    ]
-
+    # Files are optional here: one that is not resubmitted keeps its existing URL
+    required_fields = minting.REQUIRED_MINT_FIELDS + list(minting.EXISTING_FILE_URL_FIELDS.values())
     for field in required_fields:
         if field not in request.form:
             return jsonify({"error": f"Missing form field: {field}"}), 400
 
     try:
-        # Handle image file or use existing URL
-        if 'image' in request.files and request.files['image'].filename:
-            image_file = request.files['image']
-            image_ipfs_hash = upload_file_to_ipfs(image_file)
-            if "error:" in image_ipfs_hash:
-                return jsonify(f"Image upload failed: {image_ipfs_hash}"), 400
-            image_url = f"ipfs://{image_ipfs_hash}"
-        else:
-            image_url = request.form['existing_image_url']
-
-        # Handle ownership document or use existing URL
-        if 'ownership_document' in request.files and request.files['ownership_document'].filename:
-            ownership_doc_file = request.files['ownership_document']
-            ownership_doc_ipfs_hash = upload_file_to_ipfs(ownership_doc_file)
-            if "error:" in ownership_doc_ipfs_hash:
-                return jsonify(f"Ownership document upload failed: {ownership_doc_ipfs_hash}"), 400
-            ownership_doc_url = f"ipfs://{ownership_doc_ipfs_hash}"
-        else:
-            ownership_doc_url = request.form['existing_ownership_doc_url']
-
-        # Handle encumbrances file or use existing URL
-        if 'encumbrances' in request.files and request.files['encumbrances'].filename:
-            encumbrances_file = request.files['encumbrances']
-            encumbrances_ipfs_hash = upload_file_to_ipfs(encumbrances_file)
-            if "error:" in encumbrances_ipfs_hash:
-                return jsonify(f"Encumbrances upload failed: {encumbrances_ipfs_hash}"), 400
-            encumbrances_url = f"ipfs://{encumbrances_ipfs_hash}"
-        else:
-            encumbrances_url = request.form['existing_encumbrances_url']
-
-        # Handle HTML content
-        html_file_content = f'''<html>
-                                    <head><meta charset=\"UTF-8\"></head>
-                                    <body>{request.form['user_doc_html_content']}</body>
-                                </html>'''
-        html_file_bytes = io.BytesIO(html_file_content.encode('utf-8'))
-        html_file_storage = FileStorage(stream=html_file_bytes, filename="user_document.html", content_type="text/html")
-        user_doc_ipfs_hash = upload_file_to_ipfs(html_file_storage)
-        if "error:" in user_doc_ipfs_hash:
-            raise Exception(f"User document HTML upload failed: {user_doc_ipfs_hash}")
-
-        # Construct metadata JSON
-        metadata = {
-            "title": request.form['title'],
-            "description": request.form['description'],
-            "image": image_url,
-            "external_url": request.form['external_url'],
-            "attributes": [
-                {"trait_type": "Plot ID", "value": request.form['plot_id']},
-                {"trait_type": "Address", "value": request.form['address']},
-                {"trait_type": "Google Maps Location", "value": request.form['google_maps_location']},
-                {"trait_type": "Size", "value": request.form['size']},
-                {"trait_type": "Land Use", "value": request.form['land_use']},
-                {"trait_type": "Ownership Verified", "value": request.form['ownership_verified']},
-                {"trait_type": "Geo Coordinates", "value": request.form['geo_coordinates']},
-                {"trait_type": "Survey Number", "value": request.form['survey_number']}
-            ],
-            "land_metadata": {
-                "owner_name": request.form['owner_name'],
-                "ownership_doc_url": ownership_doc_url,
-                "user_doc_url": f"ipfs://{user_doc_ipfs_hash}",
-                "sale_history_url": request.form['sale_history_url'],
-                "zone_classification": request.form['zone_classification'],
-                "encumbrances": encumbrances_url,
-                "tokenization_date": request.form['tokenization_date']
-            }
-        }
+        update_files = uploads.gather_files(request.form, request.files, minting.REQUIRED_MINT_FILES,
+                                            user_id=session.get('user_id'))
+    except uploads.UploadError as e:
+        return jsonify({"error": str(e)}), e.status_code
 
-        # Upload final metadata JSON to IPFS
-        metadata_ipfs_hash = upload_json_to_ipfs(metadata)
-        if "error:" in metadata_ipfs_hash:
-            raise Exception(f"Metadata JSON upload failed: {metadata_ipfs_hash}")
-
-        final_token_uri = f"ipfs://{metadata_ipfs_hash}"
+    try:
+        existing_urls = {field: request.form[form_field]
+                         for field, form_field in minting.EXISTING_FILE_URL_FIELDS.items()}
+        final_token_uri = minting.prepare_mint_metadata(request.form, update_files, existing_urls=existing_urls)
         return jsonify({
             "token_uri": final_token_uri,
             "message": "Metadata successfully prepared and uploaded to IPFS."
         }), 200
 
+    except minting.MintPreparationError as e:
+        current_app.logger.error(f"Error in prepare_metadata_for_update: {e}")
+        return jsonify({"error": str(e)}), e.status_code
     except Exception as e:
-        print(f"Error in prepare_metadata_for_update: {str(e)}")
+        current_app.logger.error(f"Error in prepare_metadata_for_update: {str(e)}")
         return jsonify({"error": str(e)}), 500
+    finally:
+        uploads.close_files(update_files)
 
 
-@bp.route('/nft/<token_id>/history', methods=['GET'])
-def get_nft_history(token_id):
+# --- Resumable Uploads (tus-style: create, append chunk at offset, finalize) ---
+@bp.route('/uploads', methods=['POST'])
+def create_upload():
+    data = request.get_json() or {}
     try:
-        # Read the contract ABI in a background thread
-        contract_abi = open(Path(__file__).parent / "abi" / current_app.config.get('NFT_LAND_CONTRACT_ABI_PATH'),
-                            'r').read()
+        upload = uploads.create_upload(data.get('filename'), data.get('size'), data.get('content_type'),
+                                       user_id=session.get('user_id'))
+    except uploads.UploadError as e:
+        return jsonify({"error": str(e)}), e.status_code
 
-        # Set the contract address (replace with your contract's deployed address)
-        contract_address = current_app.config.get('NFT_LAND_CONTRACT_ADDRESS')
-        nft_land_contract = w3.eth.contract(address=Web3.to_checksum_address(contract_address), abi=contract_abi)
-        token_id = int(token_id)
+    location = url_for('main.upload_status', upload_id=upload.id)
+    return jsonify(uploads.upload_to_dict(upload)), 201, {"Location": location, "Upload-Offset": "0"}
 
-        # Get total number of updates
-        update_count = nft_land_contract.functions.getUpdateCount(token_id).call()
 
-        # Fetch all versions in reverse chronological order
-        history = []
-        for i in range(update_count - 1, -1, -1):  # Loop from newest to oldest
-            ipfs_uri = nft_land_contract.functions.tokenUpdates(token_id, i).call()
-            history.append({
-                "version": i + 1,  # Make it 1-based for display
-                "update_index": i,
-                "token_uri": ipfs_uri,
-                "timestamp": "N/A"  # Optional: Add if you have timestamp data
-            })
+@bp.route('/uploads/<upload_id>', methods=['GET', 'HEAD'])
+def upload_status(upload_id):
+    # Clients call this after a dropped connection to learn where to resume
+    try:
+        upload = uploads.get_upload(upload_id, session.get('user_id'))
+    except uploads.UploadError as e:
+        return jsonify({"error": str(e)}), e.status_code
+    return jsonify(uploads.upload_to_dict(upload)), 200, {
+        "Upload-Offset": str(upload.offset), "Upload-Length": str(upload.total_size), "Cache-Control": "no-store"}
 
-        return jsonify({
-            "token_id": token_id,
-            "total_updates": update_count,
-            "history": history
-        })
+
+@bp.route('/uploads/<upload_id>', methods=['PATCH'])
+def append_upload_chunk(upload_id):
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None:
+        return jsonify({"error": "Upload-Offset header is required"}), 400
+
+    try:
+        upload = uploads.get_upload(upload_id, session.get('user_id'))
+        new_offset = uploads.append_chunk(upload, offset, request.stream)
+    except uploads.UploadError as e:
+        return jsonify({"error": str(e)}), e.status_code
+    return "", 204, {"Upload-Offset": str(new_offset)}
+
+
+@bp.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        upload = uploads.get_upload(upload_id, session.get('user_id'))
+        uploads.finalize_upload(upload, sha256=data.get('sha256'))
+    except uploads.UploadError as e:
+        return jsonify({"error": str(e)}), e.status_code
+    return jsonify(uploads.upload_to_dict(upload)), 200
+
+
+@bp.route('/nft/<token_id>/history', methods=['GET'])
+@read_only
+@conditional(services.nft_history_etag, 'NFT_HISTORY_CACHE_CONTROL')
+def get_nft_history(token_id):
+    if current_app.config['NFT_READS_FROM_INDEX'] and services.index_available('nft_land'):
+        try:
+            token_id = int(token_id)
+        except ValueError:
+            return jsonify({"error": "Invalid token id"}), 400
+        result, status = services.query_nft_history(token_id)
+        return jsonify(result), status
+
+    try:
+        token_id = int(token_id)
+        result, status = services.get_nft_updates_onchain(token_id)
+        return jsonify(result), status
 
     except Exception as e:
         current_app.logger.error(f"Error fetching NFT history: {str(e)}")
         return jsonify({"error": str(e)}), 500
+
+
+def _nft_version_etag(token_id, update_index):
+    return make_etag('version', token_id, update_index)  # A history entry never changes once written
+
+
+@bp.route('/nft/<int:token_id>/history/<int:update_index>', methods=['GET'])
+@read_only
+@conditional(_nft_version_etag, 'NFT_VERSION_CACHE_CONTROL')
+def get_nft_version(token_id, update_index):
+    result, status = services.get_nft_version(token_id, update_index)
+    return jsonify(result), status
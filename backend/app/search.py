@@ -0,0 +1,222 @@
+# app/search.py
+# Full-text search for the admin log and user listings.
+#
+# Leading-wildcard ILIKE cannot use an index, so search is backed by a real index that the
+# database maintains on every insert/update, whichever process writes the row:
+#   - PostgreSQL: a generated tsvector column with a GIN index, plus pg_trgm indexes for
+#     partial wallet/email matches. Adding the column rewrites the table and the indexes are
+#     built CONCURRENTLY, so all of it is a one-off `flask install-search` run at a quiet time
+#     (creating pg_trgm needs elevated privileges on most managed databases; without it the
+#     trigram indexes are skipped and partial matches scan). Startup only checks what exists,
+#     and search falls back to the ILIKE scan until the column is there.
+#   - SQLite: FTS5 external-content tables kept in sync by triggers, created at startup.
+# Other dialects fall back to the old ILIKE scan.
+import logging
+import re
+
+from sqlalchemy import text, func, literal_column, select, or_, cast, Float
+
+# Columns covered by the index, per table
+SEARCH_COLUMNS = {
+    'action_log': ('user_address', 'action', 'details'),
+    'user': ('email', 'wallet_address'),
+}
+
+# Columns that also get trigram indexes on PostgreSQL (substring matches on addresses/emails)
+TRIGRAM_COLUMNS = {
+    'action_log': ('user_address',),
+    'user': ('email', 'wallet_address'),
+}
+
+
+# Characters of each column that go into the document; a tsvector is capped at 1 MB,
+# and an unbounded details value would otherwise make the insert itself fail
+MAX_INDEXED_CHARS = 100_000
+
+# Tables whose search_vector column exists (PostgreSQL), as found at startup
+_vector_tables = set()
+
+
+def _postgres_document(columns):
+    return " || ' ' || ".join(f"left(coalesce({column}, ''), {MAX_INDEXED_CHARS})" for column in columns)
+
+
+def _postgres_indexes(table, trigram):
+    # Index name -> access method and key, without the table
+    indexes = {f'ix_{table}_search_vector': 'gin (search_vector)'}
+    for column in TRIGRAM_COLUMNS.get(table, ()) if trigram else ():
+        indexes[f'ix_{table}_{column}_trgm'] = f'gin ({column} gin_trgm_ops)'
+    return indexes
+
+
+def _has_search_vector(conn, table):
+    return conn.execute(text("SELECT 1 FROM information_schema.columns WHERE table_schema = current_schema() "
+                             "AND table_name = :table AND column_name = 'search_vector'"),
+                        {"table": table}).first() is not None
+
+
+def _index_valid(conn, name):
+    # None when the index does not exist; False for the leftover of a failed CONCURRENTLY build
+    return conn.execute(text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+                        {"name": name}).scalar()
+
+
+def _has_trigram(conn):
+    return conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+
+
+def _create_index_concurrently(conn, table, name, key):
+    valid = _index_valid(conn, name)
+    if valid:
+        return
+    if valid is False:
+        conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+    conn.execute(text(f'CREATE INDEX CONCURRENTLY {name} ON "{table}" USING {key}'))
+
+
+def _create_search_index(conn, table, name, key):
+    partitions = conn.execute(text("SELECT inhrelid::regclass::text FROM pg_inherits "
+                                   "WHERE inhparent = to_regclass(:table)"), {"table": table}).scalars().all()
+    if not partitions:
+        _create_index_concurrently(conn, table, name, key)
+        return
+    # A partitioned table cannot be indexed CONCURRENTLY: build each partition's index that way
+    # and attach it to an index created on the parent alone (new partitions then get one too)
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON ONLY "{table}" USING {key}'))
+    for partition in partitions:
+        partition_index = f"ix_{partition}_{name[len(f'ix_{table}_'):]}"
+        _create_index_concurrently(conn, partition, partition_index, key)
+        conn.execute(text(f'ALTER INDEX {name} ATTACH PARTITION {partition_index}'))
+
+
+def _sqlite_ddl(table, columns):
+    fts = f"{table}_fts"
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    delete_old = (f"INSERT INTO {fts}({fts}, rowid, {column_list}) "
+                  f"VALUES ('delete', old.id, {old_values});")
+    insert_new = f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values});"
+    return [
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column_list}, '
+        f"content='{table}', content_rowid='id')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON "{table}" BEGIN {insert_new} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON "{table}" BEGIN {delete_old} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON "{table}" BEGIN {delete_old} {insert_new} END',
+    ]
+
+
+def install_search_extension(engine):
+    """Creates the pg_trgm extension (PostgreSQL only). Run once, as a role allowed to."""
+    if engine.dialect.name != 'postgresql':
+        return False
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    return True
+
+
+def _install_sqlite(conn):
+    for table, columns in SEARCH_COLUMNS.items():
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+                              {"name": f"{table}_fts"}).first()
+        for statement in _sqlite_ddl(table, columns):
+            conn.execute(text(statement))
+        if not exists:
+            # Index the rows written before the FTS table existed
+            conn.execute(text(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"))
+
+
+def install_search_indexes(engine):
+    """Creates the search columns/tables, indexes and triggers. Run from `flask install-search`.
+
+    On PostgreSQL this adds the generated column (a table rewrite, so only when it is missing)
+    and builds the indexes CONCURRENTLY, outside a transaction, so writes carry on meanwhile.
+    """
+    if engine.dialect.name == 'sqlite':
+        with engine.begin() as conn:
+            _install_sqlite(conn)
+        return
+    if engine.dialect.name != 'postgresql':
+        return
+
+    for table, columns in SEARCH_COLUMNS.items():
+        with engine.begin() as conn:
+            if not _has_search_vector(conn, table):
+                conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN search_vector tsvector GENERATED ALWAYS AS '
+                                  f"(to_tsvector('simple', {_postgres_document(columns)})) STORED"))
+        _vector_tables.add(table)
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        trigram = _has_trigram(conn)
+        for table in SEARCH_COLUMNS:
+            for name, key in _postgres_indexes(table, trigram).items():
+                _create_search_index(conn, table, name, key)
+
+
+def check_search_indexes(engine):
+    """Startup hook: creates the (cheap) SQLite FTS tables; on PostgreSQL only checks what exists."""
+    if engine.dialect.name == 'sqlite':
+        with engine.begin() as conn:
+            _install_sqlite(conn)
+        return
+    if engine.dialect.name != 'postgresql':
+        return
+
+    with engine.connect() as conn:
+        trigram = _has_trigram(conn)
+        if not trigram:
+            logging.warning("pg_trgm is not installed; partial wallet/email matches scan until it is "
+                            "(then run `flask install-search`)")
+        missing = []
+        for table in SEARCH_COLUMNS:
+            if _has_search_vector(conn, table):
+                _vector_tables.add(table)
+            else:
+                _vector_tables.discard(table)
+                missing.append(f"{table}.search_vector")
+            missing.extend(name for name in _postgres_indexes(table, trigram) if not _index_valid(conn, name))
+    if missing:
+        logging.warning("Search is not fully indexed (missing %s); run `flask install-search`", ", ".join(missing))
+
+
+def _fts5_match_expression(search_query):
+    # Quote every term (FTS5 syntax characters become literals) and prefix-match it,
+    # so "0xAbC12 transfer" finds partial addresses as well as whole words.
+    terms = [term for term in re.split(r'[^\w]+', search_query) if term]
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def apply_search(query, model, search_query):
+    """Filters `query` to rows of `model` matching `search_query`.
+
+    Returns (query, rank) where ordering by `rank.desc()` puts the best matches first;
+    rank is None when the dialect has no search index to rank with.
+    """
+    table = model.__tablename__
+    columns = [getattr(model, column) for column in SEARCH_COLUMNS[table]]
+    dialect = query.session.get_bind(mapper=model.__mapper__).dialect.name
+
+    if dialect == 'postgresql' and table in _vector_tables:
+        vector = literal_column(f'"{table}".search_vector')
+        ts_query = func.websearch_to_tsquery('simple', search_query)
+        trigram_matches = [getattr(model, column).ilike(f"%{search_query}%")
+                           for column in TRIGRAM_COLUMNS.get(table, ())]
+        query = query.filter(or_(vector.op('@@')(ts_query), *trigram_matches))
+        # ts_rank is float4; as float8 the ORDER BY and the keyset cursor compare the same value
+        return query, cast(func.ts_rank(vector, ts_query), Float(precision=53))
+
+    if dialect == 'sqlite':
+        match = _fts5_match_expression(search_query)
+        if match:
+            fts = f"{table}_fts"
+            # bm25() is lower-is-better, so negate it to keep "rank desc" meaning "best first"
+            matches = (select(literal_column('rowid').label('id'), (-func.bm25(literal_column(fts))).label('rank'))
+                       .select_from(text(fts))
+                       .where(text(f"{fts} MATCH :match").bindparams(match=match))
+                       .subquery())
+            query = query.join(matches, matches.c.id == model.id)
+            return query, matches.c.rank
+
+    # No index available: the original substring scan
+    search_term = f"%{search_query}%"
+    query = query.filter(or_(*[column.ilike(search_term) for column in columns]))
+    return query, None
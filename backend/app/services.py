@@ -1,13 +1,17 @@
 from pathlib import Path
-from flask import current_app
+from flask import current_app, g
 from web3 import Web3  # Make sure Web3 is imported for type hinting and utilities
+from web3.exceptions import ContractLogicError, BadFunctionCallOutput
 
-# Import the initialized instances from your app package (app/__init__.py)
-# This assumes your app/__init__.py defines w3, nft_land_contract, etc. globally within that file
-# and they are not None.
-from . import w3, nft_land_contract, action_logger_contract, nft_marketplace_contract
+# Web3 and the contract instances are created lazily by app/chain.py on first use; contract reads go
+# through app/singleflight.py so identical concurrent reads share one RPC call
+from . import db, chain, singleflight, cache, action_logs
+from .models import MarketListing, NFTToken, NFTVersion, IndexerState
+from .pagination import keyset_paginate
+from .http_cache import make_etag
 
 def log_action_on_chain(user_address, action_description, details_json_str, acting_as_address=None):
+    w3, action_logger_contract = chain.get_w3(), chain.get_contract('action_logger')
     if not action_logger_contract:  # Check if contract instance is valid
         current_app.logger.error("ActionLogger contract not loaded or not available.")
         return {"error": "ActionLogger service not available"}, False
@@ -45,8 +49,13 @@ def log_action_on_chain(user_address, action_description, details_json_str, acti
         transaction = transaction_call.build_transaction(tx_params)  # build_transaction is a method
 
         signed_tx = w3.eth.account.sign_transaction(transaction, private_key=backend_private_key)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        # Visible in /admin/logs right away; the event indexer confirms the row when the event arrives
+        action_logs.record_pending(db.session, tx_hash.hex(), backend_wallet_address, action_description,
+                                   details_json_str)
         tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+        if tx_receipt.status == 0:
+            action_logs.mark_failed(db.session, tx_hash.hex())
 
         current_app.logger.info(f"Action logged on-chain: {action_description}, Tx: {tx_hash.hex()}")
         return {"tx_hash": tx_hash.hex(), "status": tx_receipt.status}, True
@@ -59,7 +68,25 @@ def log_action_on_chain(user_address, action_description, details_json_str, acti
         return {"error": str(e)}, False
 
 
+# Token reads are cached (app/cache.py) under keys that carry the token's version, taken from the
+# same source as the read's ETag: the indexed NFTToken row, or getUpdateCount on-chain. A change
+# moves readers to a new key, so no worker can serve an old body under a new ETag and nothing
+# has to be invalidated across processes; old entries simply expire.
+def _token_cache_key(token_id, *version):
+    return ":".join(str(part) for part in (token_id, *version))
+
+
 def get_nft_details(token_id):
+    token = _indexed_token(token_id)
+    key = _token_cache_key(token_id, token.owner, token.update_count, token.updated_block) if token else token_id
+    result, status = cache.get_or_set('nft', key, lambda: _fetch_nft_details(token_id),
+                                      current_app.config['NFT_CACHE_TTL'],
+                                      should_cache=lambda response: response[1] == 200)
+    return result, status
+
+
+def _fetch_nft_details(token_id):
+    w3, nft_land_contract = chain.get_w3(), chain.get_contract('nft_land')
     if not nft_land_contract:  # Check if contract instance is valid
         current_app.logger.error("NFTLand contract not loaded or not available.")
         return {"error": "NFTLand contract not loaded."}, 503
@@ -69,8 +96,8 @@ def get_nft_details(token_id):
 
     try:
         # The .functions accessor should exist if nft_land_contract is valid
-        owner = nft_land_contract.functions.ownerOf(token_id).call()
-        token_uri = nft_land_contract.functions.tokenData(token_id).call()
+        owner = singleflight.call(nft_land_contract.functions.ownerOf(token_id))
+        token_uri = singleflight.call(nft_land_contract.functions.tokenData(token_id))
         return {
             "token_id": token_id,
             "owner": owner,
@@ -84,6 +111,7 @@ def get_nft_details(token_id):
 
 
 def get_active_listings_from_contract(limit=50, offset=0):
+    w3, nft_marketplace_contract = chain.get_w3(), chain.get_contract('nft_marketplace')
     if not nft_marketplace_contract:  # Check if contract instance is valid
         current_app.logger.error("Marketplace contract not loaded or not available.")
         return {"error": "Marketplace contract not loaded"}, 503
@@ -93,7 +121,7 @@ def get_active_listings_from_contract(limit=50, offset=0):
 
     try:
         # The .functions accessor should exist if nft_marketplace_contract is valid
-        total_listings_on_chain = nft_marketplace_contract.functions.getTotalListings().call()
+        total_listings_on_chain = singleflight.call(nft_marketplace_contract.functions.getTotalListings())
         # ... rest of the logic (which I mentioned is inefficient on-chain)
         return {"message": "Fetching active listings from on-chain is inefficient. Use an event indexer.", "data": [],
                 "total_on_chain_listings_for_debug": total_listings_on_chain}, 200
@@ -104,6 +132,233 @@ def get_active_listings_from_contract(limit=50, offset=0):
         return {"error": str(e)}, 500
 
 
+MARKET_LISTING_SORTS = {
+    # sort name -> keyset sort keys (listing ids grow with time, so they double as recency)
+    'recent': [(MarketListing.listing_id, True)],
+    'price_asc': [(MarketListing.price_wei, False), (MarketListing.listing_id, False)],
+    'price_desc': [(MarketListing.price_wei, True), (MarketListing.listing_id, True)],
+}
+
+
+def query_market_listings(min_price_wei=None, max_price_wei=None, seller=None, nft_contract=None,
+                          sort='recent', cursor=None, per_page=20):
+    """Browses the indexed active listings. Every filter/sort combination is served by one of
+    the MarketListing indexes, so a page is a bounded index range scan."""
+    if sort not in MARKET_LISTING_SORTS:
+        return {"error": f"Unknown sort '{sort}'. Use one of: {', '.join(MARKET_LISTING_SORTS)}"}, 400
+
+    query = MarketListing.query.filter(MarketListing.status == 'active')
+    if min_price_wei is not None:
+        query = query.filter(MarketListing.price_wei >= min_price_wei)
+    if max_price_wei is not None:
+        query = query.filter(MarketListing.price_wei <= max_price_wei)
+    if seller:
+        query = query.filter(MarketListing.seller == Web3.to_checksum_address(seller))
+    if nft_contract:
+        query = query.filter(MarketListing.nft_contract == Web3.to_checksum_address(nft_contract))
+
+    listings, next_cursor, prev_cursor = keyset_paginate(query, MARKET_LISTING_SORTS[sort], cursor, per_page)
+    return {
+        "data": [{
+            "listing_id": listing.listing_id,
+            "nft_contract": listing.nft_contract,
+            "token_id": listing.token_id,
+            "seller": listing.seller,
+            "price_wei": str(int(listing.price_wei)),
+            "price_matic": str(Web3.from_wei(int(listing.price_wei), 'ether')),
+            "listed_block": listing.listed_block,
+            "tx_hash": listing.tx_hash,
+        } for listing in listings],
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }, 200
+
+
+def index_available(stream_name):
+    # The indexer records progress for a stream ('nft_land', 'nft_marketplace', ...) per block
+    # range, and marks it caught up once a range ends at the head. While it is still backfilling
+    # (or has fallen more than a batch behind) the tables are partial, so reads use the contracts.
+    state = db.session.get(IndexerState, stream_name)
+    return state is not None and state.caught_up
+
+
+def query_owned_nfts(owner, cursor=None, per_page=100):
+    """Tokens currently owned by `owner`, from the NFTToken table the event indexer maintains.
+    Same shape as the contract-backed response ({tokenID, tokenURI}), one page at a time."""
+    query = NFTToken.query.filter(NFTToken.owner == Web3.to_checksum_address(owner))
+    tokens, next_cursor, _ = keyset_paginate(query, [(NFTToken.token_id, False)], cursor, per_page)
+    return {
+        "nfts": [{"tokenID": token.token_id, "tokenURI": token.token_data} for token in tokens],
+        "next_cursor": next_cursor,
+    }, 200
+
+
+def query_nft_history(token_id):
+    """Every version of a token, newest first, from the indexed NFTMinted/NFTUpdated events."""
+    # The indexer writes a token's versions and its update_count in one transaction
+    token = db.session.get(NFTToken, token_id)
+    key = _token_cache_key(token_id, token.update_count if token else 0)
+    result = cache.get_or_set('nft_history', key, lambda: _query_nft_history(token_id),
+                              current_app.config['NFT_HISTORY_CACHE_TTL'])
+    return result, 200
+
+
+def _query_nft_history(token_id):
+    versions = (NFTVersion.query
+                .filter(NFTVersion.token_id == token_id)
+                .order_by(NFTVersion.update_index.desc())
+                .all())
+    return {
+        "token_id": token_id,
+        "total_updates": len(versions),
+        "history": [version_to_dict(version) for version in versions]
+    }
+
+
+def version_to_dict(version):
+    return {
+        "version": version.update_index + 1,  # 1-based for display
+        "update_index": version.update_index,
+        "token_uri": version.token_uri,
+        "timestamp": version.timestamp.isoformat() + "Z" if version.timestamp else None,
+        "block_number": version.block_number,
+        "tx_hash": version.tx_hash,
+    }
+
+
+def get_nft_version(token_id, update_index):
+    """One entry of a token's history. Entries are append-only, so a found entry never changes
+    (indexed ones are also past INDEXER_CONFIRMATIONS)."""
+    if current_app.config['NFT_READS_FROM_INDEX'] and index_available('nft_land'):
+        version = db.session.get(NFTVersion, (token_id, update_index))
+        if version is None:
+            return {"error": "Version not found"}, 404
+        return {"token_id": token_id, **version_to_dict(version)}, 200
+
+    nft_land_contract = chain.get_contract('nft_land')
+    if not nft_land_contract:
+        return {"error": "NFTLand contract not loaded."}, 503
+    try:
+        token_uri = singleflight.call(nft_land_contract.functions.tokenUpdates(token_id, update_index))
+    except (ContractLogicError, BadFunctionCallOutput):
+        return {"error": "Version not found"}, 404  # Index past the end of tokenUpdates
+    return {"token_id": token_id, "version": update_index + 1, "update_index": update_index,
+            "token_uri": token_uri, "timestamp": "N/A"}, 200
+
+
+# --- HTTP validators for conditional GETs (see app/http_cache.py) ---
+def _indexed_token(token_id):
+    if not current_app.config['NFT_READS_FROM_INDEX'] or not index_available('nft_land'):
+        return None
+    return db.session.get(NFTToken, token_id)
+
+
+def nft_etag(token_id):
+    # Owner and data only change with a Transfer or NFTUpdated event, which the indexer records
+    token = _indexed_token(token_id)
+    if token is None:
+        return None
+    return make_etag('nft', token_id, token.owner, token.update_count, token.updated_block)
+
+
+def nft_history_etag(token_id):
+    # History is append-only: its length identifies it
+    try:
+        token_id = int(token_id)
+    except ValueError:
+        return None
+    if current_app.config['NFT_READS_FROM_INDEX'] and index_available('nft_land'):
+        token = db.session.get(NFTToken, token_id)
+        return make_etag('history', token_id, token.update_count) if token else None
+
+    nft_land_contract = chain.get_contract('nft_land')
+    if not nft_land_contract:
+        return None
+    try:
+        update_count = _onchain_update_count(nft_land_contract, token_id)
+    except Exception as e:
+        current_app.logger.warning(f"Could not read update count of token {token_id}: {e}")
+        return None
+    return make_etag('history', token_id, update_count)
+
+
+# --- Paginated contract views (deployments without the event indexer) ---
+ONCHAIN_PAGE_SIZE = 100  # MAX_PAGE_SIZE in NFTLand and NFTMarketplace
+
+
+def _onchain_update_count(nft_land_contract, token_id):
+    # Read once per request: nft_history_etag and get_nft_updates_onchain then describe the same
+    # history, and a conditional GET costs one getUpdateCount call rather than two
+    counts = g.setdefault('nft_update_counts', {})
+    if token_id not in counts:
+        counts[token_id] = singleflight.call(nft_land_contract.functions.getUpdateCount(token_id))
+    return counts[token_id]
+
+
+def get_nft_updates_onchain(token_id):
+    """Every version of a token, newest first, from its tokenUpdates entries read one getUpdates
+    page per call. Contracts deployed before getUpdates existed are read one entry per call."""
+    nft_land_contract = chain.get_contract('nft_land')
+    if not nft_land_contract:
+        return {"error": "NFTLand contract not loaded."}, 503
+    update_count = _onchain_update_count(nft_land_contract, token_id)  # The count the ETag used
+    updates = cache.get_or_set('nft_updates', _token_cache_key(token_id, update_count),
+                               lambda: _fetch_nft_updates_onchain(nft_land_contract, token_id, update_count),
+                               current_app.config['NFT_HISTORY_CACHE_TTL'])
+    return {
+        "token_id": token_id,
+        "total_updates": len(updates),
+        "history": [{
+            "version": i + 1,  # 1-based for display
+            "update_index": i,
+            "token_uri": token_uri,
+            "timestamp": "N/A"  # Block times are only known to the event indexer
+        } for i, token_uri in reversed(list(enumerate(updates)))]
+    }, 200
+
+
+def _fetch_nft_updates_onchain(nft_land_contract, token_id, update_count):
+    try:
+        updates, total = singleflight.call(nft_land_contract.functions.getUpdates(token_id, 0, ONCHAIN_PAGE_SIZE))
+    except (ContractLogicError, BadFunctionCallOutput):
+        return [singleflight.call(nft_land_contract.functions.tokenUpdates(token_id, i)) for i in range(update_count)]
+
+    updates = list(updates)
+    while len(updates) < total:
+        page, total = singleflight.call(nft_land_contract.functions.getUpdates(token_id, len(updates),
+                                                                               ONCHAIN_PAGE_SIZE))
+        if not page:
+            break
+        updates.extend(page)
+    return updates
+
+
+def get_active_listings_onchain(offset=0, limit=ONCHAIN_PAGE_SIZE):
+    """One bounded getActiveListings scan. The cursor is the next array offset; a page can hold
+    fewer than `limit` listings (even none) while next_cursor is still set."""
+    nft_marketplace_contract = chain.get_contract('nft_marketplace')
+    if offset < 0:
+        raise ValueError("offset must not be negative")
+    limit = max(1, min(limit, ONCHAIN_PAGE_SIZE))
+    listings, listing_ids, next_offset = singleflight.call(
+        nft_marketplace_contract.functions.getActiveListings(offset, limit))
+    return {
+        "data": [{
+            "listing_id": listing_id,
+            "nft_contract": nft_contract,
+            "token_id": token_id,
+            "seller": seller,
+            "price_wei": str(price),
+            "price_matic": str(Web3.from_wei(price, 'ether')),
+            "listed_block": None,
+            "tx_hash": None,
+        } for (seller, nft_contract, token_id, price, _), listing_id in zip(listings, listing_ids)],
+        # A window that ended short of offset + limit reached the end of the listings array
+        "next_cursor": str(next_offset) if next_offset == offset + limit else None,
+        "prev_cursor": None,
+    }, 200
+
+
 # --- Fiat On-Ramp Conceptual Service ---
 def get_fiat_onramp_quote(amount_inr, crypto_currency="MATIC", user_wallet_address=None):
     """
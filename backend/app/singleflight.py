@@ -0,0 +1,51 @@
+# app/singleflight.py
+# Request coalescing for contract reads.
+#
+# When a parcel is shared, many requests read the same token within the same second. Reads
+# go through call(), keyed by (contract, function, args, block tag): the first caller of a
+# key performs the RPC, and callers arriving while it is in flight wait for and share its
+# result (or exception) instead of issuing their own. Nothing is cached once the call is
+# done. Coalescing is per process; shared results must be treated as read-only.
+import threading
+
+_inflight = {}  # key -> _Call
+_lock = threading.Lock()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def do(key, fn):
+    """Runs fn() once for all concurrent callers with the same key."""
+    with _lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+
+    if not leader:
+        call.done.wait()  # The leader's RPC is bounded by RPC_TIMEOUT
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = fn()
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            del _inflight[key]
+        call.done.set()
+
+
+def call(contract_function, block_identifier='latest'):
+    """contract_function.call(), shared with identical reads already in flight."""
+    key = (contract_function.address, contract_function.fn_name, repr(contract_function.args), block_identifier)
+    return do(key, lambda: contract_function.call(block_identifier=block_identifier))
@@ -0,0 +1,59 @@
+# app/stats.py
+# Platform statistics maintained incrementally by the event indexer. Each handler bumps the
+# counters inside the transaction that writes its event (together with the indexer's stored
+# progress), so totals stay exact and the admin overview is a constant-size read.
+from datetime import datetime, timedelta, UTC
+
+from .models import PlatformStat, DailyPlatformStat
+
+# Metric name -> description. Wei-denominated metrics are returned as strings.
+METRICS = {
+    'nfts_minted': "NFTMinted events",
+    'nft_updates': "NFTUpdated events",
+    'listings_created': "NFTListed events",
+    'active_listings': "Listings currently active",
+    'sales': "NFTSold events",
+    'sales_volume_wei': "Sum of sale prices",
+    'commission_wei': "Sum of platform commissions",
+}
+WEI_METRICS = ('sales_volume_wei', 'commission_wei')
+
+
+def bump(db_session, name, delta=1, block_timestamp=None):
+    """Adds `delta` to the running total and, if the event time is known, to that day's bucket."""
+    stat = db_session.get(PlatformStat, name)
+    if stat is None:
+        stat = PlatformStat(name=name, value=0)
+        db_session.add(stat)
+    # As ints: Decimal arithmetic rounds to 28 digits, and wei totals can have up to 78
+    stat.value = int(stat.value or 0) + int(delta)
+
+    if block_timestamp is not None:
+        day = datetime.fromtimestamp(block_timestamp, UTC).date()
+        bucket = db_session.get(DailyPlatformStat, (day, name))
+        if bucket is None:
+            bucket = DailyPlatformStat(day=day, name=name, value=0)
+            db_session.add(bucket)
+        bucket.value = int(bucket.value or 0) + int(delta)
+
+
+def _format(name, value):
+    value = int(value or 0)
+    return str(value) if name in WEI_METRICS else value
+
+
+def get_overview(days=0):
+    totals = {name: _format(name, 0) for name in METRICS}
+    for stat in PlatformStat.query.all():
+        totals[stat.name] = _format(stat.name, stat.value)
+
+    overview = {"totals": totals}
+    if days:
+        since = datetime.now(UTC).date() - timedelta(days=days - 1)
+        daily = {}
+        for bucket in (DailyPlatformStat.query
+                       .filter(DailyPlatformStat.day >= since)
+                       .order_by(DailyPlatformStat.day)):
+            daily.setdefault(bucket.day.isoformat(), {})[bucket.name] = _format(bucket.name, bucket.value)
+        overview["daily"] = daily
+    return overview
@@ -0,0 +1,186 @@
+# app/uploads.py
+# Resumable, chunked uploads (tus-style: create, append at offset, finalize).
+# Large documents are assembled on disk chunk by chunk, so a dropped mobile connection only
+# costs the missing chunk. The mint endpoints then reference finished uploads by id.
+import hashlib
+import uuid
+from datetime import datetime, timedelta, UTC
+from pathlib import Path
+
+from flask import current_app
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+
+from . import db
+from .models import ChunkedUpload
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _storage_dir():
+    path = Path(current_app.config['UPLOAD_STORAGE_DIR'])
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def create_upload(filename, total_size, content_type=None, user_id=None):
+    if not filename:
+        raise UploadError("Missing filename")
+    if not isinstance(total_size, int) or total_size <= 0:
+        raise UploadError("size must be a positive integer")
+    if total_size > current_app.config['UPLOAD_MAX_SIZE']:
+        raise UploadError("File exceeds the maximum upload size", 413)
+
+    upload_id = uuid.uuid4().hex
+    path = _storage_dir() / f"{upload_id}-{secure_filename(filename) or 'upload'}"
+    path.touch()
+
+    now = datetime.now(UTC)
+    upload = ChunkedUpload(
+        id=upload_id, user_id=user_id, filename=filename, content_type=content_type,
+        total_size=total_size, offset=0, status='uploading', path=str(path),
+        created_at=now, updated_at=now
+    )
+    db.session.add(upload)
+    db.session.commit()
+    return upload
+
+
+def get_upload(upload_id, user_id=None):
+    upload = db.session.get(ChunkedUpload, upload_id)
+    # Uploads created by a logged-in user are only visible to that user
+    if not upload or (upload.user_id and upload.user_id != user_id):
+        raise UploadError("Upload not found", 404)
+    return upload
+
+
+def append_chunk(upload, offset, stream):
+    """Writes the chunk in `stream` at `offset` and returns the new offset.
+
+    The client must resume exactly at the stored offset; anything else is a 409 so
+    the client re-syncs with HEAD /uploads/<id> instead of corrupting the file.
+    """
+    if upload.status == 'complete':
+        raise UploadError("Upload is already complete", 409)
+    if offset != upload.offset:
+        raise UploadError(f"Offset mismatch: expected {upload.offset}", 409)
+
+    # Claim the offset before touching the file, so of two concurrent PATCHes only the winner
+    # writes. A claim left behind by a dead worker can be taken over after UPLOAD_CHUNK_CLAIM_SECONDS.
+    stale = datetime.now(UTC) - timedelta(seconds=current_app.config['UPLOAD_CHUNK_CLAIM_SECONDS'])
+    claimed = (ChunkedUpload.query
+               .filter(ChunkedUpload.id == upload.id, ChunkedUpload.offset == offset,
+                       db.or_(ChunkedUpload.status == 'uploading',
+                              db.and_(ChunkedUpload.status == 'appending', ChunkedUpload.updated_at < stale)))
+               .update({"status": 'appending', "updated_at": datetime.now(UTC)}, synchronize_session=False))
+    db.session.commit()
+    if not claimed:
+        raise UploadError("Upload was modified concurrently", 409)
+
+    written = 0
+    try:
+        with open(upload.path, 'r+b') as f:
+            f.seek(offset)
+            try:
+                while True:
+                    chunk = stream.read(COPY_BUFFER_SIZE)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if offset + written > upload.total_size:
+                        raise UploadError("Chunk exceeds the declared upload size", 413)
+                    f.write(chunk)
+            except BaseException:
+                written = 0  # Drop the partial chunk; the client resends it from `offset`
+                raise
+            finally:
+                f.truncate(offset + written)
+    finally:
+        # Release the claim, advancing the offset past what was written
+        ChunkedUpload.query.filter_by(id=upload.id, offset=offset, status='appending').update(
+            {"offset": offset + written, "status": 'uploading', "updated_at": datetime.now(UTC)},
+            synchronize_session=False)
+        db.session.commit()
+    db.session.refresh(upload)
+    return upload.offset
+
+
+def finalize_upload(upload, sha256=None):
+    if upload.status == 'complete':
+        return upload
+    if upload.status == 'appending':
+        raise UploadError("A chunk is still being written", 409)
+    if upload.offset != upload.total_size:
+        raise UploadError(f"Upload incomplete: {upload.offset} of {upload.total_size} bytes received", 409)
+
+    if sha256:
+        digest = hashlib.sha256()
+        with open(upload.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(COPY_BUFFER_SIZE), b''):
+                digest.update(chunk)
+        if digest.hexdigest() != sha256.lower():
+            raise UploadError("Checksum mismatch", 422)
+
+    upload.status = 'complete'
+    upload.updated_at = datetime.now(UTC)
+    db.session.commit()
+    return upload
+
+
+def upload_to_dict(upload):
+    return {
+        "upload_id": upload.id,
+        "filename": upload.filename,
+        "content_type": upload.content_type,
+        "size": upload.total_size,
+        "offset": upload.offset,
+        "status": upload.status,
+    }
+
+
+def open_completed_upload(upload_id, user_id=None):
+    upload = get_upload(upload_id, user_id)
+    if upload.status != 'complete':
+        raise UploadError(f"Upload {upload_id} is not finalized", 409)
+    return FileStorage(stream=open(upload.path, 'rb'), filename=upload.filename, content_type=upload.content_type)
+
+
+def gather_files(form, files, fields, user_id=None):
+    """Maps each of `fields` to a FileStorage, taken from the request files or,
+    failing that, from a finished upload referenced as `<field>_upload_id`.
+    Fields with neither are left out so the caller's validation reports them.
+    """
+    gathered = {}
+    try:
+        for field in fields:
+            if field in files:
+                gathered[field] = files[field]
+            elif form.get(f"{field}_upload_id"):
+                gathered[field] = open_completed_upload(form[f"{field}_upload_id"], user_id)
+    except UploadError:
+        close_files(gathered)
+        raise
+    return gathered
+
+
+def close_files(files):
+    for file in files.values():
+        file.stream.close()
+
+
+def delete_expired_uploads():
+    # Uploads not touched within UPLOAD_EXPIRY_HOURS are abandoned or already minted
+    cutoff = datetime.now(UTC) - timedelta(hours=current_app.config['UPLOAD_EXPIRY_HOURS'])
+    expired = ChunkedUpload.query.filter(ChunkedUpload.updated_at < cutoff).all()
+    for upload in expired:
+        Path(upload.path).unlink(missing_ok=True)
+        db.session.delete(upload)
+    db.session.commit()
+    return len(expired)
+
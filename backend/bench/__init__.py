@@ -0,0 +1,3 @@
+# bench/
+# Load-test and benchmark suite; see bench/run.py. Needs the packages in
+# bench/requirements.txt on top of requirements.txt.
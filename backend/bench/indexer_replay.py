@@ -0,0 +1,285 @@
+# bench/indexer_replay.py
+# Offline indexer benchmark. `record` saves raw eth_getLogs responses (and the block headers
+# the handlers need) to a gzipped JSON-lines fixture; `replay` feeds them through the
+# indexer's decode and write path (event_indexer.decode_logs, the STREAMS handlers, flush and
+# commit) against a scratch database, with no chain involved. Run from backend/:
+#
+#   python -m bench.indexer_replay record fixtures/polygon.jsonl.gz --from-block 5000000 --to-block 5200000
+#   python -m bench.indexer_replay replay fixtures/polygon.jsonl.gz --output before.json
+#   python -m bench.indexer_replay replay fixtures/polygon.jsonl.gz --compare before.json
+#
+# `record` uses the normal RPC and contract settings (.env). `replay` decodes with the ABIs in
+# app/abi/ and the contract addresses stored in the fixture, so handler and ABI changes can be
+# measured against the same logs on any commit.
+import argparse
+import gzip
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, UTC
+from pathlib import Path
+
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.datastructures import AttributeDict
+
+FIXTURE_FORMAT = 1
+HEX_FIELDS = ('blockHash', 'transactionHash', 'data')
+
+
+def log(message):
+    print(message, flush=True)
+
+
+def encode_log(raw_log):
+    entry = dict(raw_log)
+    for field in HEX_FIELDS:
+        if field in entry:
+            entry[field] = Web3.to_hex(entry[field])
+    entry['topics'] = [Web3.to_hex(topic) for topic in entry['topics']]
+    return entry
+
+
+def decode_log(entry):
+    raw_log = dict(entry)
+    for field in HEX_FIELDS:
+        if field in raw_log:
+            raw_log[field] = HexBytes(raw_log[field])
+    raw_log['topics'] = [HexBytes(topic) for topic in raw_log['topics']]
+    return AttributeDict(raw_log)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- Recording ---
+def record(args):
+    from app import event_indexer, chain, blocks
+    from app.config import Config
+
+    w3 = chain.get_w3()
+    if w3 is None or not w3.is_connected():
+        log("Cannot record: the RPC endpoint (POLYGON_RPC_URL) is not reachable")
+        return 1
+    streams = args.streams.split(',') if args.streams else list(event_indexer.STREAMS)
+    contracts = {name: chain.get_contract(name) for name in streams}
+    missing = [name for name, contract in contracts.items() if contract is None]
+    if missing:
+        log(f"Cannot record: contracts not configured for {', '.join(missing)}")
+        return 1
+
+    from_block = args.from_block if args.from_block is not None else Config.INDEXER_START_BLOCK
+    to_block = args.to_block if args.to_block is not None else w3.eth.block_number - Config.INDEXER_CONFIRMATIONS
+    batch_size = args.batch_size or Config.INDEXER_BATCH_SIZE
+    Path(args.fixture).parent.mkdir(parents=True, exist_ok=True)
+    total = 0
+    with gzip.open(args.fixture, 'wt') as f:
+        f.write(json.dumps({
+            "format": FIXTURE_FORMAT, "chain_id": w3.eth.chain_id, "from_block": from_block, "to_block": to_block,
+            "recorded_at": datetime.now(UTC).isoformat(),
+            "addresses": {name: contract.address for name, contract in contracts.items()},
+        }) + "\n")
+        for name, contract in contracts.items():
+            for start in range(from_block, to_block + 1, batch_size):
+                end = min(to_block, start + batch_size - 1)
+                raw_logs = event_indexer.fetch_logs(contract, start, end)
+                headers = {}
+                if name in event_indexer.TIMESTAMPED_STREAMS and raw_logs:
+                    block_numbers = sorted({raw_log['blockNumber'] for raw_log in raw_logs})
+                    blocks.prefetch(w3, block_numbers)
+                    headers = {number: blocks.get_block_header(w3, number) for number in block_numbers}
+                f.write(json.dumps({"stream": name, "from_block": start, "to_block": end, "headers": headers,
+                                    "logs": [encode_log(raw_log) for raw_log in raw_logs]}) + "\n")
+                total += len(raw_logs)
+            log(f"  {name}: recorded up to block {to_block} ({total} logs so far)")
+    log(f"Recorded {total} logs from blocks {from_block}-{to_block} to {args.fixture}")
+    return 0
+
+
+# --- Replay ---
+def read_fixture(path):
+    with gzip.open(path, 'rt') as f:
+        header = json.loads(f.readline())
+        if header.get('format') != FIXTURE_FORMAT:
+            raise ValueError(f"Unsupported fixture format {header.get('format')} in {path}")
+        yield header
+        for line in f:
+            yield json.loads(line)
+
+
+def configure_environment(args, header, workdir):
+    # Must happen before the app package is imported: Config reads the environment at import time
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{workdir / 'replay.db'}"
+    os.environ['POLYGON_RPC_URL'] = 'http://replay.invalid'  # Never contacted: every header comes from the fixture
+    for name, address in header['addresses'].items():
+        os.environ[f"{name.upper()}_CONTRACT_ADDRESS"] = address
+
+
+def replay_once(args):
+    """One pass over the fixture into an empty database; returns the measurements."""
+    from app import db, event_indexer, chain, blocks
+
+    db_session = event_indexer.new_session()
+    engine = db_session.get_bind()
+    db.metadata.drop_all(bind=engine)
+    db.metadata.create_all(bind=engine)
+
+    stages = defaultdict(float)
+    handler_time, handler_events = defaultdict(float), defaultdict(int)
+    raw_count = event_count = 0
+    if args.trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        fixture = read_fixture(args.fixture)
+        next(fixture)
+        while True:
+            t = time.perf_counter()
+            batch = next(fixture, None)
+            if batch is None:
+                break
+            stream_name = batch['stream']
+            raw_logs = [decode_log(entry) for entry in batch['logs']]
+            blocks.preload(batch['headers'])
+            stages['load'] += time.perf_counter() - t
+
+            t = time.perf_counter()
+            contract, handlers = chain.get_contract(stream_name), event_indexer.STREAMS[stream_name]
+            decoded = event_indexer.decode_logs(contract, handlers, raw_logs)
+            stages['decode'] += time.perf_counter() - t
+
+            for event, handler in decoded:
+                t = time.perf_counter()
+                handler(event, db_session)
+                handled = time.perf_counter()
+                db_session.flush()
+                stages['flush'] += time.perf_counter() - handled
+                stages['handlers'] += handled - t
+                handler_time[handler.__name__] += handled - t
+                handler_events[handler.__name__] += 1
+
+            t = time.perf_counter()
+            event_indexer.set_last_processed_block(db_session, stream_name, batch['to_block'])
+            db_session.commit()
+            stages['commit'] += time.perf_counter() - t
+            raw_count += len(raw_logs)
+            event_count += len(decoded)
+        elapsed = time.perf_counter() - started
+        peak_traced = tracemalloc.get_traced_memory()[1] if args.trace_memory else None
+    finally:
+        if args.trace_memory:
+            tracemalloc.stop()
+        db_session.close()
+
+    return {
+        "raw_logs": raw_count,
+        "events": event_count,
+        "elapsed_s": round(elapsed, 3),
+        "events_per_s": round(event_count / elapsed, 1) if elapsed else 0.0,
+        "stages_s": {stage: round(seconds, 3) for stage, seconds in stages.items()},
+        "handlers": {name: {"events": handler_events[name], "total_s": round(seconds, 3),
+                            "us_per_event": round(seconds / handler_events[name] * 1e6, 1)}
+                     for name, seconds in sorted(handler_time.items())},
+        "peak_traced_mb": round(peak_traced / 2 ** 20, 1) if peak_traced is not None else None,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),  # Linux reports KiB
+    }
+
+
+def print_result(result):
+    log(f"{result['events']} events ({result['raw_logs']} raw logs) in {result['elapsed_s']}s: "
+        f"{result['events_per_s']} events/s")
+    for stage, seconds in result['stages_s'].items():
+        share = seconds / result['elapsed_s'] if result['elapsed_s'] else 0
+        log(f"  {stage:<10} {seconds:>9.3f}s  {share:>6.1%}")
+    for name, handler in result['handlers'].items():
+        log(f"  {name:<34} {handler['events']:>8} events  {handler['us_per_event']:>9.1f} us/event")
+    memory = f"peak RSS {result['max_rss_mb']} MB"
+    if result['peak_traced_mb'] is not None:
+        memory += f", peak traced allocations {result['peak_traced_mb']} MB"
+    log(f"  {memory}")
+
+
+def print_comparison(result, previous):
+    def delta(now, before):
+        return f"{now} vs {before} ({(now - before) / before:+.1%})" if before else f"{now} vs {before}"
+
+    log(f"\nCompared with {previous.get('revision') or 'previous run'}:")
+    log(f"  events/s   {delta(result['events_per_s'], previous['result']['events_per_s'])}")
+    for stage, seconds in result['stages_s'].items():
+        log(f"  {stage:<10} {delta(seconds, previous['result']['stages_s'].get(stage, 0))}")
+    for name, handler in result['handlers'].items():
+        before = previous['result']['handlers'].get(name)
+        if before:
+            log(f"  {name} us/event {delta(handler['us_per_event'], before['us_per_event'])}")
+
+
+def replay(args):
+    fixture = read_fixture(args.fixture)
+    header = next(fixture)
+    fixture.close()
+    workdir = Path(tempfile.mkdtemp(prefix='landchain-replay-'))
+    configure_environment(args, header, workdir)
+    logging.basicConfig(level=logging.WARNING)
+
+    runs = []
+    for run in range(args.repeat):
+        result = replay_once(args)
+        log(f"Run {run + 1}/{args.repeat}: {result['events_per_s']} events/s")
+        runs.append(result)
+    best = max(runs, key=lambda result: result['events_per_s'])
+    log("")
+    print_result(best)
+
+    report = {"revision": git_revision(), "fixture": str(args.fixture), "chain_id": header['chain_id'],
+              "blocks": [header['from_block'], header['to_block']], "repeat": args.repeat,
+              "database": os.environ['DATABASE_URL'].split(':')[0], "result": best}
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(best, json.load(f))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m bench.indexer_replay', description=__doc__)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = commands.add_parser('record', help="Save eth_getLogs responses from the configured RPC")
+    record_parser.add_argument('fixture', help="Output file (.jsonl.gz)")
+    record_parser.add_argument('--from-block', type=int, help="Defaults to INDEXER_START_BLOCK")
+    record_parser.add_argument('--to-block', type=int, help="Defaults to the head minus INDEXER_CONFIRMATIONS")
+    record_parser.add_argument('--batch-size', type=int, help="Blocks per eth_getLogs; defaults to INDEXER_BATCH_SIZE")
+    record_parser.add_argument('--streams', help="Comma-separated subset of the indexer streams")
+
+    replay_parser = commands.add_parser('replay', help="Run a fixture through the indexer's decode and write path")
+    replay_parser.add_argument('fixture')
+    replay_parser.add_argument('--database-url', help="Scratch database, emptied first; defaults to a SQLite file")
+    replay_parser.add_argument('--repeat', type=int, default=1, help="Report the best of this many runs")
+    replay_parser.add_argument('--trace-memory', action='store_true',
+                               help="Track peak Python allocations with tracemalloc (slows the run down)")
+    replay_parser.add_argument('--output', help="Write the report as JSON")
+    replay_parser.add_argument('--compare', help="A report from an earlier --output to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    return record(args) if args.command == 'record' else replay(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+# bench/load.py
+# Load driver and reporting: runs a scenario's requests from a thread pool against a live
+# server, then reports latency percentiles, throughput and the RPC and SQL calls the app made
+# per request. Results can be saved as a baseline; later runs fail when they regress past it.
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+
+import requests
+
+LATENCY_METRICS = ('p50_ms', 'p95_ms', 'p99_ms')
+MIN_LATENCY_REGRESSION_MS = 2.0  # Ignore relative jumps on sub-millisecond noise
+CALL_COUNT_SLACK = 0.5  # Absolute slack on RPC/SQL calls per request
+
+
+@dataclass
+class Scenario:
+    name: str
+    request: Callable  # (requests.Session, request number) -> requests.Response
+    needs_chain: bool = False
+    setup: Callable = None  # Runs before the scenario (e.g. flips an app setting)
+    teardown: Callable = None
+
+
+class CallCounters:
+    """Thread-safe counters the app's RPC provider and SQL engine hooks increment."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def increment(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_scenario(scenario, total_requests, concurrency, warmup, counters):
+    local = threading.local()
+
+    def one(number):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            status = scenario.request(session, number).status_code
+        except requests.RequestException:
+            status = 'error'
+        return (time.perf_counter() - started) * 1000, status
+
+    if scenario.setup:
+        scenario.setup()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(warmup)))  # Warms caches and connection pools; not measured
+            counters.reset()
+            started = time.perf_counter()
+            outcomes = list(pool.map(one, range(warmup, warmup + total_requests)))
+            elapsed = time.perf_counter() - started
+    finally:
+        if scenario.teardown:
+            scenario.teardown()
+
+    calls = counters.snapshot()
+    latencies = sorted(latency for latency, _ in outcomes)
+    statuses = Counter(str(status) for _, status in outcomes)
+    errors = sum(count for status, count in statuses.items() if not status.startswith(('2', '3')))
+    return {
+        "requests": total_requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "statuses": dict(statuses),
+        "throughput_rps": round(total_requests / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "rpc_per_request": round(calls.get('rpc', 0) / total_requests, 2),
+        "sql_per_request": round(calls.get('sql', 0) / total_requests, 2),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Regression messages for every metric that got worse than the baseline allows."""
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key in LATENCY_METRICS:
+            allowed = base[key] * (1 + tolerance)
+            if metrics[key] > allowed and metrics[key] - base[key] > MIN_LATENCY_REGRESSION_MS:
+                regressions.append(f"{name}: {key} {metrics[key]} > {round(allowed, 2)} (baseline {base[key]})")
+        if metrics['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+            allowed = round(base['throughput_rps'] * (1 - tolerance), 2)
+            regressions.append(f"{name}: throughput {metrics['throughput_rps']} rps < {allowed} "
+                               f"(baseline {base['throughput_rps']})")
+        for key in ('rpc_per_request', 'sql_per_request'):
+            allowed = base[key] * (1 + tolerance) + CALL_COUNT_SLACK
+            if metrics[key] > allowed:
+                regressions.append(f"{name}: {key} {metrics[key]} > {round(allowed, 2)} (baseline {base[key]})")
+        if metrics['errors'] > base['errors']:
+            regressions.append(f"{name}: {metrics['errors']} errors (baseline {base['errors']})")
+    return regressions
+
+
+def format_table(results):
+    columns = ('requests', 'errors', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'rpc_per_request',
+               'sql_per_request')
+    headers = ('scenario', 'reqs', 'errors', 'rps', 'p50 ms', 'p95 ms', 'p99 ms', 'rpc/req', 'sql/req')
+    rows = [headers] + [(name,) + tuple(str(metrics[column]) for column in columns)
+                        for name, metrics in results.items()]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(headers))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows)
+
+
+def load_baseline(path):
+    try:
+        with open(path) as f:
+            return json.load(f)['scenarios']
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path, results, run_info):
+    with open(path, 'w') as f:
+        json.dump({"run": run_info, "scenarios": results}, f, indent=2, sort_keys=True)
@@ -0,0 +1,114 @@
+# bench/localchain.py
+# Local EVM for benchmarks: the contracts in contracts/ compiled with py-solc-x and deployed
+# to an in-process eth-tester (py-evm) chain.
+#
+# Compiling needs the OpenZeppelin v5 sources (`npm install @openzeppelin/contracts@5`); pass
+# their parent directory with --openzeppelin or BENCH_OPENZEPPELIN_PATH. py-solc-x downloads
+# the compiler on first use. Artifacts are cached next to this file and reused while the
+# Solidity sources are unchanged.
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from web3 import Web3, EthereumTesterProvider
+
+CONTRACTS_DIR = Path(__file__).resolve().parents[2] / 'contracts'
+ARTIFACTS_PATH = Path(__file__).resolve().parent / '.artifacts.json'
+SOLC_VERSION = os.environ.get('BENCH_SOLC_VERSION', '0.8.24')
+
+# Contract name -> source file; names match the keys of app.chain.CONTRACTS via CHAIN_NAMES
+SOURCES = {
+    'NFTLand': 'NFTLand.sol',
+    'ActionLogger': 'ActionLogger.sol',
+    'NFTMarketplace': 'NFTMarketplace.sol',
+}
+CHAIN_NAMES = {'NFTLand': 'nft_land', 'ActionLogger': 'action_logger', 'NFTMarketplace': 'nft_marketplace'}
+COMMISSION_BPS = 1000
+TX_BATCH_LOG_EVERY = 200
+
+
+def _sources_digest():
+    digest = hashlib.sha256(SOLC_VERSION.encode())
+    for source in sorted(SOURCES.values()):
+        digest.update((CONTRACTS_DIR / source).read_bytes())
+    return digest.hexdigest()
+
+
+def compile_contracts(openzeppelin_path):
+    """{contract name: {"abi": [...], "bin": "0x..."}}, from the cache when the sources match."""
+    digest = _sources_digest()
+    if ARTIFACTS_PATH.exists():
+        cached = json.loads(ARTIFACTS_PATH.read_text())
+        if cached.get('digest') == digest:
+            return cached['contracts']
+
+    import solcx  # Only needed for chain-backed runs
+    if not openzeppelin_path or not (Path(openzeppelin_path) / '@openzeppelin' / 'contracts').is_dir():
+        raise RuntimeError("OpenZeppelin sources not found: "
+                           "pass --openzeppelin <dir containing @openzeppelin/contracts>")
+    solcx.install_solc(SOLC_VERSION)
+    output = solcx.compile_files(
+        [str(CONTRACTS_DIR / source) for source in SOURCES.values()],
+        output_values=['abi', 'bin'],
+        solc_version=SOLC_VERSION,
+        import_remappings=[f"@openzeppelin/={Path(openzeppelin_path).resolve() / '@openzeppelin'}/"],
+        allow_paths=[str(CONTRACTS_DIR), str(Path(openzeppelin_path).resolve())],
+        optimize=True,
+    )
+    contracts = {}
+    for key, artifact in output.items():
+        source, _, name = key.rpartition(':')
+        if name in SOURCES and Path(source).name == SOURCES[name]:
+            contracts[name] = {"abi": artifact['abi'], "bin": artifact['bin']}
+    ARTIFACTS_PATH.write_text(json.dumps({"digest": digest, "contracts": contracts}))
+    return contracts
+
+
+class LocalChain:
+    """eth-tester chain with the three contracts deployed by the first test account."""
+
+    def __init__(self, artifacts):
+        from eth_tester import EthereumTester, PyEVMBackend
+
+        self.tester = EthereumTester(PyEVMBackend())
+        self.w3 = Web3(EthereumTesterProvider(self.tester))
+        self.owner = self.w3.eth.accounts[0]
+        self.w3.eth.default_account = self.owner
+        self.abis = {name: artifact['abi'] for name, artifact in artifacts.items()}
+        self.contracts = {}
+        for name, artifact in artifacts.items():
+            args = (self.owner, COMMISSION_BPS) if name == 'NFTMarketplace' else ()
+            factory = self.w3.eth.contract(abi=artifact['abi'], bytecode=artifact['bin'])
+            receipt = self._transact(factory.constructor(*args))
+            self.contracts[name] = self.w3.eth.contract(address=receipt['contractAddress'], abi=artifact['abi'])
+
+    def _transact(self, function):
+        return self.w3.eth.wait_for_transaction_receipt(function.transact({'from': self.owner}))
+
+    def write_abis(self, directory):
+        """Writes the deployed ABIs as JSON files; returns {chain name: path}."""
+        paths = {}
+        for name, abi in self.abis.items():
+            path = Path(directory) / f"{name}.json"
+            path.write_text(json.dumps(abi))
+            paths[CHAIN_NAMES[name]] = str(path)
+        return paths
+
+    def addresses(self):
+        return {CHAIN_NAMES[name]: contract.address for name, contract in self.contracts.items()}
+
+    def seed(self, tokens, updates_per_token, listings, log=print):
+        """Mints `tokens` NFTs to the owner, appends updates to each and lists some of them."""
+        land, market = self.contracts['NFTLand'], self.contracts['NFTMarketplace']
+        for token_id in range(tokens):
+            self._transact(land.functions.mintNFT(f"ipfs://bench-{token_id}-0"))
+            for update in range(1, updates_per_token + 1):
+                self._transact(land.functions.updateNFT(token_id, f"ipfs://bench-{token_id}-{update}"))
+            if (token_id + 1) % TX_BATCH_LOG_EVERY == 0:
+                log(f"  minted {token_id + 1}/{tokens} tokens on the local chain")
+        if listings:
+            self._transact(land.functions.setApprovalForAll(market.address, True))
+            for token_id in range(min(listings, tokens)):
+                price = Web3.to_wei(1 + token_id % 10, 'ether')
+                self._transact(market.functions.listNFT(land.address, token_id, price))
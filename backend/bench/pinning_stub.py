@@ -0,0 +1,62 @@
+# bench/pinning_stub.py
+# Local stand-in for the Pinata pinning API, so mint preparation can be load-tested without
+# network access or pinning quotas. Point the app at it with PINATA_API_URL (app/ipfs.py).
+# Every pin answers with a deterministic CID-like hash of the request body after an optional
+# artificial delay that approximates the real service.
+import hashlib
+import threading
+import time
+from datetime import datetime, UTC
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+
+def create_stub(latency_ms=0):
+    stub = Flask('pinning_stub')
+    stub.config['MAX_CONTENT_LENGTH'] = 64 * 1024 * 1024
+    stub.pin_count = 0
+    count_lock = threading.Lock()
+
+    def pinned(body):
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        with count_lock:
+            stub.pin_count += 1
+        return jsonify({
+            "IpfsHash": "bafy" + hashlib.sha256(body).hexdigest()[:55],
+            "PinSize": len(body),
+            "Timestamp": datetime.now(UTC).isoformat(),
+        })
+
+    @stub.route('/pinning/pinJSONToIPFS', methods=['POST'])
+    def pin_json():
+        return pinned(request.get_data())
+
+    @stub.route('/pinning/pinFileToIPFS', methods=['POST'])
+    def pin_file():
+        # Hash the parts rather than the raw body, whose multipart boundary is random
+        digest = hashlib.sha256()
+        for name, file in sorted(request.files.items(multi=True), key=lambda item: item[1].filename or ''):
+            digest.update((file.filename or '').encode())
+            digest.update(file.read())
+        return pinned(digest.digest())
+
+    return stub
+
+
+class StubServer:
+    """Runs the stub on a free local port in a background thread."""
+
+    def __init__(self, latency_ms=0):
+        self.app = create_stub(latency_ms)
+        self._server = make_server('127.0.0.1', 0, self.app, threaded=True)
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, name="pinning-stub", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
@@ -0,0 +1,282 @@
+# bench/run.py
+# End-to-end benchmark: boots the app against a local chain (bench/localchain.py), a local
+# pinning stub (bench/pinning_stub.py) and a freshly seeded database, then drives load at the
+# read and mint-preparation endpoints. Run from backend/:
+#
+#   python -m bench.run --profile small --no-chain           # DB-backed scenarios only
+#   python -m bench.run --profile large --openzeppelin ~/oz  # everything, millions of logs
+#   python -m bench.run --save-baseline                      # record bench/baselines/<profile>.json
+#
+# Later runs compare against the saved baseline and exit with status 1 if any scenario's
+# latency, throughput, RPC or SQL calls per request regress past --tolerance. Baselines are
+# machine-specific: record them on the machine (or CI runner class) that compares against them.
+import argparse
+import io
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from web3 import Web3
+from werkzeug.serving import make_server
+
+from . import load
+from .localchain import LocalChain, compile_contracts
+from .pinning_stub import StubServer
+
+BENCH_DIR = Path(__file__).resolve().parent
+# Owns the synthetic tokens when there is no local chain (whose first account owns them otherwise)
+NO_CHAIN_WALLET = Web3.to_checksum_address('0x' + 'be4c5'.rjust(40, '0'))
+
+PROFILES = {
+    'small': {
+        'chain_tokens': 20, 'chain_updates': 3, 'chain_listings': 5,
+        'db_tokens': 2000, 'db_versions': 20, 'action_logs': 50000,
+        'requests': 300, 'mint_requests': 30, 'concurrency': 8,
+    },
+    'large': {
+        'chain_tokens': 200, 'chain_updates': 10, 'chain_listings': 50,
+        'db_tokens': 20000, 'db_versions': 50, 'action_logs': 2000000,
+        'requests': 2000, 'mint_requests': 100, 'concurrency': 32,
+    },
+}
+OWNED_EVERY = 10  # The benchmark user owns every 10th synthetic token
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m bench.run', description=__doc__)
+    parser.add_argument('--profile', choices=PROFILES, default='small')
+    parser.add_argument('--chain', action=argparse.BooleanOptionalAction, default=True,
+                        help="Deploy the contracts to a local EVM (needs OpenZeppelin sources)")
+    parser.add_argument('--openzeppelin', default=os.environ.get('BENCH_OPENZEPPELIN_PATH'),
+                        help="Directory containing @openzeppelin/contracts")
+    parser.add_argument('--database-url', help="Defaults to a throwaway SQLite file; use PostgreSQL for real numbers")
+    parser.add_argument('--scenarios', help="Comma-separated subset of scenarios to run")
+    parser.add_argument('--requests', type=int, help="Measured requests per read scenario")
+    parser.add_argument('--concurrency', type=int)
+    parser.add_argument('--warmup', type=int, default=20, help="Unmeasured requests before each scenario")
+    parser.add_argument('--pin-latency-ms', type=float, default=50, help="Artificial delay per pin in the stub")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline', help="Defaults to bench/baselines/<profile>.json")
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help="Allowed relative regression (latency is noisy; call counts are not)")
+    parser.add_argument('--output', help="Also write the results as JSON here")
+    return parser.parse_args(argv)
+
+
+def log(message):
+    print(message, flush=True)
+
+
+def configure_environment(args, workdir, stub, local_chain):
+    # Must happen before the app package is imported: Config reads the environment at import time
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{workdir / 'bench.db'}"
+    for setting in ('JOB_STORAGE_DIR', 'UPLOAD_STORAGE_DIR', 'ARCHIVE_DIR'):
+        os.environ[setting] = str(workdir / setting.lower())
+    os.environ['CHAIN_WARM_UP'] = 'false'
+    os.environ['JOB_WORKER_THREADS'] = '0'
+    os.environ['PINATA_API_URL'] = stub.url
+    os.environ.setdefault('PINATA_API_KEY', 'bench')
+    os.environ.setdefault('PINATA_SECRET_API_KEY', 'bench')
+    if local_chain:
+        os.environ['POLYGON_RPC_URL'] = 'http://local-chain.invalid'  # Replaced by the in-process provider
+        abi_paths = local_chain.write_abis(workdir)
+        for name, address in local_chain.addresses().items():
+            os.environ[f"{name.upper()}_CONTRACT_ADDRESS"] = address
+            os.environ[f"{name.upper()}_CONTRACT_ABI_PATH"] = abi_paths[name]
+    else:
+        os.environ.pop('POLYGON_RPC_URL', None)
+
+
+def instrument(app, local_chain, counters):
+    """Counts RPC requests through the app's Web3 client and SQL statements on its engines."""
+    from sqlalchemy import event
+    from app import db, chain
+
+    if local_chain:
+        provider = local_chain.w3.provider
+        make_request = provider.make_request
+
+        def counted_make_request(method, params):
+            counters.increment('rpc')
+            return make_request(method, params)
+
+        provider.make_request = counted_make_request
+        chain._w3 = local_chain.w3  # The app would otherwise build an HTTP provider for POLYGON_RPC_URL
+
+    def count_statement(*_):
+        counters.increment('sql')
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', count_statement)
+
+
+def seed(app, profile, local_chain, rng):
+    from app import db
+    from app import event_indexer
+    from . import seed as bench_seed
+
+    wallet = local_chain.owner if local_chain else NO_CHAIN_WALLET
+    chain_tokens = 0
+    if local_chain:
+        log(f"Seeding the local chain: {profile['chain_tokens']} tokens x {profile['chain_updates']} updates")
+        local_chain.seed(profile['chain_tokens'], profile['chain_updates'], profile['chain_listings'], log)
+        head = local_chain.w3.eth.block_number
+        started = time.perf_counter()
+        for stream_name in event_indexer.STREAMS:
+            db_session = event_indexer.new_session()
+            try:
+                event_indexer.index_block_range(stream_name, 0, head, db_session, head)
+            finally:
+                db_session.close()
+        log(f"Indexed {head} blocks in {time.perf_counter() - started:.1f}s")
+        chain_tokens = profile['chain_tokens']
+
+    with app.app_context():
+        user_id, admin_id = bench_seed.seed_users(wallet)
+        log(f"Seeding {profile['db_tokens']} tokens x {profile['db_versions']} versions")
+        bench_seed.seed_tokens(chain_tokens, profile['db_tokens'], profile['db_versions'], wallet, OWNED_EVERY,
+                               rng, log)
+        log(f"Seeding {profile['action_logs']} action logs")
+        started = time.perf_counter()
+        bench_seed.seed_action_logs(profile['action_logs'], wallet, rng, log)
+        log(f"  done in {time.perf_counter() - started:.1f}s")
+        db.session.remove()
+    return user_id, admin_id, chain_tokens
+
+
+def session_cookie(app, data):
+    return app.session_interface.get_signing_serializer(app).dumps(data)
+
+
+def sample_png():
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.effect_noise((1024, 768), 64).convert('RGB').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def build_scenarios(app, base_url, user_cookie, admin_cookie, chain_tokens, total_tokens, seed_value):
+    from app.minting import REQUIRED_MINT_FIELDS
+
+    cookie_name = app.config['SESSION_COOKIE_NAME']
+    user, admin = {cookie_name: user_cookie}, {cookie_name: admin_cookie}
+    mint_form = {field: f"bench {field}" for field in REQUIRED_MINT_FIELDS}
+    mint_form['minter_address'] = NO_CHAIN_WALLET
+    image = sample_png()
+    documents = {name: (f"{name}.pdf", b"%PDF-1.4\n" + os.urandom(256 * 1024), 'application/pdf')
+                 for name in ('ownership_document', 'encumbrances')}
+
+    def token(number, upper):
+        return random.Random(seed_value * 1000003 + number).randrange(upper)
+
+    def set_index_reads(enabled):
+        return lambda: app.config.update(NFT_READS_FROM_INDEX=enabled)
+
+    return [
+        load.Scenario('my_nfts', lambda s, n: s.get(f"{base_url}/nft/my_nfts?per_page=100", cookies=user)),
+        load.Scenario('nft_history', lambda s, n: s.get(f"{base_url}/nft/{token(n, total_tokens)}/history")),
+        load.Scenario('nft_history_onchain', lambda s, n: s.get(f"{base_url}/nft/{token(n, chain_tokens)}/history"),
+                      needs_chain=True, setup=set_index_reads(False), teardown=set_index_reads(True)),
+        load.Scenario('nft_details', lambda s, n: s.get(f"{base_url}/nft/{token(n, chain_tokens)}"), needs_chain=True),
+        load.Scenario('admin_logs', lambda s, n: s.get(f"{base_url}/admin/logs?per_page=50", cookies=admin)),
+        load.Scenario('admin_logs_search', lambda s, n: s.get(f"{base_url}/admin/logs?per_page=50&q=update",
+                                                              cookies=admin)),
+        load.Scenario('prepare_metadata', lambda s, n: s.post(
+            f"{base_url}/nft/prepare_metadata_for_minting", data={**mint_form, 'plot_id': f"bench-{n}"},
+            files={'image': ('plot.png', image, 'image/png'), **documents}, cookies=user)),
+        load.Scenario('prepare_mint_tx', lambda s, n: s.post(
+            f"{base_url}/nft/prepare_mint_tx", json={"metadataURI": f"ipfs://bafybench{n}"}, cookies=user),
+            needs_chain=True),
+    ]
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # No per-request access log
+    profile = PROFILES[args.profile]
+    rng = random.Random(args.seed)
+    workdir = Path(tempfile.mkdtemp(prefix='landchain-bench-'))
+    log(f"Working directory: {workdir}")
+
+    stub = StubServer(args.pin_latency_ms).start()
+    local_chain = None
+    if args.chain:
+        local_chain = LocalChain(compile_contracts(args.openzeppelin))
+    configure_environment(args, workdir, stub, local_chain)
+
+    from app import create_app
+    app = create_app(start_workers=False)
+    counters = load.CallCounters()
+    instrument(app, local_chain, counters)
+    user_id, admin_id, chain_tokens = seed(app, profile, local_chain, rng)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-app", daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    wallet = local_chain.owner if local_chain else NO_CHAIN_WALLET
+    user_cookie = session_cookie(app, {'user_id': user_id, 'wallet_address': wallet})
+    admin_cookie = session_cookie(app, {'user_id': admin_id, 'wallet_address': None, 'is_admin': True})
+
+    scenarios = build_scenarios(app, base_url, user_cookie, admin_cookie, chain_tokens,
+                                chain_tokens + profile['db_tokens'], args.seed)
+    selected = set(args.scenarios.split(',')) if args.scenarios else None
+    results = {}
+    try:
+        for scenario in scenarios:
+            if selected is not None and scenario.name not in selected:
+                continue
+            if scenario.needs_chain and not local_chain:
+                log(f"Skipping {scenario.name}: needs the local chain")
+                continue
+            mint = scenario.name.startswith('prepare_metadata')
+            total = args.requests or (profile['mint_requests'] if mint else profile['requests'])
+            concurrency = args.concurrency or profile['concurrency']
+            log(f"Running {scenario.name}: {total} requests, concurrency {concurrency}")
+            results[scenario.name] = load.run_scenario(scenario, total, concurrency,
+                                                       min(args.warmup, total), counters)
+    finally:
+        server.shutdown()
+        stub.stop()
+
+    log("")
+    log(load.format_table(results))
+    log(f"Pins served by the stub: {stub.app.pin_count}")
+
+    run_info = {"profile": args.profile, "chain": bool(local_chain), "seed": args.seed,
+                "database": os.environ['DATABASE_URL'].split(':')[0],
+                "recorded_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"run": run_info, "scenarios": results}, f, indent=2, sort_keys=True)
+
+    baseline_path = Path(args.baseline) if args.baseline else BENCH_DIR / 'baselines' / f"{args.profile}.json"
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        load.save_baseline(baseline_path, results, run_info)
+        log(f"Baseline saved to {baseline_path}")
+        return 0
+
+    baseline = load.load_baseline(baseline_path)
+    if baseline is None:
+        log(f"No baseline at {baseline_path}; run with --save-baseline to record one")
+        return 0
+    regressions = load.compare(results, baseline, args.tolerance)
+    if regressions:
+        log(f"\n{len(regressions)} regression(s) against {baseline_path}:")
+        for regression in regressions:
+            log(f"  {regression}")
+        return 1
+    log(f"\nNo regressions against {baseline_path} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# bench/seed.py
+# Bulk database seeding for benchmarks: users, indexed tokens with long histories and a large
+# ActionLog table. Rows go in with executemany-style inserts in chunks, so millions of logs
+# take minutes rather than hours. Must run inside an app context.
+import random
+from datetime import datetime, timedelta, UTC
+
+from sqlalchemy import insert
+from web3 import Web3
+
+from app import db
+from app.models import User, ActionLog, NFTToken, NFTVersion, IndexerState
+
+CHUNK_SIZE = 10000
+USER_EMAIL = 'bench-user@example.com'
+ADMIN_EMAIL = 'bench-admin@example.com'
+LOG_ACTIONS = ('mint', 'update', 'list', 'buy', 'unlist', 'login', 'profile_update')
+LOG_USERS = 1000  # Distinct addresses the synthetic logs are spread over
+LOG_SPAN_DAYS = 180
+
+
+def _random_address(rng):
+    return Web3.to_checksum_address('0x' + rng.randbytes(20).hex())
+
+
+def _insert_chunked(model, rows, log, label):
+    chunk, total = [], 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            db.session.execute(insert(model), chunk)
+            db.session.commit()
+            total += len(chunk)
+            chunk = []
+            if total % (CHUNK_SIZE * 10) == 0:
+                log(f"  {total} {label}")
+    if chunk:
+        db.session.execute(insert(model), chunk)
+        db.session.commit()
+        total += len(chunk)
+    return total
+
+
+def seed_users(wallet):
+    """The benchmark user (owning `wallet`) and an admin; returns their ids."""
+    user = User(email=USER_EMAIL, wallet_address=wallet, is_admin=False)
+    admin = User(email=ADMIN_EMAIL, wallet_address=None, is_admin=True)
+    db.session.add_all([user, admin])
+    db.session.commit()
+    return user.id, admin.id
+
+
+def seed_tokens(first_token_id, count, versions_per_token, owner_wallet, owner_every, rng, log=print):
+    """Indexed NFTToken/NFTVersion rows as the event indexer would write them. Every
+    `owner_every`-th token belongs to `owner_wallet`, the rest to random addresses."""
+    now = datetime.now(UTC).replace(tzinfo=None)
+    owners = [_random_address(rng) for _ in range(max(1, count // 20))]
+    token_ids = range(first_token_id, first_token_id + count)
+
+    def tokens():
+        for token_id in token_ids:
+            yield {
+                "token_id": token_id,
+                "owner": owner_wallet if token_id % owner_every == 0 else rng.choice(owners),
+                "token_data": f"ipfs://bench-{token_id}-{versions_per_token - 1}",
+                "update_count": versions_per_token,
+                "minted_block": token_id,
+                "updated_block": token_id + versions_per_token,
+            }
+
+    def versions():
+        for token_id in token_ids:
+            for update_index in range(versions_per_token):
+                yield {
+                    "token_id": token_id,
+                    "update_index": update_index,
+                    "token_uri": f"ipfs://bench-{token_id}-{update_index}",
+                    "block_number": token_id + update_index,
+                    "tx_hash": f"{token_id:032x}{update_index:032x}",
+                    "timestamp": now - timedelta(minutes=versions_per_token - update_index),
+                }
+
+    _insert_chunked(NFTToken, tokens(), log, "tokens")
+    _insert_chunked(NFTVersion, versions(), log, "token versions")
+    if db.session.get(IndexerState, 'nft_land') is None:
+        # Marks the nft_land stream as indexed so the read paths use these tables
+        db.session.add(IndexerState(name='nft_land', last_block=first_token_id + count + versions_per_token,
+                                    caught_up=True))
+        db.session.commit()
+
+
+def seed_action_logs(count, wallet, rng, log=print):
+    """`count` ActionLog rows over the last LOG_SPAN_DAYS; a share of them belongs to `wallet`."""
+    addresses = [_random_address(rng) for _ in range(LOG_USERS)] + [wallet]
+    start = datetime.now(UTC).replace(tzinfo=None) - timedelta(days=LOG_SPAN_DAYS)
+    step = timedelta(days=LOG_SPAN_DAYS) / max(count, 1)
+
+    def rows():
+        for i in range(count):
+            action = rng.choice(LOG_ACTIONS)
+            yield {
+                "log_id_onchain": i,
+                "user_address": rng.choice(addresses),
+                "action": action,
+                "details": f'{{"bench": true, "action": "{action}", "n": {i}}}',
+                "timestamp": start + step * i,
+                "block_number": i,
+                "tx_hash": f"be{i:062x}",
+            }
+
+    return _insert_chunked(ActionLog, rows(), log, "action logs")
+
+
+def make_rng(seed):
+    return random.Random(seed)
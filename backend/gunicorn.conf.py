@@ -0,0 +1,32 @@
+# gunicorn.conf.py
+# Production server settings, read by: gunicorn -c gunicorn.conf.py wsgi:app
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Each thread may hold a database connection: keep threads <= DB_POOL_SIZE + DB_MAX_OVERFLOW.
+# An open /events/stream holds a thread too (ACTIVITY_MAX_SUBSCRIBERS caps them per worker). To
+# serve many streams, run a second instance for that path only and route /events/stream to it at
+# the proxy, e.g. GUNICORN_THREADS=200 ACTIVITY_MAX_SUBSCRIBERS=190 WEB_CONCURRENCY=2; streams
+# release their database connection, so its threads do not need matching pool slots.
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))  # 0 = never recycle workers
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+accesslog = '-'
+
+# Import the app once in the master so the workers share it (see wsgi.py)
+preload_app = True
+
+
+def post_fork(server, worker):
+    import wsgi
+    wsgi.post_fork()
+
+
+def child_exit(server, worker):
+    # Drop a dead worker's live gauges from the shared Prometheus directory (PROFILING_ENABLED)
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
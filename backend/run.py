@@ -6,7 +6,8 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
-app = create_app()
+# No in-process job workers: a CLI command would claim jobs and exit mid-run (see __main__ below)
+app = create_app(start_workers=False)
 
 
 @app.cli.command("init-admin")
@@ -43,5 +44,59 @@ def init_admin():
     print("IMPORTANT: Change the default password immediately after first login if set statically.")
 
 
+@app.cli.command("run-job-worker")
+def run_job_worker():
+    """Runs a background worker for queued mint-preparation jobs."""
+    from app.jobs import run_worker
+    print("Job worker started. Press Ctrl+C to stop.")
+    run_worker(app)
+
+
+@app.cli.command("cleanup-uploads")
+def cleanup_uploads():
+    """Deletes resumable uploads that have not been touched within UPLOAD_EXPIRY_HOURS."""
+    from app.uploads import delete_expired_uploads
+    print(f"Deleted {delete_expired_uploads()} expired uploads.")
+
+
+@app.cli.command("install-search")
+def install_search():
+    """Builds the full-text search column and indexes, plus pg_trgm where allowed (one-off)."""
+    from sqlalchemy.exc import DBAPIError
+    from app.search import install_search_extension, install_search_indexes
+    try:
+        install_search_extension(db.engine)
+    except DBAPIError as e:
+        print(f"Could not create pg_trgm (needs a role allowed to create extensions); "
+              f"skipping the trigram indexes: {e.orig}")
+    install_search_indexes(db.engine)
+    print("Search indexes are in place; restart the app servers to search with them.")
+
+
+@app.cli.command("partition-action-log")
+def partition_action_log():
+    """Converts action_log to monthly partitions (PostgreSQL, one-off)."""
+    from app import partitions
+    from app.search import install_search_indexes
+    if partitions.partition_action_log(db.engine, app.config['ACTION_LOG_PARTITIONS_AHEAD']):
+        install_search_indexes(db.engine)  # The search indexes went with the old table
+        print("action_log is now partitioned by month.")
+    else:
+        print("action_log is already partitioned.")
+
+
+@app.cli.command("archive-action-logs")
+def archive_action_logs():
+    """Archives action logs older than ACTION_LOG_RETENTION_MONTHS and creates upcoming partitions."""
+    from app import partitions
+    partitions.ensure_partitions(db.engine, app.config['ACTION_LOG_PARTITIONS_AHEAD'])
+    for month, count in partitions.archive_action_logs().items():
+        print(f"Archived {count} logs from {month}.")
+
+
 if __name__ == '__main__':
+    # The debug reloader imports this module in a watcher process too; only the serving child runs workers
+    if app.config.get('JOB_WORKER_THREADS') and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from app.jobs import start_worker_threads
+        start_worker_threads(app)
     app.run(debug=True)  # debug=False for production
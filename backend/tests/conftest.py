@@ -0,0 +1,23 @@
+# tests/conftest.py
+import os
+
+import pytest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')  # Config reads the environment at import time
+
+
+@pytest.fixture
+def app(tmp_path):
+    """An app on a fresh in-memory database, with its context pushed."""
+    from app import create_app, db
+    from app.config import Config
+
+    class TestConfig(Config):
+        TESTING = True
+        UPLOAD_STORAGE_DIR = str(tmp_path / 'uploads')
+        JOB_STORAGE_DIR = str(tmp_path / 'jobs')
+
+    app = create_app(TestConfig, start_workers=False)
+    with app.app_context():
+        yield app
+        db.session.remove()
@@ -0,0 +1,94 @@
+# tests/test_cache.py
+# app/cache.py against fakeredis (the Redis backend, including the cross-process load lock)
+# and the in-process LRU.
+import threading
+from unittest import mock
+
+import fakeredis
+import pytest
+
+from app import cache
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_cache(server, monkeypatch):
+    monkeypatch.setattr(cache, '_settings', dict(cache._settings, CACHE_BACKEND='redis',
+                                                 CACHE_REDIS_URL='redis://cache.invalid:6379/0',
+                                                 CACHE_KEY_PREFIX='test', CACHE_LOCK_TIMEOUT=2))
+    monkeypatch.setattr(cache, '_backend', None)
+    with mock.patch('redis.Redis.from_url', return_value=fakeredis.FakeRedis(server=server)):
+        backend = cache.get_backend()
+    assert isinstance(backend, cache.RedisCache)
+    return fakeredis.FakeRedis(server=server)  # A second client, as another process would have
+
+
+def test_get_or_set_loads_once_and_shares_the_value(redis_cache):
+    loader = mock.Mock(return_value={"owner": "0xabc"})
+    assert cache.get_or_set('nft', 1, loader, ttl=60) == {"owner": "0xabc"}
+    assert cache.get_or_set('nft', 1, loader, ttl=60) == {"owner": "0xabc"}
+    loader.assert_called_once()
+    assert redis_cache.get('test:nft:1') == b'{"owner": "0xabc"}'
+    assert 0 < redis_cache.pttl('test:nft:1') <= 60000
+
+
+def test_uncacheable_values_are_not_stored(redis_cache):
+    cache.get_or_set('nft', 2, lambda: ({"error": "not found"}, 404), ttl=60,
+                     should_cache=lambda response: response[1] == 200)
+    assert redis_cache.get('test:nft:2') is None
+    assert redis_cache.get('test:nft:2:lock') is None
+
+
+def test_waits_for_the_process_holding_the_load_lock(redis_cache):
+    redis_cache.set('test:nft:3:lock', '1', px=2000)  # Another process is loading
+
+    def other_process_finishes():
+        redis_cache.set('test:nft:3', '"loaded elsewhere"')
+        redis_cache.delete('test:nft:3:lock')
+
+    timer = threading.Timer(0.1, other_process_finishes)
+    timer.start()
+    loader = mock.Mock(return_value="loaded here")
+    try:
+        assert cache.get_or_set('nft', 3, loader, ttl=60) == "loaded elsewhere"
+    finally:
+        timer.join()
+    loader.assert_not_called()
+
+
+def test_invalidate(redis_cache):
+    cache.set('identity', 'a', {"id": 1}, ttl=60)
+    cache.set('identity', 'b', {"id": 2}, ttl=60)
+    cache.invalidate('identity', 'a', 'b')
+    assert redis_cache.keys('test:identity:*') == []
+
+
+def test_redis_outage_is_a_miss(redis_cache, server):
+    server.connected = False
+    loader = mock.Mock(return_value=[1, 2])
+    assert cache.get_or_set('nft_history', 4, loader, ttl=60) == [1, 2]
+    assert cache.get_or_set('nft_history', 4, loader, ttl=60) == [1, 2]
+    assert loader.call_count == 2
+    cache.invalidate('nft_history', 4)  # Logged, not raised
+
+
+def test_local_cache_is_a_bounded_lru():
+    local = cache.LocalCache(max_entries=2)
+    local.set('a', '1', 60)
+    local.set('b', '2', 60)
+    local.get('a')
+    local.set('c', '3', 60)
+    assert local.get('b') is None
+    assert (local.get('a'), local.get('c')) == ('1', '3')
+
+
+def test_local_cache_expiry():
+    local = cache.LocalCache(max_entries=10)
+    local.set('a', '1', 0)
+    assert local.get('a') is None
+    assert local.add('a', '2', 60)
+    assert not local.add('a', '3', 60)
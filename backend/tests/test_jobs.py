@@ -0,0 +1,88 @@
+# tests/test_jobs.py
+# app/jobs.py: claiming queued jobs, failing the ones a dead worker left running, running one.
+import json
+from datetime import datetime, timedelta, UTC
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event, text
+
+from app import db, jobs
+from app.minting import MintPreparationError
+from app.models import MintJob
+
+
+def _job(status='queued', age=0, started_age=None):
+    now = datetime.now(UTC)
+    job = MintJob(id=f"job{MintJob.query.count()}", kind='prepare_mint', status=status,
+                  payload=json.dumps({"form": {"name": "Plot 7"}, "files": {}}),
+                  created_at=now - timedelta(seconds=age),
+                  started_at=now - timedelta(seconds=started_age) if started_age is not None else None)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def test_claims_the_oldest_queued_job_once(app):
+    newer = _job(age=10)
+    older = _job(age=20)
+    _job(status='running', age=30, started_age=5)
+
+    first = jobs.claim_next_job()
+    assert (first.id, first.status) == (older, 'running')
+    assert first.started_at is not None
+    assert jobs.claim_next_job().id == newer
+    assert jobs.claim_next_job() is None
+
+
+def test_a_job_claimed_elsewhere_is_skipped(app):
+    taken = _job(age=20)
+    free = _job(age=10)
+    raced = []
+
+    def other_worker_claims_first(orm_execute_state):
+        # Runs between this worker's candidate read and its first conditional UPDATE
+        if orm_execute_state.is_update and not raced:
+            raced.append(taken)
+            orm_execute_state.session.connection().execute(
+                text("UPDATE mint_job SET status = 'running' WHERE id = :id"), {"id": taken})
+
+    event.listen(db.session, 'do_orm_execute', other_worker_claims_first)
+    try:
+        assert jobs.claim_next_job().id == free
+    finally:
+        event.remove(db.session, 'do_orm_execute', other_worker_claims_first)
+    assert raced
+    assert db.session.get(MintJob, taken).started_at is None  # Not claimed twice
+
+
+def test_fail_stale_jobs(app):
+    timeout = app.config['JOB_RUNNING_TIMEOUT']
+    stale = _job(status='running', started_age=timeout + 60)
+    busy = _job(status='running', started_age=1)
+    stale_dir = jobs._job_dir(stale)
+    stale_dir.mkdir(parents=True)
+
+    assert jobs.fail_stale_jobs() == 1
+    assert db.session.get(MintJob, stale).status == 'failed'
+    assert db.session.get(MintJob, busy).status == 'running'
+    assert not stale_dir.exists()
+
+
+@pytest.mark.parametrize("outcome, status, status_code", [
+    (lambda form, files: "ipfs://metadata", 'succeeded', 200),
+    (MintPreparationError("Pinning failed", 502), 'failed', 502),
+])
+def test_run_job(app, monkeypatch, outcome, status, status_code):
+    if isinstance(outcome, Exception):
+        def outcome(form, files, error=outcome):
+            raise error
+    monkeypatch.setattr(jobs, 'prepare_mint_metadata', outcome)
+    _job()
+    job = jobs.claim_next_job()
+
+    jobs.run_job(job)
+    assert (job.status, job.status_code) == (status, status_code)
+    assert job.finished_at is not None
+    assert not Path(jobs._job_dir(job.id)).exists()
+    assert ("result" in jobs.job_to_dict(job)) == (status == 'succeeded')
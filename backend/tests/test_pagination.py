@@ -0,0 +1,78 @@
+# tests/test_pagination.py
+# app/pagination.py: cursors round-trip, pages neither skip nor repeat rows (ties included),
+# and prev cursors walk back to the page before.
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from app.models import ActionLog, MarketListing
+from app.pagination import keyset_paginate, encode_cursor, decode_cursor, InvalidCursor
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def logs(app):
+    # Timestamps tie in threes, so pages have to break ties on id
+    db.session.add_all(ActionLog(action='mint', tx_hash=f'0x{i}', timestamp=START + timedelta(minutes=i // 3))
+                       for i in range(10))
+    db.session.commit()
+    return ActionLog.query.order_by(ActionLog.timestamp.desc(), ActionLog.id.desc()).all()
+
+
+def _walk(query, keys, per_page):
+    pages, cursor = [], None
+    while True:
+        items, cursor, _ = keyset_paginate(query, keys, cursor, per_page)
+        pages.append(items)
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    values = [START, Decimal(10 ** 30 + 1), 7, 'active']
+    cursor = encode_cursor(values, 'prev')
+    assert decode_cursor(cursor) == (values, 'prev')
+    with pytest.raises(InvalidCursor):
+        decode_cursor('not a cursor')
+
+
+def test_pages_break_timestamp_ties_on_id(logs):
+    pages = _walk(ActionLog.query, [(ActionLog.timestamp, True), (ActionLog.id, True)], 4)
+    assert [len(page) for page in pages] == [4, 4, 2]
+    assert [log.id for page in pages for log in page] == [log.id for log in logs]
+
+
+def test_mixed_directions(logs):
+    pages = _walk(ActionLog.query, [(ActionLog.timestamp, True), (ActionLog.id, False)], 3)
+    expected = ActionLog.query.order_by(ActionLog.timestamp.desc(), ActionLog.id.asc()).all()
+    assert [log.id for page in pages for log in page] == [log.id for log in expected]
+
+
+def test_prev_cursor_returns_the_previous_page(logs):
+    keys = [(ActionLog.timestamp, True), (ActionLog.id, True)]
+    first, next_cursor, prev_cursor = keyset_paginate(ActionLog.query, keys, None, 4)
+    assert prev_cursor is None
+    second, _, prev_cursor = keyset_paginate(ActionLog.query, keys, next_cursor, 4)
+    assert second == logs[4:8]
+    back, _, prev_cursor = keyset_paginate(ActionLog.query, keys, prev_cursor, 4)
+    assert back == first
+    assert prev_cursor is None
+
+
+def test_cursor_must_match_the_keys(logs):
+    cursor = encode_cursor([START], 'next')
+    with pytest.raises(InvalidCursor):
+        keyset_paginate(ActionLog.query, [(ActionLog.timestamp, True), (ActionLog.id, True)], cursor)
+
+
+def test_wei_keys_past_float_precision(app):
+    # Prices that only differ beyond 2**53 must still order and page exactly
+    base = 10 ** 24
+    db.session.add_all(MarketListing(listing_id=i, price_wei=Decimal(base + i % 3), status='active')
+                       for i in range(6))
+    db.session.commit()
+    pages = _walk(MarketListing.query, [(MarketListing.price_wei, False), (MarketListing.listing_id, False)], 2)
+    assert [listing.listing_id for page in pages for listing in page] == [0, 3, 1, 4, 2, 5]
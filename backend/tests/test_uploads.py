@@ -0,0 +1,83 @@
+# tests/test_uploads.py
+# app/uploads.py: chunks appended at offsets, the per-chunk claim, finalizing and expiry.
+import hashlib
+import io
+from datetime import datetime, timedelta, UTC
+from pathlib import Path
+
+import pytest
+
+from app import db, uploads
+from app.models import ChunkedUpload
+
+
+def _set(upload, **values):
+    # Another request changing the row behind this session's back
+    ChunkedUpload.query.filter_by(id=upload.id).update(values, synchronize_session=False)
+    db.session.commit()
+    db.session.refresh(upload)
+
+
+def test_chunks_are_assembled_at_their_offsets(app):
+    data = b'0123456789' * 10
+    upload = uploads.create_upload('deed.pdf', len(data), 'application/pdf')
+    assert uploads.append_chunk(upload, 0, io.BytesIO(data[:40])) == 40
+    assert uploads.append_chunk(upload, 40, io.BytesIO(data[40:])) == len(data)
+
+    uploads.finalize_upload(upload, sha256=hashlib.sha256(data).hexdigest())
+    assert upload.status == 'complete'
+    assert Path(upload.path).read_bytes() == data
+
+
+def test_offset_must_match(app):
+    upload = uploads.create_upload('deed.pdf', 10)
+    uploads.append_chunk(upload, 0, io.BytesIO(b'01234'))
+    with pytest.raises(uploads.UploadError) as error:
+        uploads.append_chunk(upload, 3, io.BytesIO(b'34567'))
+    assert error.value.status_code == 409
+    assert upload.offset == 5
+
+
+def test_oversized_chunk_is_dropped(app):
+    upload = uploads.create_upload('deed.pdf', 10)
+    uploads.append_chunk(upload, 0, io.BytesIO(b'01234'))
+    with pytest.raises(uploads.UploadError) as error:
+        uploads.append_chunk(upload, 5, io.BytesIO(b'56789abc'))
+    assert error.value.status_code == 413
+
+    db.session.refresh(upload)
+    assert (upload.offset, upload.status) == (5, 'uploading')  # The claim is released
+    assert Path(upload.path).read_bytes() == b'01234'
+
+
+def test_concurrent_chunk_loses_the_claim(app):
+    upload = uploads.create_upload('deed.pdf', 10)
+    _set(upload, status='appending', updated_at=datetime.now(UTC))  # Another PATCH is writing
+    with pytest.raises(uploads.UploadError) as error:
+        uploads.append_chunk(upload, 0, io.BytesIO(b'01234'))
+    assert error.value.status_code == 409
+
+    db.session.refresh(upload)
+    with pytest.raises(uploads.UploadError) as error:
+        uploads.finalize_upload(upload)
+    assert error.value.status_code == 409
+
+
+def test_stale_claim_is_taken_over(app):
+    upload = uploads.create_upload('deed.pdf', 5)
+    claimed_at = datetime.now(UTC) - timedelta(seconds=app.config['UPLOAD_CHUNK_CLAIM_SECONDS'] + 1)
+    _set(upload, status='appending', updated_at=claimed_at)  # Left behind by a dead worker
+    assert uploads.append_chunk(upload, 0, io.BytesIO(b'01234')) == 5
+    assert upload.status == 'uploading'
+
+
+def test_delete_expired_uploads(app):
+    expired = uploads.create_upload('old.pdf', 10)
+    fresh = uploads.create_upload('new.pdf', 10)
+    _set(expired, updated_at=datetime.now(UTC) - timedelta(hours=app.config['UPLOAD_EXPIRY_HOURS'] + 1))
+    expired_path, expired_id = Path(expired.path), expired.id
+
+    assert uploads.delete_expired_uploads() == 1
+    assert not expired_path.exists()
+    assert db.session.get(ChunkedUpload, expired_id) is None
+    assert db.session.get(ChunkedUpload, fresh.id) is not None
@@ -0,0 +1,30 @@
+# wsgi.py
+# Production entrypoint: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# With preload_app the gunicorn master imports this module once, before forking. The app,
+# the parsed ABIs and the contract objects built here are then shared copy-on-write by every
+# worker instead of being rebuilt in each one. post_fork() recreates what must not be shared
+# between processes: database connections, RPC connection pools and background threads.
+import gc
+
+from app import create_app, db, chain, jobs
+
+app = create_app(start_workers=False)
+chain.preload()
+
+with app.app_context():
+    for engine in db.engines.values():
+        engine.dispose()  # Connections opened by create_all() must not be inherited by the workers
+
+# Everything loaded so far lives as long as the process; freezing it keeps the garbage
+# collector from writing to (and so un-sharing) those pages in the workers.
+gc.freeze()
+
+
+def post_fork():
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)  # Fresh pool; leave any inherited sockets to the parent
+    chain.reset_connections()
+    if app.config.get('JOB_WORKER_THREADS'):
+        jobs.start_worker_threads(app)
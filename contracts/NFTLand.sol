@@ -107,6 +107,34 @@ contract NFTLand is ERC721URIStorage, Ownable {
         return tokenUpdates[tokenId].length;
     }
 
+    // Upper bound on the items one paginated view call returns, so a page stays within RPC gas caps
+    uint256 public constant MAX_PAGE_SIZE = 100;
+
+    /**
+     * @dev Returns up to `limit` updates of a token starting at `offset`, plus the total count.
+     * Reading a token's history then costs one call per page instead of one per update.
+     */
+    function getUpdates(uint256 tokenId, uint256 offset, uint256 limit)
+        external
+        view
+        returns (string[] memory updates, uint256 total)
+    {
+        string[] storage allUpdates = tokenUpdates[tokenId];
+        total = allUpdates.length;
+        if (offset >= total) {
+            return (new string[](0), total);
+        }
+        if (limit > MAX_PAGE_SIZE) {
+            limit = MAX_PAGE_SIZE;
+        }
+        uint256 end = offset + limit > total ? total : offset + limit;
+
+        updates = new string[](end - offset);
+        for (uint256 i = offset; i < end; i++) {
+            updates[i - offset] = allUpdates[i];
+        }
+    }
+
     /**
      * @dev Returns the nfts for a given owner
      */
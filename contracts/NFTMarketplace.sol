@@ -206,7 +206,55 @@ contract NFTMarketplace is ReentrancyGuard, Ownable {
         return allListingsArray.length; // Includes inactive listings if not pruned
     }
 
-    // To get active listings, you would iterate `allListingsArray` and check `listings[contract][tokenId].active`.
-    // This is very inefficient on-chain.
+    // Upper bound on the listings one getActiveListings call scans
+    uint256 public constant MAX_PAGE_SIZE = 100;
+
+    /**
+     * @dev Scans allListingsArray[offset, offset + limit) and returns the entries that are still the
+     * active listing of their token (with current price), together with their listing ids.
+     * The scan is bounded, so every call costs the same however long the array grows. Continue from
+     * `nextOffset` until it equals getTotalListings(); a page may hold fewer than `limit` listings.
+     */
+    function getActiveListings(uint256 offset, uint256 limit)
+        external
+        view
+        returns (Listing[] memory activeListings, uint256[] memory listingIds, uint256 nextOffset)
+    {
+        uint256 total = allListingsArray.length;
+        if (limit > MAX_PAGE_SIZE) {
+            limit = MAX_PAGE_SIZE;
+        }
+        if (offset > total) {
+            offset = total;
+        }
+        nextOffset = offset + limit > total ? total : offset + limit;
+
+        uint256 count = 0;
+        for (uint256 i = offset; i < nextOffset; i++) {
+            if (_isActiveListing(i)) {
+                count++;
+            }
+        }
+
+        activeListings = new Listing[](count);
+        listingIds = new uint256[](count);
+        uint256 j = 0;
+        for (uint256 i = offset; i < nextOffset; i++) {
+            if (_isActiveListing(i)) {
+                Listing storage entry = allListingsArray[i];
+                activeListings[j] = listings[entry.nftContract][entry.tokenId];
+                listingIds[j] = i;
+                j++;
+            }
+        }
+    }
+
+    // allListingsArray keeps a copy of every listing ever made; an entry is live only while it is
+    // still its token's current listing and that listing is active
+    function _isActiveListing(uint256 _listingId) private view returns (bool) {
+        Listing storage entry = allListingsArray[_listingId];
+        return listingArrayIndex[entry.nftContract][entry.tokenId] == _listingId
+            && listings[entry.nftContract][entry.tokenId].active;
+    }
 
 }
\ No newline at end of file